@@ -0,0 +1,80 @@
+"""
+Benchmark: row-wise calendar features (the old run_model_pipeline code) vs
+calendarFeatures.add_calendar_features on the merged MBTA/weather dataset.
+
+    python benchmarks/bench_calendar.py [path/to/merged_mbta_weather.csv]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import holidays
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.calendarFeatures import add_calendar_features
+
+default_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'processed', 'merged_mbta_weather.csv')
+
+
+def legacy_calendar_features(df):
+    # Feature code as it was in run_model_pipeline before calendarFeatures.py
+    df['day_of_week'] = df['service_date'].dt.dayofweek
+    df['is_weekend'] = df['day_of_week'].apply(lambda x: 1 if x >= 5 else 0)
+
+    def month_to_season(month):
+        if month in [12, 1, 2]: return 'winter'
+        elif month in [3, 4, 5]: return 'spring'
+        elif month in [6, 7, 8]: return 'summer'
+        else: return 'fall'
+
+    df['month'] = df['service_date'].dt.month
+    df['season'] = df['month'].apply(month_to_season)
+
+    years = df['service_date'].dt.year.unique().tolist()
+    us_hols = holidays.US(years=years)
+    df['is_holiday'] = df['service_date'].apply(lambda d: 1 if d in us_hols else 0)
+
+    holiday_dates = sorted(us_hols.keys())
+
+    def days_to_next_hol(dt):
+        d = dt.date()
+        future = [(hol - d).days for hol in holiday_dates if hol >= d]
+        return min(future) if future else np.nan
+
+    def days_from_prev_hol(dt):
+        d = dt.date()
+        past = [(d - hol).days for hol in holiday_dates if hol <= d]
+        return min(past) if past else np.nan
+
+    df['days_to_next_hol']   = df['service_date'].apply(days_to_next_hol)
+    df['days_from_prev_hol'] = df['service_date'].apply(days_from_prev_hol)
+    df['week_start'] = df['service_date'] - pd.to_timedelta(df['service_date'].dt.weekday, unit='D')
+    return df
+
+
+def timed(fn, df, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        frame = df.copy()
+        start = time.perf_counter()
+        out = fn(frame)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else default_path
+    df = pd.read_csv(path, usecols=['service_date', 'station_name'], parse_dates=['service_date'])
+
+    legacy_time, legacy = timed(legacy_calendar_features, df, repeat=1)
+    fast_time, fast = timed(add_calendar_features, df)
+
+    cols = ['day_of_week', 'is_weekend', 'month', 'is_holiday', 'days_to_next_hol', 'days_from_prev_hol', 'week_start']
+    pd.testing.assert_frame_equal(legacy[cols], fast[cols], check_dtype=False)
+    assert (legacy['season'] == fast['season'].astype(str)).all()
+
+    print(f"rows: {len(df)}, unique dates: {df['service_date'].nunique()}")
+    print(f"row-wise apply: {legacy_time:.3f}s")
+    print(f"vectorized:     {fast_time:.4f}s")
+    print(f"speedup:        {legacy_time / fast_time:.0f}x")
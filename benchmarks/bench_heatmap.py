@@ -0,0 +1,66 @@
+"""
+Benchmark: the old per-date filter + .at loop that built the heatmap frames vs
+heatmapFrames.build_cube / figure_dict, on synthetic predictions for every
+mapped station over 1, 3 and 6 years of dates.
+
+    python benchmarks/bench_heatmap.py
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.heatmapFrames import build_cube, figure_dict
+from data.stations import STATION_COORDS
+
+
+def synthetic_predictions(years, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2018-01-01', periods=365 * years)
+    stations = list(STATION_COORDS)
+    n = len(dates) * len(stations)
+    actual = rng.integers(0, 20000, n)
+    return pd.DataFrame({
+        'service_date': np.repeat(dates, len(stations)),
+        'station_name': np.tile(stations, len(dates)),
+        'tavg': np.repeat(rng.normal(50, 15, len(dates)), len(stations)),
+        'prcp': np.repeat(rng.exponential(0.1, len(dates)), len(stations)),
+        'wspd': np.repeat(rng.normal(10, 3, len(dates)), len(stations)),
+        'actual_entries': actual,
+        'predicted_entries': actual + rng.integers(-3000, 3000, n),
+    })
+
+
+def legacy_frames(entries, max_px=40):
+    # Frame data as heatmapvisualization.py used to build it (without go.Frame validation)
+    df = entries.rename(columns={'station_name': 'station'}).assign(
+        date=lambda d: d['service_date'].dt.strftime('%Y-%m-%d'))
+    df['error'] = (df['predicted_entries'] - df['actual_entries']).abs()
+    max_actual = df['actual_entries'].max()
+    stations = list(STATION_COORDS)
+    frames = []
+    for date in sorted(df['date'].unique()):
+        grp = df[df['date'] == date].set_index('station')
+        sizes = [(grp.at[s, 'actual_entries'] if s in grp.index else 0) / max_actual * max_px for s in stations]
+        errs = [(grp.at[s, 'error'] if s in grp.index else 0) for s in stations]
+        acts = [(grp.at[s, 'actual_entries'] if s in grp.index else 0) for s in stations]
+        preds = [(grp.at[s, 'predicted_entries'] if s in grp.index else 0) for s in stations]
+        frames.append((date, sizes, errs, np.stack([acts, errs, preds], axis=-1)))
+    return frames
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    print(f"{'years':>6} {'rows':>8} {'legacy frames':>14} {'cube + figure':>14}")
+    for years in (1, 3, 6):
+        entries = synthetic_predictions(years)
+        legacy = timed(legacy_frames, entries)
+        engine = timed(lambda e: figure_dict(build_cube(e)), entries)
+        print(f"{years:>6} {len(entries):>8} {legacy:>13.3f}s {engine:>13.3f}s")
@@ -0,0 +1,225 @@
+"""
+Benchmark suite: time and peak memory of every pipeline stage on synthetic data.
+
+`run` generates synthetic sources (see synthetic_data.py) in a temp directory
+and measures, stage by stage: process_zip, process_mbta,
+process_zip_streaming, process_weather, combine_data, each feature block of
+the model (calendar, season dummies, time features, period flags, line
+colors, station dummies), the fit and predict steps of the global model and of
+the per-station / per-line model banks, and building the heatmap frames. Each stage is timed (best of --repeat runs) and then run once more
+under tracemalloc for its peak traced allocation. Results are written as JSON
+to benchmarks/results/<commit>_<size>.json.
+
+`compare` diffs two result files and exits non-zero when a stage got slower
+or bigger than the threshold, so it can gate a change.
+
+    python benchmarks/bench_pipeline.py run [--stations 70] [--years 5] [--time-periods 8] [--repeat 3]
+    python benchmarks/bench_pipeline.py compare BASELINE.json CURRENT.json [--threshold 0.25]
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from data.calendarFeatures import add_calendar_features
+from data.heatmapFrames import build_cube, figure_dict
+from data.modelBank import fit_model_bank
+from data.processing import combine_data, process_mbta, process_weather, process_zip, process_zip_streaming
+from data.stations import assign_line_colors
+from data.storage import table_path
+from data.timeFeatures import add_time_series_features, time_feature_columns
+from data.tuningModel import HOLIDAY_COLUMNS, add_period_flags, make_pipeline, model_feature_columns
+from synthetic_data import write_sources
+
+results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Seconds below which a slowdown is treated as noise by compare
+MIN_SECONDS = 0.05
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def fresh(value):
+    # Shallow copy so stages that add columns in place start from the same input every run
+    return value.copy(deep=False) if isinstance(value, pd.DataFrame) else value
+
+
+def measure(stage, fn, *args, repeat=1, memory=True):
+    """Run fn(*args) `repeat` times (+1 traced); returns (result, record)."""
+    seconds = float('inf')
+    # The pipeline prints progress dumps; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            inputs = [fresh(a) for a in args]
+            start = time.perf_counter()
+            result = fn(*inputs)
+            seconds = min(seconds, time.perf_counter() - start)
+
+        peak_mb = None
+        if memory:
+            inputs = [fresh(a) for a in args]
+            tracemalloc.start()
+            fn(*inputs)
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            tracemalloc.stop()
+
+    rows = len(result) if hasattr(result, '__len__') and not isinstance(result, (str, dict)) else None
+    return result, {'stage': stage, 'seconds': seconds, 'peak_mb': peak_mb, 'rows': rows}
+
+
+def run_suite(stations=70, years=5, time_periods=8, repeat=1, memory=True, n_jobs=None, log=print):
+    records = []
+
+    def stage(name, fn, *args):
+        result, record = measure(name, fn, *args, repeat=repeat, memory=memory)
+        records.append(record)
+        peak = '' if record['peak_mb'] is None else f" {record['peak_mb']:>9.1f} MB"
+        log(f"{name:>24} {record['seconds']:>9.3f}s{peak}")
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = write_sources(os.path.join(tmp, 'raw'), stations, years, time_periods)
+        out = os.path.join(tmp, 'processed')
+        mbta_path = table_path(tmp, 'mbta_data')
+
+        # Processing
+        stage('process_zip', process_zip, sources['folder'], mbta_path)
+        df_mbta = stage('process_mbta', process_mbta, mbta_path, None, out)
+        stage('process_zip_streaming', process_zip_streaming, sources['zip'], 500_000, n_jobs, None, out)
+        df_weather = stage('process_weather', process_weather, sources['weather'], None, out)
+        df = stage('combine_data', combine_data, df_mbta, df_weather, None, out)
+
+        # Feature blocks of run_model_pipeline (see tuningModel.build_feature_frame)
+        df = stage('calendar_features', add_calendar_features, df)
+        df = stage('season_dummies', lambda d: pd.get_dummies(d, columns=['season'], drop_first=True), df)
+        df = stage('time_features', add_time_series_features, df)
+        # Same rows as build_feature_frame keeps: other columns (e.g. weather) may be missing
+        df = df.dropna(subset=['gated_entries', *HOLIDAY_COLUMNS, *time_feature_columns()])
+        df = stage('period_flags', add_period_flags, df)
+        df = stage('line_colors', assign_line_colors, df).reset_index(drop=True)
+
+        x_cols = model_feature_columns()
+        X = stage('station_dummies', lambda d: pd.concat(
+            [d[x_cols], pd.get_dummies(d['station_name'], drop_first=True)], axis=1), df)
+
+        # Fit on the first 80% of days, predict the rest
+        dates = df['service_date']
+        cutoff = dates.min() + (dates.max() - dates.min()) * 0.8
+        train = (dates <= cutoff).to_numpy()
+        y = df['gated_entries']
+        pipeline = stage('fit', lambda X, y: make_pipeline(n_base=len(x_cols)).fit(X, y), X[train], y[train])
+        predicted = stage('predict', pipeline.predict, X[~train])
+        for by in ('station', 'line'):
+            bank = stage(f'fit_{by}_shards', lambda d: fit_model_bank(d, x_cols, by=by, n_jobs=n_jobs), df[train])
+            stage(f'predict_{by}_shards', bank.predict, df[~train])
+
+        predictions = df.loc[~train, ['service_date', 'station_name', 'tavg', 'prcp', 'wspd']].assign(
+            actual_entries=y[~train].to_numpy(), predicted_entries=predicted.round())
+        stage('heatmap_frames', lambda p: figure_dict(build_cube(p)), predictions)
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'config': {'stations': stations, 'years': years, 'time_periods': time_periods, 'repeat': repeat},
+        },
+        'stages': records,
+    }
+
+
+def save_results(results, path=None):
+    if path is None:
+        c = results['meta']['config']
+        path = os.path.join(results_dir, f"{results['meta']['commit']}_{c['stations']}x{c['years']}x{c['time_periods']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def compare(baseline, current, threshold=0.25):
+    """
+    Per-stage ratios current / baseline. A stage regresses when its time grows
+    by more than `threshold` (and by more than MIN_SECONDS), or its peak memory does.
+    """
+    base = {r['stage']: r for r in baseline['stages']}
+    rows = []
+    for r in current['stages']:
+        b = base.get(r['stage'])
+        if b is None:
+            continue
+        time_ratio = r['seconds'] / b['seconds'] if b['seconds'] else float('inf')
+        mem_ratio = r['peak_mb'] / b['peak_mb'] if r['peak_mb'] and b['peak_mb'] else None
+        slower = time_ratio > 1 + threshold and r['seconds'] - b['seconds'] > MIN_SECONDS
+        bigger = mem_ratio is not None and mem_ratio > 1 + threshold
+        rows.append({
+            'stage': r['stage'],
+            'base_s': b['seconds'], 'new_s': r['seconds'], 'time_ratio': time_ratio,
+            'base_mb': b['peak_mb'], 'new_mb': r['peak_mb'], 'mem_ratio': mem_ratio,
+            'regression': slower or bigger,
+        })
+    return pd.DataFrame(rows)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline benchmark suite")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help="benchmark every stage on synthetic data")
+    run.add_argument('--stations', type=int, default=70)
+    run.add_argument('--years', type=int, default=5)
+    run.add_argument('--time-periods', type=int, default=8)
+    run.add_argument('--repeat', type=int, default=1)
+    run.add_argument('--jobs', type=int, help="worker processes for process_zip_streaming and the model banks")
+    run.add_argument('--no-memory', action='store_true', help="skip the tracemalloc runs")
+    run.add_argument('--output', help="result file (default: benchmarks/results/<commit>_<size>.json)")
+
+    cmp = sub.add_parser('compare', help="compare two result files")
+    cmp.add_argument('baseline')
+    cmp.add_argument('current')
+    cmp.add_argument('--threshold', type=float, default=0.25)
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        results = run_suite(args.stations, args.years, args.time_periods, args.repeat,
+                            memory=not args.no_memory, n_jobs=args.jobs)
+        print(f"results: {save_results(results, args.output)}")
+        return 0
+
+    table = compare(load_results(args.baseline), load_results(args.current), args.threshold)
+    print(table.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    regressions = table.loc[table['regression'], 'stage'].tolist()
+    if regressions:
+        print(f"regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Benchmark: tables read with inferred dtypes (plain pd.read_csv) vs the column
+schema (storage.read_table, see schema.py). Prints the memory report of each
+table and times the process_mbta groupby and the combine_data merge on both.
+
+    python benchmarks/bench_schema.py [processed_mbta.csv] [weather_data.csv]
+"""
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.processing import merge_mbta_weather
+from data.schema import memory_report
+from data.storage import read_table
+
+data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+default_mbta = os.path.join(data_dir, 'processed', 'processed_mbta.csv')
+default_weather = os.path.join(data_dir, 'raw', 'weather_data.csv')
+
+
+def best_time(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def inferred_weather(path):
+    # process_weather before the schema: inferred float64, dates parsed after renaming
+    df = pd.read_csv(path).drop(columns=['wdir', 'pres']).rename(columns={'time': 'service_date'})
+    df['service_date'] = pd.to_datetime(df['service_date'])
+    return df
+
+
+def typed_weather(path):
+    df = read_table(path).drop(columns=['wdir', 'pres']).rename(columns={'time': 'service_date'})
+    df['service_date'] = pd.to_datetime(df['service_date'])
+    return df
+
+
+if __name__ == '__main__':
+    mbta_path = sys.argv[1] if len(sys.argv) > 1 else default_mbta
+    weather_path = sys.argv[2] if len(sys.argv) > 2 else default_weather
+
+    # Dates as strings, like the processed CSV was read before storage.py
+    mbta_before = pd.read_csv(mbta_path)
+    mbta_after = read_table(mbta_path)
+    weather_before, weather_after = inferred_weather(weather_path), typed_weather(weather_path)
+    merged_before = merge_mbta_weather(mbta_before.assign(service_date=pd.to_datetime(mbta_before['service_date'])), weather_before)
+    merged_after = merge_mbta_weather(mbta_after, weather_after)
+
+    for name, before, after in [('mbta', mbta_before, mbta_after), ('weather', weather_before, weather_after),
+                                ('merged', merged_before, merged_after)]:
+        print(f"\n{name} ({len(after)} rows)")
+        print(memory_report(before, after).to_string(float_format=lambda v: f"{v:.2f}"))
+
+    def groupby(df):
+        return lambda: df.groupby('station_name', observed=True)['gated_entries'].sum()
+
+    def merge(mbta, weather):
+        return lambda: merge_mbta_weather(mbta, weather)
+
+    mbta_before_dates = mbta_before.assign(service_date=pd.to_datetime(mbta_before['service_date']))
+    print(f"\n{'':>26} {'inferred':>10} {'schema':>10}")
+    print(f"{'groupby station_name':>26} {best_time(groupby(mbta_before)):>9.4f}s {best_time(groupby(mbta_after)):>9.4f}s")
+    print(f"{'merge mbta + weather':>26} {best_time(merge(mbta_before_dates, weather_before)):>9.4f}s "
+          f"{best_time(merge(mbta_after, weather_after)):>9.4f}s")
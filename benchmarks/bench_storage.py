@@ -0,0 +1,57 @@
+"""
+Benchmark: reading and writing the merged MBTA/weather table as CSV, Parquet
+and Feather through storage.py. Read times include getting typed columns back
+(datetime64 dates, categorical stations), which CSV has to re-parse every time.
+
+    python benchmarks/bench_storage.py [path/to/merged_mbta_weather table]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.storage import BACKENDS, find_table, read_table, write_table
+
+processed_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'processed')
+
+# Columns read by the heatmap-style consumers (projection example)
+PROJECTION = ['service_date', 'station_name', 'gated_entries']
+
+
+def best_time(fn, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else find_table(processed_dir, 'merged_mbta_weather')
+    df = read_table(path)
+    print(f"rows: {len(df)}")
+    print(f"{'format':>8} {'size MB':>8} {'write s':>8} {'read s':>8} {'read 3 cols s':>14} {'frame MB':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, (extension, _, _) in BACKENDS.items():
+            target = os.path.join(tmp, 'merged' + extension)
+            write_s, _ = best_time(lambda: write_table(df, target))
+            read_s, frame = best_time(lambda: read_table(target))
+            proj_s, _ = best_time(lambda: read_table(target, columns=PROJECTION))
+            size = os.path.getsize(target) / 1e6
+            mem = frame.memory_usage(deep=True).sum() / 1e6
+            print(f"{fmt:>8} {size:>8.2f} {write_s:>8.3f} {read_s:>8.3f} {proj_s:>14.3f} {mem:>9.2f}")
+
+            if fmt == 'csv':
+                # How the pipeline read it before storage.py: untyped CSV, dates parsed afterwards
+                def legacy_read():
+                    frame = pd.read_csv(target)
+                    frame['service_date'] = pd.to_datetime(frame['service_date'])
+                    return frame
+                read_s, frame = best_time(legacy_read)
+                mem = frame.memory_usage(deep=True).sum() / 1e6
+                print(f"{'old csv':>8} {size:>8.2f} {'':>8} {read_s:>8.3f} {'':>14} {mem:>9.2f}")
@@ -0,0 +1,57 @@
+"""
+Benchmark: the old whole-frame lag1 / roll7 vs timeFeatures.add_time_series_features,
+on the merged MBTA/weather dataset replicated to 1x, 4x and 16x the stations to
+show the per-station version scales linearly with rows.
+
+    python benchmarks/bench_time_features.py [path/to/merged_mbta_weather.csv]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.timeFeatures import add_time_series_features
+
+default_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'processed', 'merged_mbta_weather.csv')
+
+
+def legacy_time_features(df):
+    # Whole-frame version as it was in run_model_pipeline (mixes stations together)
+    df['lag1']  = df['gated_entries'].shift(1)
+    df['roll7'] = df['gated_entries'].shift(1).rolling(7).mean()
+    return df
+
+
+def replicate_stations(df, factor):
+    # Copies of every station under new names, to grow rows without changing the date range
+    copies = [df.assign(station_name=df['station_name'] + f' #{i}') for i in range(factor)]
+    return pd.concat(copies, ignore_index=True)
+
+
+def best_time(fn, df, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        frame = df.copy()
+        start = time.perf_counter()
+        fn(frame)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def per_station_features(df):
+    return add_time_series_features(df, lags=(1, 7), windows=(7, 28), std_windows=(7,), ewm_spans=(7,))
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else default_path
+    base = pd.read_csv(path, usecols=['service_date', 'station_name', 'gated_entries'], parse_dates=['service_date'])
+
+    print(f"{'rows':>10} {'legacy lag1/roll7':>18} {'per-station lag1/roll7':>23} {'per-station 6 features':>23}")
+    for factor in (1, 4, 16):
+        df = replicate_stations(base, factor).sample(frac=1, random_state=0)
+        legacy = best_time(legacy_time_features, df)
+        default = best_time(add_time_series_features, df)
+        extended = best_time(per_station_features, df)
+        print(f"{len(df):>10} {legacy:>17.4f}s {default:>22.4f}s {extended:>22.4f}s")
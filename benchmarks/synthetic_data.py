@@ -0,0 +1,109 @@
+"""
+Synthetic MBTA gated-entry and weather sources for benchmarks and tests.
+
+Writes the same layout as data/raw, sized by stations x years x time periods:
+yearly GSE-style CSV files (as a folder and as a zip) and a weather CSV in the
+Meteostat format. Entries follow a per-station level, a weekday pattern, a
+seasonal cycle and a rain effect, so the model has something to fit.
+
+    python benchmarks/synthetic_data.py OUTPUT_DIR [--stations 70] [--years 5] [--time-periods 8]
+"""
+import argparse
+import os
+import sys
+import zipfile
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.stations import STATION_COORDS, station_table
+
+
+def station_names(n):
+    # Real station names first (so line / map lookups work), then numbered extras
+    names = list(STATION_COORDS)[:n]
+    return names + [f'Station {i}' for i in range(len(names), n)]
+
+
+def time_period_labels(n):
+    # GSE '(HH:MM:SS)' half-hour buckets from 04:30
+    starts = pd.Timestamp('2000-01-01 04:30') + pd.to_timedelta(np.arange(n) * 30, unit='min')
+    return [t.strftime('(%H:%M:%S)') for t in starts]
+
+
+def synthetic_weather(start='2018-01-01', years=5, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=int(round(365.25 * years)), freq='D')
+    season = np.cos(2 * np.pi * (dates.dayofyear.to_numpy() - 200) / 365.25)
+    tavg = 11 + 12 * season + rng.normal(0, 3, len(dates))
+    return pd.DataFrame({
+        'time': dates.strftime('%Y-%m-%d'),
+        'tavg': tavg.round(1),
+        'tmin': (tavg - rng.uniform(2, 8, len(dates))).round(1),
+        'tmax': (tavg + rng.uniform(2, 8, len(dates))).round(1),
+        'prcp': np.where(rng.random(len(dates)) < 0.3, rng.exponential(6, len(dates)), 0).round(1),
+        'wdir': rng.uniform(0, 360, len(dates)).round(0),
+        'wspd': rng.gamma(4, 3, len(dates)).round(1),
+        'pres': rng.normal(1015, 8, len(dates)).round(1),
+    })
+
+
+def synthetic_mbta_year(year, stations, time_periods, weather, seed=0):
+    """One yearly GSE file: a row per (date, time period, station)."""
+    rng = np.random.default_rng(seed + year)
+    dates = pd.date_range(f'{year}-01-01', f'{year}-12-31', freq='D')
+    periods = time_period_labels(time_periods)
+    names = station_names(stations)
+    lines = station_table(names)['lines'].astype(str).str.replace('Other', 'Red').to_numpy()
+
+    rain = weather.set_index(pd.to_datetime(weather['time']))['prcp'].reindex(dates, fill_value=0).to_numpy()
+    day_factor = np.where(dates.dayofweek >= 5, 0.55, 1.0) * (1 - 0.01 * np.minimum(rain, 30))
+    level = rng.lognormal(7.5, 0.6, stations)
+    share = rng.dirichlet(np.ones(time_periods))
+
+    # (dates x periods x stations) expected entries, Poisson noise
+    expected = day_factor[:, None, None] * share[None, :, None] * level[None, None, :]
+    entries = rng.poisson(expected).ravel()
+
+    n_dates = len(dates)
+    return pd.DataFrame({
+        'service_date': np.repeat(dates.strftime('%Y/%m/%d'), time_periods * stations),
+        'time_period': np.tile(np.repeat(periods, stations), n_dates),
+        'stop_id': np.tile([f'place-{i:04d}' for i in range(stations)], n_dates * time_periods),
+        'station_name': np.tile(names, n_dates * time_periods),
+        'route_or_line': np.tile([f'{line.split("/")[0]} Line' for line in lines], n_dates * time_periods),
+        'gated_entries': entries,
+    })
+
+
+def write_sources(directory, stations=70, years=5, time_periods=8, start_year=2018, seed=0):
+    """
+    Write yearly_mbta_data/ (one CSV per year), yearly_mbta_data.zip and
+    weather_data.csv under `directory`. Returns their paths.
+    """
+    folder = os.path.join(directory, 'yearly_mbta_data')
+    os.makedirs(folder, exist_ok=True)
+    weather = synthetic_weather(f'{start_year}-01-01', years, seed)
+    weather_path = os.path.join(directory, 'weather_data.csv')
+    weather.to_csv(weather_path, index=False)
+
+    zip_path = os.path.join(directory, 'yearly_mbta_data.zip')
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for year in range(start_year, start_year + years):
+            path = os.path.join(folder, f'GSE_{year}.csv')
+            synthetic_mbta_year(year, stations, time_periods, weather, seed).to_csv(path, index=False)
+            zf.write(path, f'yearly_mbta_data/GSE_{year}.csv')
+    return {'folder': folder, 'zip': zip_path, 'weather': weather_path}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('output_dir')
+    parser.add_argument('--stations', type=int, default=70)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--time-periods', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    paths = write_sources(args.output_dir, args.stations, args.years, args.time_periods, seed=args.seed)
+    for name, path in paths.items():
+        print(f"{name:>8}: {path}")
@@ -26,12 +26,13 @@ python -m pip install --upgrade pip
 pip install -r requirements.txt
 
 echo "Running preprocessing..."
-python src/data/processing.py
+python tcast.py process
 
 echo "Running model pipeline..."
-python src/data/tuningModel.py
+python tcast.py evaluate
+python tcast.py train
 
 echo "Running visualization..."
-python visualization.py
+python tcast.py viz --html heatmap.html
 
 echo "Project completed successfully!"
@@ -0,0 +1,151 @@
+"""
+Parallel backtesting and hyperparameter search for the station-aware ridge model
+
+A grid of configurations (feature subset x polynomial degree x alpha) is
+evaluated on rolling-origin folds: train on every day up to a cutoff, test on
+the following horizon_days. Work is split into one task per
+(fold, feature subset, degree) and spread over a joblib process pool:
+
+  - the base feature matrix, station codes, targets and day numbers are plain
+    NumPy arrays, which joblib hands to the workers as read-only memory maps,
+    so every worker shares one copy instead of pickling the data per task
+  - inside a task the fold's preprocessing (sparse design matrix, scaling and
+    the centered normal equations) is built once and the whole alpha grid is
+    solved from it (ridge.ridge_path), so a dense grid costs about one solve
+
+Results are collected in a per-fold table and summarized as a leaderboard.
+"""
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from .designMatrix import station_polynomial_matrix
+from .featureCache import FeatureCache
+from .ridge import normal_equations, ridge_path
+from .storage import write_table
+from .tuningModel import default_merged_path, load_feature_frame, model_feature_columns
+
+WEATHER_COLUMNS = ['tavg', 'tmin', 'tmax', 'prcp', 'wspd']
+
+
+def default_feature_sets():
+    full = model_feature_columns()
+    return {
+        'all': full,
+        'no_weather': [c for c in full if c not in WEATHER_COLUMNS],
+        'no_lags': [c for c in full if not c.startswith(('lag', 'roll', 'ewm'))],
+    }
+
+
+def rolling_origin_cutoffs(start, end, n_splits, step_days):
+    # n_splits cutoffs ending at `end`, step_days apart, none before `start`
+    end = pd.Timestamp(end)
+    cutoffs = [end - pd.Timedelta(days=step_days * i) for i in range(n_splits)][::-1]
+    return [c for c in cutoffs if c >= pd.Timestamp(start)]
+
+
+def _evaluate(base, codes, y, days, n_stations, columns, degree, alphas, cutoff_day, horizon_days):
+    """One fold x feature subset x degree: build the design matrix once, solve every alpha."""
+    train = days <= cutoff_day
+    test = (days > cutoff_day) & (days <= cutoff_day + horizon_days)
+    if train.sum() == 0 or test.sum() == 0:
+        return []
+
+    Z_train = station_polynomial_matrix(base[train][:, columns], codes[train], n_stations, degree)
+    Z_test = station_polynomial_matrix(base[test][:, columns], codes[test], n_stations, degree)
+
+    # StandardScaler(with_mean=False) on the training rows, applied through the normal equations
+    gram, xty, x_mean, y_mean = normal_equations(Z_train, y[train])
+    scale = np.sqrt(np.maximum(np.diag(gram), 0) / train.sum())
+    scale[scale == 0] = 1.0
+    gram_scaled = gram / np.outer(scale, scale)
+    xty_scaled = xty / scale
+
+    # Whole alpha grid at once (one eigendecomposition for long grids)
+    coefs = ridge_path(gram_scaled, xty_scaled, alphas) / scale[:, None]
+    preds = np.asarray(Z_test @ coefs) + (y_mean - x_mean @ coefs)
+
+    rows = []
+    for alpha, pred in zip(alphas, preds.T):
+        pred = np.clip(np.rint(pred), 0, None)
+        err = pred - y[test]
+        rows.append({
+            'alpha': alpha,
+            'n_train': int(train.sum()),
+            'n_test': int(test.sum()),
+            'rmse': float(np.sqrt(np.mean(err ** 2))),
+            'mae': float(np.mean(np.abs(err))),
+        })
+    return rows
+
+
+def evaluate_grid(
+    df,
+    alphas=(0.1, 1.0, 10.0),
+    degrees=(2,),
+    feature_sets=None,
+    cutoffs=('2022-03-01',),
+    horizon_days=365,
+    n_jobs=-1
+):
+    """
+    Per-fold results for every configuration on a feature frame (see
+    tuningModel.build_feature_frame). feature_sets maps a name to a list of
+    non-station columns; station interactions are always included.
+    """
+    feature_sets = feature_sets or default_feature_sets()
+    all_columns = list(dict.fromkeys(c for cols in feature_sets.values() for c in cols))
+    position = {c: i for i, c in enumerate(all_columns)}
+
+    # Shared read-only inputs (memory-mapped into the workers by joblib)
+    base = df[all_columns].to_numpy(dtype=np.float64)
+    codes, stations = pd.factorize(df['station_name'], sort=True)
+    codes = codes - 1  # first station is the dropped baseline, like get_dummies(drop_first=True)
+    y = df['gated_entries'].to_numpy(dtype=np.float64)
+    origin = df['service_date'].min()
+    days = ((df['service_date'] - origin) // pd.Timedelta(days=1)).to_numpy()
+    n_stations = len(stations) - 1
+
+    tasks = []
+    for cutoff in cutoffs:
+        cutoff_day = (pd.Timestamp(cutoff) - origin) // pd.Timedelta(days=1)
+        for name, cols in feature_sets.items():
+            for degree in degrees:
+                tasks.append(((cutoff, name, degree), (
+                    [position[c] for c in cols], degree, list(alphas), cutoff_day, horizon_days
+                )))
+
+    outputs = Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r')(
+        delayed(_evaluate)(base, codes, y, days, n_stations, *args) for _, args in tasks
+    )
+
+    rows = []
+    for (cutoff, name, degree), fold_rows in zip((t[0] for t in tasks), outputs):
+        for row in fold_rows:
+            rows.append({'cutoff': pd.Timestamp(cutoff), 'features': name, 'degree': degree, **row})
+    return pd.DataFrame(rows)
+
+
+def leaderboard(results):
+    # Mean error over folds per configuration, best first
+    board = results.groupby(['features', 'degree', 'alpha'], as_index=False).agg(
+        folds=('cutoff', 'nunique'),
+        rmse=('rmse', 'mean'),
+        rmse_std=('rmse', 'std'),
+        mae=('mae', 'mean'),
+    )
+    return board.sort_values('rmse', ignore_index=True)
+
+
+def run_backtest(
+    csv_path=None,
+    output_path=None,
+    use_cache=True,
+    **grid
+):
+    """Leaderboard for a grid (see evaluate_grid) on a stored merged table, optionally written to output_path."""
+    df = load_feature_frame(csv_path or default_merged_path(), cache=FeatureCache() if use_cache else None)
+    board = leaderboard(evaluate_grid(df, **grid))
+    if output_path:
+        write_table(board, output_path)
+    return board
@@ -0,0 +1,90 @@
+"""
+Calendar and holiday features for the ridership model
+
+Every calendar feature only depends on the service date, and the merged data
+has ~70 station rows per date. So the features are computed once per unique
+date with vectorized NumPy (np.searchsorted over the sorted holiday array for
+the holiday distances) and broadcast back to the rows by integer index lookup.
+"""
+import numpy as np
+import pandas as pd
+import holidays
+
+SEASONS = ['fall', 'spring', 'summer', 'winter']
+
+# Season code per month (index 0 unused): Dec-Feb winter, Mar-May spring, Jun-Aug summer, else fall
+_MONTH_SEASON = np.array([0, 3, 3, 1, 1, 1, 2, 2, 2, 0, 0, 0, 3])
+
+
+def month_to_season(months):
+    # Vectorized season lookup, returned as a categorical so get_dummies always sees all four seasons
+    codes = _MONTH_SEASON[np.asarray(months, dtype=np.int64)]
+    return pd.Categorical.from_codes(codes, categories=SEASONS)
+
+
+def holiday_array(years):
+    # Sorted US holiday dates (including observed days) as datetime64[D]
+    us_hols = holidays.US(years=sorted(set(int(y) for y in years)))
+    return np.array(sorted(us_hols.keys()), dtype='datetime64[D]')
+
+
+def holiday_distances(dates, holiday_dates):
+    """
+    Days until the next holiday and days since the previous one (0 on a holiday).
+
+    NaN where there is no holiday after / before the date, same as the old
+    per-row list comprehensions.
+    """
+    days = np.asarray(dates, dtype='datetime64[D]')
+    hols = np.asarray(holiday_dates, dtype='datetime64[D]')
+
+    to_next = np.full(days.shape, np.nan)
+    nxt = np.searchsorted(hols, days, side='left')
+    ok = nxt < len(hols)
+    to_next[ok] = (hols[nxt[ok]] - days[ok]).astype(np.int64)
+
+    from_prev = np.full(days.shape, np.nan)
+    prv = np.searchsorted(hols, days, side='right') - 1
+    ok = prv >= 0
+    from_prev[ok] = (days[ok] - hols[prv[ok]]).astype(np.int64)
+
+    return to_next, from_prev
+
+
+def calendar_table(dates, holiday_years=None):
+    """
+    Calendar features for a set of unique dates, one row per date. Holiday
+    distances use the holidays of holiday_years (default: the dates' years and
+    the neighbouring ones, so distances near New Year are defined).
+    """
+    dates = pd.DatetimeIndex(dates)
+    if holiday_years is None:
+        holiday_years = range(dates.year.min() - 1, dates.year.max() + 2) if len(dates) else []
+    hols = holiday_array(holiday_years)
+    to_next, from_prev = holiday_distances(dates.values, hols)
+
+    month = dates.month.to_numpy()
+    day_of_week = dates.dayofweek.to_numpy()
+    month_norm = 2 * np.pi * (month - 1) / 12
+
+    return pd.DataFrame({
+        'day_of_week': day_of_week,
+        'is_weekend': (day_of_week >= 5).astype(int),
+        'month': month,
+        'season': month_to_season(month),
+        'is_holiday': (to_next == 0).astype(int),
+        'days_to_next_hol': to_next,
+        'days_from_prev_hol': from_prev,
+        'week_start': dates - pd.to_timedelta(day_of_week, unit='D'),
+        'month_sin': np.sin(month_norm),
+        'month_cos': np.cos(month_norm),
+    }, index=dates)
+
+
+def add_calendar_features(df, date_col='service_date', holiday_years=None):
+    # Compute the table once per unique date and broadcast it to the rows by position
+    codes, uniques = pd.factorize(df[date_col])
+    table = calendar_table(uniques, holiday_years)
+    for col in table.columns:
+        df[col] = table[col].array.take(codes)
+    return df
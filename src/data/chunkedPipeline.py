@@ -0,0 +1,241 @@
+"""
+Out-of-core (chunked) execution of combine_data and the model pipeline
+
+The tables are streamed in batches (storage.iter_table) and regrouped into
+date-range chunks, e.g. one calendar year each, so memory depends on the
+chunk size instead of the length of the history:
+
+  - combine_data_chunked merges each chunk of processed_mbta with the weather
+    by day-offset lookup (weatherStore.WeatherStore) and appends it to the merged table (one Parquet row
+    group per chunk)
+  - iter_feature_chunks builds the model features chunk by chunk; the last
+    days of the previous chunk are carried over so lags and rolling windows
+    see across the boundary, each station's last feature values too (a
+    timeFeatures.FeatureState) for stations silent longer than those days,
+    and holiday distances use the whole table's years (and the neighbouring
+    ones)
+  - run_model_pipeline_chunked accumulates X^T X / X^T y of the sparse design
+    matrix per chunk (ridge.GramAccumulator) and solves the ridge once. The
+    training rows are counted in a first pass over the features, so they can
+    be accumulated into the TimeSeriesSplit blocks of ridge.RidgePathCV and
+    the alpha is picked with the same rolling-origin folds as in memory.
+
+The tables have to be sorted by service_date, as the pipeline writes them.
+"""
+import numpy as np
+import pandas as pd
+
+from .designMatrix import station_polynomial_matrix
+from .instrumentation import record, span, traced
+from . import config
+from .predictionWriter import PredictionWriter
+from .processing import MBTA_COLUMNS
+from .ridge import GramAccumulator, cross_validate_blocks, time_series_bounds
+from .schema import concat_tables, validate
+from .storage import TableWriter, find_table, iter_table, read_table, table_path, write_table
+from .timeFeatures import EWM_SPANS, LAGS, STD_WINDOWS, WINDOWS, FeatureState, history_days, time_feature_columns
+from .tuningModel import MODEL_COLUMNS, build_feature_frame, default_merged_path, model_feature_columns, rows_without_features
+from .weatherStore import WeatherStore
+
+PREDICTION_COLUMNS = ['service_date', 'station_name', 'tavg', 'prcp', 'wspd']
+
+
+def iter_date_chunks(batches, freq='Y', date_col='service_date'):
+    """Regroup date-sorted batches into one DataFrame per calendar period (a pandas Period freq)."""
+    buffer, key, last = [], None, None
+    for batch in batches:
+        if not len(batch):
+            continue
+        dates = batch[date_col]
+        if not dates.is_monotonic_increasing or (last is not None and dates.iloc[0] < last):
+            raise ValueError(f"Chunked processing needs tables sorted by {date_col}")
+        last = dates.iloc[-1]
+
+        ordinals = dates.dt.to_period(freq).array.asi8
+        cuts = np.flatnonzero(np.diff(ordinals)) + 1
+        for start, end in zip(np.r_[0, cuts], np.r_[cuts, len(batch)]):
+            if key is not None and ordinals[start] != key:
+                yield concat_tables(buffer)
+                buffer = []
+            key = ordinals[start]
+            buffer.append(batch.iloc[start:end])
+    if buffer:
+        yield concat_tables(buffer)
+
+
+@traced()
+def combine_data_chunked(
+    mbta_path=None,
+    weather_path=None,
+    output_path=None,
+    freq='Y',
+    batch_rows=250_000
+):
+    """Write merged_mbta_weather from processed_mbta one date chunk at a time."""
+    mbta_path = mbta_path or find_table(config.processed_dir(), 'processed_mbta')
+    weather_path = weather_path or find_table(config.processed_dir(), 'processed_weather')
+    output_path = output_path or table_path(config.processed_dir(), 'merged_mbta_weather')
+
+    # Weather is one row per day, small enough to keep as the lookup table
+    weather = WeatherStore.from_frame(validate(read_table(weather_path), 'weather'))
+    rows_in = 0
+    with TableWriter(output_path) as writer:
+        for chunk in iter_date_chunks(iter_table(mbta_path, MBTA_COLUMNS, batch_rows), freq):
+            rows_in += len(chunk)
+            writer.write(validate(weather.join(chunk), 'merged'))
+    record(rows_in=rows_in, rows_out=writer.rows)
+    return output_path
+
+
+def scan_table(path, batch_rows=250_000):
+    # Sorted station names and (first, last) service_date, reading only those two columns
+    stations, first, last = set(), None, None
+    for batch in iter_table(path, ['service_date', 'station_name'], batch_rows):
+        stations.update(batch['station_name'].astype(str).unique())
+        first = batch['service_date'].min() if first is None else min(first, batch['service_date'].min())
+        last = batch['service_date'].max() if last is None else max(last, batch['service_date'].max())
+    return pd.Index(sorted(stations)), first, last
+
+
+def iter_feature_chunks(
+    csv_path,
+    freq='Y',
+    lags=LAGS,
+    windows=WINDOWS,
+    std_windows=STD_WINDOWS,
+    ewm_spans=EWM_SPANS,
+    holiday_years=None,
+    batch_rows=250_000
+):
+    """
+    Feature frames (tuningModel.build_feature_frame) of a stored merged table,
+    one per date chunk. The previous chunk's last history_days days are
+    prepended before computing the features and dropped again, and every
+    station's features on the previous chunk's last day are carried over
+    (FeatureState), so the rows get the same lags / rolling windows as on the
+    whole table, across gaps of any length (EWMs are truncated to the carried
+    days, see timeFeatures.history_days).
+    """
+    carry = history_days(lags, windows, std_windows, ewm_spans)
+    tail = None
+    state = FeatureState()
+    for chunk in iter_date_chunks(iter_table(csv_path, MODEL_COLUMNS, batch_rows), freq):
+        chunk = validate(chunk, 'merged')
+        start = chunk['service_date'].iloc[0]
+        rows = chunk if tail is None else concat_tables([tail, chunk])
+        features = build_feature_frame(rows, lags, windows, std_windows, ewm_spans, holiday_years=holiday_years,
+                                       state=state)
+        yield features[features['service_date'] >= start].reset_index(drop=True)
+
+        end = chunk['service_date'].iloc[-1]
+        tail = rows[rows['service_date'] > end - pd.Timedelta(days=carry)][MODEL_COLUMNS]
+
+
+@traced()
+def run_model_pipeline_chunked(
+    csv_path=None,
+    output_csv='mbta_test_predictions.csv',
+    train_end='2022-03-01',
+    test_end='2023-03-01',
+    freq='Y',
+    alphas=(0.1, 1.0, 10.0),
+    n_splits=5,
+    degree=2,
+    lags=LAGS,
+    windows=WINDOWS,
+    std_windows=STD_WINDOWS,
+    ewm_spans=EWM_SPANS,
+    batch_rows=250_000,
+    partition_by=None,
+    errors_path=None
+):
+    """
+    Same model and predictions as run_model_pipeline (up to the truncated
+    EWMs, see iter_feature_chunks), fitted from per-chunk normal equations
+    instead of the whole feature frame: the alpha is picked by RidgePathCV's
+    rolling-origin search over n_splits folds of the training rows. Test rows
+    without features are written unscored, like run_model_pipeline does.
+    Returns the test RMSE.
+    """
+    csv_path = csv_path or default_merged_path()
+    feature_config = dict(lags=lags, windows=windows, std_windows=std_windows, ewm_spans=ewm_spans)
+    x_cols = model_feature_columns(time_feature_columns(**feature_config))
+    train_end, test_end = pd.Timestamp(train_end), pd.Timestamp(test_end)
+
+    # Station dummy order of the whole table (like get_dummies) and the holiday years
+    stations, first, last = scan_table(csv_path, batch_rows)
+    n_stations = len(stations) - 1
+    years = range(first.year - 1, last.year + 2)
+
+    def feature_chunks():
+        return iter_feature_chunks(csv_path, freq, **feature_config, holiday_years=years, batch_rows=batch_rows)
+
+    def design(features):
+        codes = stations.get_indexer(features['station_name'].astype(str)) - 1
+        base = features[x_cols].to_numpy(dtype=np.float64)
+        return station_polynomial_matrix(base, codes, n_stations, degree=degree)
+
+    # First pass: the number of training rows fixes the TimeSeriesSplit blocks
+    with span('count_rows') as s:
+        n_train = sum(int((features['service_date'] <= train_end).sum()) for features in feature_chunks())
+        s.set(rows_out=n_train)
+    if not n_train:
+        raise ValueError(f"No training rows up to {train_end.date()} in {csv_path}")
+    bounds = time_series_bounds(n_train, n_splits)
+
+    blocks = [GramAccumulator() for _ in bounds[1:]]
+    test_parts = []
+    seen = 0
+    with span('fit_chunks') as s:
+        for features in feature_chunks():
+            dates = features['service_date']
+            y = features['gated_entries'].to_numpy(dtype=np.float64)
+            Z = design(features)
+
+            # Training rows come first in date order, cut at the block bounds
+            n_rows = int((dates <= train_end).sum())
+            for block, a, b in zip(blocks, bounds[:-1], bounds[1:]):
+                lo, hi = max(a - seen, 0), min(b - seen, n_rows)
+                if lo < hi:
+                    block.add(Z[lo:hi], y[lo:hi])
+            seen += n_rows
+
+            # Test rows are kept (one horizon of rows, not the history) and scored after the fit
+            test_rows = ((dates > train_end) & (dates <= test_end)).to_numpy()
+            if test_rows.any():
+                part = features.loc[test_rows, PREDICTION_COLUMNS + ['gated_entries']]
+                test_parts.append((part, Z[test_rows]))
+        s.set(rows_in=seen, features=blocks[0].gram.shape[0])
+
+    # Folds on the columns scaled by the std of all training rows, as the pipeline's
+    # StandardScaler does before RidgePathCV; then refit on every training day
+    std = sum(blocks[1:], blocks[0]).std()
+    scores, train = cross_validate_blocks([block.scaled(std) for block in blocks], alphas)
+    alpha = float(alphas[np.argmax(scores.mean(axis=0))])
+    coef, intercept = train.solve(alpha, scale=False)
+    coef = coef / std
+    record(alpha=alpha)
+
+    # Test days of stations without history yet are written unscored (NaN), with their chunk
+    keys = pd.DataFrame(columns=['service_date', 'station_name'])
+    if test_parts:
+        keys = concat_tables([part[['service_date', 'station_name']] for part, _ in test_parts])
+    unscored = rows_without_features(csv_path, keys, train_end + pd.Timedelta(days=1), test_end)
+    chunks = {}
+    for part, Z in test_parts:
+        period = part['service_date'].iloc[0].to_period(freq)
+        chunks[period] = [(part, np.asarray(Z @ coef).ravel() + intercept)]
+    for period, rows in unscored.groupby(unscored['service_date'].dt.to_period(freq), sort=True):
+        chunks.setdefault(period, []).append((rows[PREDICTION_COLUMNS + ['gated_entries']], np.full(len(rows), np.nan)))
+
+    # One write per chunk, in date order (see predictionWriter.py)
+    with PredictionWriter(output_csv, partition_by=partition_by) as writer:
+        for period in sorted(chunks):
+            frames, predicted = zip(*chunks[period])
+            writer.write(concat_tables(list(frames)), np.concatenate(predicted))
+    if errors_path:
+        write_table(writer.errors.to_frame(), errors_path)
+
+    overall = writer.errors.overall()
+    record(rmse=float(overall['rmse']), mae=float(overall['mae']), mape=float(overall['mape']))
+    return float(overall['rmse'])
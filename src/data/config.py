@@ -0,0 +1,53 @@
+"""
+Locations of the pipeline's data
+
+Every table, model and cache lives under one data directory, <repo>/data by
+default. Set TCAST_DATA_DIR (or call configure(data_dir=...), or pass
+tcast.py --data-dir) to run the whole pipeline against another directory.
+
+The stages resolve their default paths through these functions when they run,
+not when their module is imported, so configuring after import works and
+importing a module touches nothing on disk.
+"""
+import os
+
+_repo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+_settings = {
+    'data_dir': os.environ.get('TCAST_DATA_DIR') or os.path.join(_repo_dir, 'data'),
+}
+
+
+def configure(data_dir=None):
+    if data_dir is not None:
+        _settings['data_dir'] = os.path.abspath(data_dir)
+
+
+def data_dir(*parts):
+    return os.path.join(_settings['data_dir'], *parts)
+
+
+def raw_dir(*parts):
+    return data_dir('raw', *parts)
+
+
+def processed_dir(*parts):
+    return data_dir('processed', *parts)
+
+
+def models_dir(*parts):
+    return data_dir('models', *parts)
+
+
+def cache_dir(*parts):
+    return data_dir('cache', *parts)
+
+
+def predictions_path():
+    # Default test predictions of tcast.py evaluate, read by viz
+    return processed_dir('mbta_test_predictions.csv')
+
+
+def model_path():
+    # Default artifact of predictor.train_model
+    return models_dir('ridership_model.joblib')
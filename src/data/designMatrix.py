@@ -0,0 +1,93 @@
+"""
+Sparse design matrix for the station-aware ridge pipeline
+
+PolynomialFeatures over [base features, station dummies] produces thousands of
+dense columns, but most of them are structurally zero: a row belongs to exactly
+one station, so every dummy x dummy product between two stations is 0 and every
+base x dummy product is 0 outside that station. This module builds the same
+non-zero terms directly as a scipy.sparse matrix:
+
+  - the full polynomial expansion of the base features (small and dense)
+  - for each station, its dummy times every base monomial of lower degree
+    (this covers dummy, dummy^2, base x dummy, ...)
+
+Always-zero columns are skipped. Powers of a dummy are equal to the dummy itself
+and are kept as duplicate columns, so after scaling the ridge penalty is the
+same as with the dense PolynomialFeatures matrix and predictions match it.
+"""
+import math
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.preprocessing import PolynomialFeatures
+
+
+def station_codes(dummies):
+    # Integer station code per row from a one-hot block, -1 for the dropped baseline station
+    dummies = np.asarray(dummies, dtype=bool)
+    codes = dummies.argmax(axis=1).astype(np.int64)
+    codes[~dummies.any(axis=1)] = -1
+    return codes
+
+
+def _monomials(base, degree, include_bias):
+    if degree == 0:
+        return np.ones((base.shape[0], 1))
+    return PolynomialFeatures(degree=degree, include_bias=include_bias).fit_transform(base)
+
+
+def station_polynomial_matrix(base, codes, n_stations, degree=2):
+    """
+    Sparse equivalent of PolynomialFeatures(degree, include_bias=False) applied to
+    [base, one-hot(codes)], without the always-zero dummy x dummy columns.
+
+    base:       (n_rows, n_base) array of non-station features
+    codes:      (n_rows,) station codes in [0, n_stations), -1 for the baseline station
+    """
+    base = np.asarray(base, dtype=np.float64)
+    codes = np.asarray(codes, dtype=np.int64)
+    n_rows = base.shape[0]
+
+    blocks = [sp.csr_matrix(_monomials(base, degree, include_bias=False))]
+
+    # d_i^c * m(base) for every dummy power c and every base monomial m with deg(m) <= degree - c
+    rows = np.flatnonzero(codes >= 0)
+    for power in range(1, degree + 1):
+        # Monomials of degree <= degree - power, bias included (none to compute when every row is baseline)
+        width = math.comb(base.shape[1] + degree - power, degree - power)
+        mono = _monomials(base[rows], degree - power, include_bias=True) if len(rows) else np.empty((0, width))
+        cols = codes[rows, None] * width + np.arange(width)
+        block = sp.csr_matrix(
+            (mono.ravel(), (np.repeat(rows, width), cols.ravel())),
+            shape=(n_rows, n_stations * width)
+        )
+        blocks.append(block)
+
+    return sp.hstack(blocks, format='csr')
+
+
+class StationPolynomialFeatures(TransformerMixin, BaseEstimator):
+    """
+    Drop-in replacement for PolynomialFeatures when the trailing columns of X are
+    station dummies (as produced by pd.get_dummies). Returns a CSR matrix, so it
+    should be followed by StandardScaler(with_mean=False) and a sparse-aware ridge.
+    """
+
+    def __init__(self, n_base, degree=2):
+        self.n_base = n_base
+        self.degree = degree
+
+    def fit(self, X, y=None):
+        self.n_stations_ = X.shape[1] - self.n_base
+        return self
+
+    def transform(self, X):
+        # Split without np.asarray(X) so a mixed float/bool DataFrame never becomes an object array
+        if hasattr(X, 'iloc'):
+            base = X.iloc[:, :self.n_base].to_numpy(dtype=np.float64)
+            dummies = X.iloc[:, self.n_base:].to_numpy(dtype=bool)
+        else:
+            base = np.asarray(X[:, :self.n_base], dtype=np.float64)
+            dummies = X[:, self.n_base:]
+        codes = station_codes(dummies)
+        return station_polynomial_matrix(base, codes, self.n_stations_, degree=self.degree)
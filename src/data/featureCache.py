@@ -0,0 +1,78 @@
+"""
+On-disk cache of feature frames between processing and model fitting
+
+Entries are uncompressed Arrow IPC (Feather v2) files named by a content key,
+read back with memory mapping, so a hit costs little more than opening the file.
+Each hit touches the file's mtime, and after every write the least recently
+used entries are evicted until the cache fits max_bytes / max_entries.
+"""
+import hashlib
+import json
+import os
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from . import config
+
+
+class FeatureCache:
+
+    def __init__(self, directory=None, max_bytes=2 * 1024 ** 3, max_entries=16):
+        self.directory = directory or config.cache_dir('features')
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key(*parts):
+        # Stable hash of anything JSON can represent (tuples become lists)
+        blob = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.arrow')
+
+    def get(self, key):
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        table = feather.read_table(path, memory_map=True)
+        return table.to_pandas(split_blocks=True)
+
+    def put(self, key, df):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        # Write then rename, so a concurrent reader never sees a partial file
+        feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), path + '.tmp', compression='uncompressed')
+        os.replace(path + '.tmp', path)
+        self.evict()
+
+    def get_or_build(self, key, build):
+        df = self.get(key)
+        if df is None:
+            df = build()
+            self.put(key, df)
+        return df
+
+    def entries(self):
+        # (mtime, size, path) for every cached file, least recently used first
+        if not os.path.isdir(self.directory):
+            return []
+        out = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.arrow'):
+                stat = os.stat(os.path.join(self.directory, name))
+                out.append((stat.st_mtime, stat.st_size, os.path.join(self.directory, name)))
+        return sorted(out)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        while entries and (total > self.max_bytes or len(entries) > self.max_entries):
+            _, size, path = entries.pop(0)
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
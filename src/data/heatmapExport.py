@@ -0,0 +1,209 @@
+"""
+Compact exports of the station error heatmap
+
+  - export_html writes one standalone HTML file. The figure holds a single
+    base trace; the (date x station) actual / predicted / error arrays are
+    embedded once as base64 int32 row deltas (each date minus the previous
+    one) and a short script expands them into frames in the browser, so a
+    frame costs a few bytes per station instead of a full JSON trace.
+    Station-days without a row are sent as 0 with a present mask and get no
+    marker.
+  - aggregate_cube / decimate_cube shrink long ranges to weekly or monthly
+    means, or every n-th date, before exporting.
+  - render_frames draws frames to PNG with matplotlib (no browser needed),
+    splitting the frames into chunks over a process pool; write_gif stitches
+    the PNGs into an animated GIF with Pillow.
+"""
+import base64
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import plotly.io as pio
+
+from .heatmapFrames import ERROR_CMAX, HeatmapCube, animation_controls, base_layout, base_trace, check_dates, frame_title
+
+# freq -> (title, label format) of aggregated cubes
+PERIODS = {
+    'W': ('Mean daily entries, week of', '%Y-%m-%d'),
+    'M': ('Mean daily entries,', '%Y-%m'),
+}
+
+
+def take_dates(cube, index, dates=None, **overrides):
+    # Cube restricted to the dates at positions `index`
+    fields = dict(
+        dates=cube.dates[index] if dates is None else dates,
+        stations=cube.stations,
+        actual=cube.actual[index],
+        predicted=cube.predicted[index],
+        weather=cube.weather[index],
+        max_px=cube.max_px,
+        coords=cube.coords,
+        error=cube.error[index],
+        present=cube.present[index],
+        title=cube.title,
+        label_format=cube.label_format,
+        peak=cube.peak,
+    )
+    fields.update(overrides)
+    return HeatmapCube(**fields)
+
+
+def present_values(cube, values):
+    # Values of the station-days with a row, 0 elsewhere (where they may be NaN)
+    return np.where(cube.present, values, 0.0)
+
+
+def decimate_cube(cube, step):
+    """Every step-th date of the cube."""
+    return take_dates(cube, np.arange(0, len(cube), step))
+
+
+def aggregate_cube(cube, freq='W'):
+    """
+    Mean daily actual / predicted entries and mean absolute error per station
+    over each week ('W') or month ('M'), counting only days a station has data.
+    """
+    title, label_format = PERIODS[freq]
+    periods = cube.dates.to_period(freq)
+    starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+
+    present = cube.present.astype(np.float64)
+    counts = np.add.reduceat(present, starts, axis=0)
+    denom = np.maximum(counts, 1)
+
+    def mean(values):
+        return np.add.reduceat(present_values(cube, values), starts, axis=0) / denom
+
+    days = np.diff(np.r_[starts, len(cube)])[:, None]
+    weather = np.add.reduceat(cube.weather, starts, axis=0) / days
+
+    return HeatmapCube(
+        periods[starts].start_time, cube.stations, mean(cube.actual), mean(cube.predicted), weather,
+        max_px=cube.max_px, coords=cube.coords, error=mean(cube.error), present=counts > 0,
+        title=title, label_format=label_format,
+    )
+
+
+def encode_deltas(values):
+    # (dates x stations) array -> base64 of int32 differences between consecutive dates
+    values = np.rint(np.asarray(values, dtype=np.float64))
+    if not np.isfinite(values).all() or np.abs(values).max(initial=0) > np.iinfo(np.int32).max:
+        raise ValueError("encode_deltas needs finite values in the int32 range (zero-fill missing cells first)")
+    ints = values.astype(np.int32)
+    deltas = np.diff(ints, axis=0, prepend=np.zeros((1, ints.shape[1]), dtype=np.int32))
+    return base64.b64encode(deltas.astype('<i4').tobytes()).decode('ascii')
+
+
+def decode_deltas(encoded, n_stations):
+    # Inverse of encode_deltas (what the exported page does in JavaScript, int32 wraparound included)
+    deltas = np.frombuffer(base64.b64decode(encoded), dtype='<i4').reshape(-1, n_stations)
+    return np.cumsum(deltas, axis=0, dtype=np.int32)
+
+
+# Expands the embedded arrays into frames once the base figure is drawn
+_FRAMES_SCRIPT = """
+var gd = document.getElementById('{plot_id}');
+var payload = %s;
+var n = payload.n;
+function decode(b64) {
+    var bin = atob(b64), bytes = new Uint8Array(bin.length);
+    for (var i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+    var out = new Int32Array(bytes.buffer);
+    for (var i = n; i < out.length; i++) out[i] += out[i - n];
+    return out;
+}
+var actual = decode(payload.actual), predicted = decode(payload.predicted), error = decode(payload.error);
+var present = decode(payload.present);
+var peak = payload.peak;
+var frames = payload.labels.map(function(label, d) {
+    var size = [], color = [], custom = [];
+    for (var s = 0; s < n; s++) {
+        var k = d * n + s;
+        // Station-days without a row (or without a prediction) get no marker
+        size.push(present[k] && peak > 0 ? actual[k] / peak * payload.maxPx : 0);
+        color.push(error[k]);
+        custom.push([actual[k], error[k], predicted[k]]);
+    }
+    return {name: label, traces: [0], layout: {title: {text: payload.titles[d]}},
+            data: [{marker: {size: size, color: color, coloraxis: 'coloraxis'}, customdata: custom}]};
+});
+Plotly.addFrames(gd, frames);
+"""
+
+
+def export_html(cube, path, include_plotlyjs=True, duration=200):
+    """
+    Write the animation as one HTML file. include_plotlyjs=True embeds
+    plotly.js so the file works offline; 'cdn' loads it from the web instead.
+    """
+    check_dates(cube)
+    labels = cube.labels()
+    layout = base_layout(f"{cube.title} {labels[0]}")
+    layout.update(animation_controls(labels, duration))
+    payload = {
+        'n': len(cube.stations),
+        'maxPx': cube.max_px,
+        'peak': float(cube.peak),
+        'labels': labels,
+        'titles': [frame_title(label, w, cube.title) for label, w in zip(labels, cube.weather)],
+        'actual': encode_deltas(present_values(cube, cube.actual)),
+        'predicted': encode_deltas(present_values(cube, cube.predicted)),
+        'error': encode_deltas(present_values(cube, cube.error)),
+        'present': encode_deltas(cube.present),
+    }
+    fig = {'data': [base_trace(cube)], 'layout': layout}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    pio.write_html(fig, path, include_plotlyjs=include_plotlyjs, validate=False,
+                   post_script=_FRAMES_SCRIPT % json.dumps(payload))
+    return path
+
+
+def _render_chunk(cube, indices, out_dir, dpi):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LinearSegmentedColormap
+
+    cmap = LinearSegmentedColormap.from_list('error', ['green', 'red'])
+    labels = cube.labels()
+    fig, ax = plt.subplots(figsize=(8, 8))
+    paths = []
+    for local, i in enumerate(indices):
+        ax.clear()
+        ax.set_xlim(0, 100)
+        ax.set_ylim(0, 100)
+        ax.axis('off')
+        # Plotly sizes are diameters in px, matplotlib's are areas in points^2
+        ax.scatter(cube.xs, cube.ys, s=cube.size[local] ** 2, c=cube.error[local],
+                   cmap=cmap, vmin=0, vmax=ERROR_CMAX)
+        ax.set_title(frame_title(labels[local], cube.weather[local], cube.title), fontsize=10)
+        path = os.path.join(out_dir, f'frame_{i:05d}.png')
+        fig.savefig(path, dpi=dpi)
+        paths.append(path)
+    plt.close(fig)
+    return paths
+
+
+def render_frames(cube, out_dir, n_jobs=None, chunk_size=32, dpi=100):
+    """Draw every frame of the cube to out_dir/frame_NNNNN.png; returns the paths in order."""
+    os.makedirs(out_dir, exist_ok=True)
+    chunks = [np.arange(i, min(i + chunk_size, len(cube))) for i in range(0, len(cube), chunk_size)]
+    # Workers only receive their own dates (take_dates keeps the full cube's size scale)
+    jobs = [(take_dates(cube, idx), idx, out_dir, dpi) for idx in chunks]
+
+    if n_jobs == 1 or len(jobs) <= 1:
+        return [p for job in jobs for p in _render_chunk(*job)]
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [pool.submit(_render_chunk, *job) for job in jobs]
+        return [p for future in futures for p in future.result()]
+
+
+def write_gif(paths, gif_path, duration=200):
+    # Stitch rendered PNG frames into a looping GIF (duration in ms per frame)
+    from PIL import Image
+
+    frames = [Image.open(p).convert('P', palette=Image.ADAPTIVE) for p in paths]
+    frames[0].save(gif_path, save_all=True, append_images=frames[1:], duration=duration, loop=0)
+    return gif_path
@@ -0,0 +1,173 @@
+"""
+Frame engine for the station error heatmap animation
+
+The prediction table is pivoted once into dense (date x station) NumPy arrays
+(actual, predicted, absolute error, marker size). A frame is then a row slice
+of those arrays instead of a filter over the whole table plus per-station
+lookups, and frames are produced lazily by iter_frames so long date ranges
+never hold every frame in memory unless a figure asks for them.
+
+Frames and figures are plain Plotly dicts; pass validate=False to plotly.io
+show / write_html to skip the per-frame object validation of go.Figure.
+"""
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+from .stations import STATION_COORDS
+
+MAX_PX = 40
+ERROR_CMAX = 5000
+HOVER_TEMPLATE = "%{text}<br>Actual: %{customdata[0]:.0f}<br>Predicted:%{customdata[2]:.0f}<br>Error: %{customdata[1]:.0f}<extra></extra>"
+
+
+class HeatmapCube:
+    """(date x station) arrays behind the animation; missing station-days are 0."""
+
+    def __init__(self, dates, stations, actual, predicted, weather, max_px=MAX_PX, coords=STATION_COORDS,
+                 error=None, present=None, title='Entries on', label_format='%Y-%m-%d', peak=None):
+        self.dates = dates
+        self.stations = stations
+        self.actual = actual
+        self.predicted = predicted
+        self.error = np.abs(predicted - actual) if error is None else error
+        # Which station-days had a row (aggregation averages over these only)
+        self.present = np.ones(actual.shape, dtype=bool) if present is None else present
+        self.max_px = max_px
+        self.coords = coords
+        self.title = title
+        self.label_format = label_format
+        # Marker sizes are relative to the busiest station-day (of a parent cube when given)
+        if peak is None:
+            peak = actual.max() if actual.size else 0
+        self.peak = peak
+        self.size = actual / peak * max_px if peak > 0 else np.zeros_like(actual)
+        # customdata per frame: (station, [actual, error, predicted])
+        self.custom = np.stack([actual, self.error, predicted], axis=-1)
+        self.weather = weather
+        self.xs = np.array([coords[s][0] for s in stations], dtype=np.float64)
+        self.ys = np.array([coords[s][1] for s in stations], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def labels(self):
+        return [d.strftime(self.label_format) for d in self.dates]
+
+
+def build_cube(entries, start=None, end=None, stations=None, max_px=MAX_PX, coords=STATION_COORDS):
+    """
+    Pivot a prediction table (service_date, station_name, tavg, prcp, wspd,
+    actual_entries, predicted_entries) into a HeatmapCube for the dates in
+    [start, end] and `stations` (default: every station with coordinates).
+    Rows without a prediction (unscored) are left out like missing ones.
+    """
+    stations = list(coords) if stations is None else list(stations)
+    dates = entries['service_date']
+    keep = np.ones(len(entries), dtype=bool)
+    if start is not None:
+        keep &= (dates >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        keep &= (dates <= pd.Timestamp(end)).to_numpy()
+    column = pd.Index(stations).get_indexer(entries['station_name'])
+    keep &= column >= 0
+    keep &= entries['predicted_entries'].notna().to_numpy()
+    rows = entries[keep]
+    column = column[keep]
+
+    row, unique_dates = pd.factorize(rows['service_date'], sort=True)
+    shape = (len(unique_dates), len(stations))
+    actual = np.zeros(shape)
+    predicted = np.zeros(shape)
+    present = np.zeros(shape, dtype=bool)
+    actual[row, column] = rows['actual_entries'].to_numpy(dtype=np.float64)
+    predicted[row, column] = rows['predicted_entries'].to_numpy(dtype=np.float64)
+    present[row, column] = True
+
+    # Weather of each date's first row
+    _, first = np.unique(row, return_index=True)
+    weather = rows[['tavg', 'prcp', 'wspd']].iloc[first].to_numpy(dtype=np.float64)
+
+    return HeatmapCube(pd.DatetimeIndex(unique_dates), stations, actual, predicted, weather, max_px, coords,
+                       present=present)
+
+
+def frame_title(label, weather, title='Entries on'):
+    tavg, prcp, wspd = weather
+    return f"{title} {label} — {tavg:.1f}°F | {prcp:.2f}\" rain | {wspd:.1f}mph"
+
+
+def frame(cube, i, label=None):
+    # One animation frame as a Plotly dict, sliced out of the cube arrays
+    label = label or cube.dates[i].strftime(cube.label_format)
+    return {
+        'name': label,
+        'data': [{'marker': {'size': cube.size[i], 'color': cube.error[i], 'coloraxis': 'coloraxis'},
+                  'customdata': cube.custom[i]}],
+        'layout': {'title': {'text': frame_title(label, cube.weather[i], cube.title)}},
+        'traces': [0],
+    }
+
+
+def iter_frames(cube):
+    # Frames on demand, in date order
+    for i, label in enumerate(cube.labels()):
+        yield frame(cube, i, label)
+
+
+def base_trace(cube, i=0):
+    return {
+        'type': 'scatter', 'x': cube.xs, 'y': cube.ys, 'mode': 'markers',
+        'marker': {'size': cube.size[i], 'color': cube.error[i], 'coloraxis': 'coloraxis'},
+        'text': cube.stations,
+        'customdata': cube.custom[i],
+        'hovertemplate': HOVER_TEMPLATE,
+    }
+
+
+def base_layout(title, cmax=ERROR_CMAX):
+    return {
+        'title': {'text': title},
+        'xaxis': {'visible': False, 'range': [0, 100]},
+        'yaxis': {'visible': False, 'range': [0, 100]},
+        # Resolved here since unvalidated figures don't look template names up
+        'template': pio.templates['plotly_white'].to_plotly_json(),
+        'coloraxis': {
+            'colorscale': [[0, 'green'], [1, 'red']],
+            'cmin': 0, 'cmax': cmax,
+            'colorbar': {'x': 1.02, 'y': 0.5, 'title': {'text': 'Error'}},
+        },
+    }
+
+
+def animation_controls(labels, duration=200):
+    # Play button and date slider for frames named by `labels`
+    return {
+        'updatemenus': [{
+            'type': 'buttons', 'showactive': False,
+            'x': 1.1, 'y': 1.05, 'xanchor': 'right', 'yanchor': 'top',
+            'buttons': [{'label': '▶ Play', 'method': 'animate',
+                         'args': [None, {'frame': {'duration': duration, 'redraw': True}, 'fromcurrent': True}]}],
+        }],
+        'sliders': [{
+            'active': 0, 'pad': {'t': 50},
+            'steps': [{'method': 'animate', 'label': label,
+                       'args': [[label], {'frame': {'duration': 0, 'redraw': True}, 'mode': 'immediate'}]}
+                      for label in labels],
+        }],
+    }
+
+
+def check_dates(cube):
+    # Figures are titled after the first date, so an empty cube has nothing to show
+    if not len(cube):
+        raise ValueError("No dates in the heatmap cube: the date range or station list selects no predictions")
+
+
+def figure_dict(cube):
+    """Full animated figure (base trace, every frame, play button and slider) as a dict."""
+    check_dates(cube)
+    labels = cube.labels()
+    layout = base_layout(f"{cube.title} {labels[0]}")
+    layout.update(animation_controls(labels))
+    return {'data': [base_trace(cube)], 'layout': layout, 'frames': list(iter_frames(cube))}
@@ -0,0 +1,182 @@
+"""
+Incremental processing of the MBTA and weather sources
+
+A manifest (manifest.json in the processed directory) records a content hash
+for every yearly MBTA file and for the weather file. Each yearly file's daily
+station totals are kept as their own part table, keyed by hash, in
+processed/mbta_parts/. On every run:
+
+  - only new or changed yearly files are aggregated; parts of removed/changed
+    files are dropped
+  - the set of affected service dates is collected from those parts and from
+    weather rows whose values changed
+  - processed_mbta and merged_mbta_weather keep their rows for every other date
+    and only the affected dates are recomputed and spliced in
+
+The first run (empty manifest) is a full build.
+"""
+import json
+import os
+import pandas as pd
+
+from . import config
+from .processing import (
+    aggregate_mbta_sources,
+    default_paths,
+    list_mbta_sources,
+    merge_mbta_weather,
+    merge_partial_sums,
+    process_weather,
+)
+from .instrumentation import record, traced
+from .storage import content_hash, read_table, table_path, typed, write_table
+
+MANIFEST_NAME = 'manifest.json'
+PARTS_DIR = 'mbta_parts'
+
+
+def load_manifest(directory=None):
+    path = os.path.join(directory or config.processed_dir(), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'mbta_sources': {}, 'weather': None}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, directory=None):
+    directory = directory or config.processed_dir()
+    # Write to a temp file first so an interrupted run never leaves a half-written manifest
+    path = os.path.join(directory, MANIFEST_NAME)
+    os.makedirs(directory, exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def replace_dates(table, new_rows, dates):
+    # Rows of `table` outside `dates`, plus `new_rows`, in (service_date, station_name) order
+    kept = table[~table['service_date'].isin(dates)]
+    out = pd.concat([kept, new_rows], ignore_index=True)
+    out['station_name'] = out['station_name'].astype(str)
+    out = out.sort_values(['service_date', 'station_name'], ignore_index=True)
+    return typed(out)
+
+
+def changed_weather_dates(old, new):
+    """Dates that are new, removed, or have any different value between two weather tables."""
+    if old is None:
+        return pd.DatetimeIndex(new['service_date'])
+    cols = [c for c in new.columns if c != 'service_date']
+    before = old.set_index('service_date').reindex(new['service_date'])[cols].to_numpy(dtype=float)
+    after = new[cols].to_numpy(dtype=float)
+    same = (before == after) | (pd.isna(before) & pd.isna(after))
+    changed = new['service_date'][~same.all(axis=1)]
+    removed = old['service_date'][~old['service_date'].isin(new['service_date'])]
+    return pd.DatetimeIndex(pd.concat([changed, removed]).unique())
+
+
+@traced()
+def process_incremental(
+    source=None,
+    weather_source=None,
+    directory=None,
+    chunksize=500_000,
+    n_jobs=None,
+    fmt=None
+):
+    """
+    Bring processed_mbta, processed_weather and merged_mbta_weather up to date
+    with the sources, only reprocessing what changed. Returns a summary dict.
+    """
+    defaults = default_paths()
+    source = source or defaults['zip_path']
+    weather_source = weather_source or defaults['weather_path']
+    directory = directory or config.processed_dir()
+    manifest = load_manifest(directory)
+    known = manifest['mbta_sources']
+    parts_dir = os.path.join(directory, PARTS_DIR)
+    mbta_file = table_path(directory, 'processed_mbta', fmt)
+    weather_file = table_path(directory, 'processed_weather', fmt)
+    merged_file = table_path(directory, 'merged_mbta_weather', fmt)
+    full_build = not known or not all(os.path.exists(f) for f in (mbta_file, weather_file, merged_file))
+
+    # Which yearly files are new, changed or gone
+    hashes = {member: content_hash(source, member) for member in list_mbta_sources(source)}
+    added = [m for m in hashes if known.get(m, {}).get('hash') != hashes[m]]
+    removed = [m for m in known if hashes.get(m) != known[m]['hash']]
+
+    affected = []
+    for member in removed:
+        entry = known.pop(member)
+        part = os.path.join(directory, entry['part'])
+        if os.path.exists(part):
+            affected.append(read_table(part, columns=['service_date'])['service_date'])
+            if not any(e['hash'] == entry['hash'] for e in known.values()) and entry['hash'] not in hashes.values():
+                os.remove(part)
+
+    for member, totals in zip(added, aggregate_mbta_sources(source, added, chunksize, n_jobs)):
+        part = table_path(parts_dir, hashes[member], fmt)
+        write_table(totals, part)
+        known[member] = {
+            'hash': hashes[member],
+            'part': os.path.relpath(part, directory),
+            'start': str(totals['service_date'].min().date()),
+            'end': str(totals['service_date'].max().date()),
+            'rows': len(totals),
+        }
+        affected.append(totals['service_date'])
+
+    mbta_dates = pd.DatetimeIndex(pd.concat(affected).unique()) if affected else pd.DatetimeIndex([])
+
+    # Daily station totals: recompute only the affected dates from the parts that cover them
+    def totals_for(dates=None):
+        parts = []
+        for entry in known.values():
+            if dates is not None and (pd.Timestamp(entry['end']) < dates.min() or pd.Timestamp(entry['start']) > dates.max()):
+                continue
+            part = read_table(os.path.join(directory, entry['part']))
+            parts.append(part if dates is None else part[part['service_date'].isin(dates)])
+        return merge_partial_sums(parts) if parts else None
+
+    if full_build:
+        df_mbta = totals_for()
+    elif len(mbta_dates):
+        new_rows = totals_for(mbta_dates)
+        df_mbta = replace_dates(read_table(mbta_file), new_rows, mbta_dates)
+    else:
+        df_mbta = read_table(mbta_file)
+    if full_build or len(mbta_dates):
+        write_table(df_mbta, mbta_file)
+
+    # Weather is small, so it is re-cleaned whenever the file changes and diffed by date
+    weather_hash = content_hash(weather_source)
+    weather_changed = full_build or (manifest.get('weather') or {}).get('hash') != weather_hash
+    if weather_changed:
+        old_weather = None if full_build else read_table(weather_file)
+        df_weather = process_weather(weather_source, fmt, output_dir=directory)
+        weather_dates = changed_weather_dates(old_weather, df_weather)
+        manifest['weather'] = {'hash': weather_hash, 'source': os.path.basename(weather_source)}
+    else:
+        df_weather = read_table(weather_file)
+        weather_dates = pd.DatetimeIndex([])
+
+    # Merged rows: only the dates touched by either side
+    dates = mbta_dates.union(weather_dates)
+    if full_build:
+        df_merged = merge_mbta_weather(df_mbta, df_weather)
+    elif len(dates):
+        # The whole weather table, so gaps are imputed from the same neighbouring days as a full build
+        new_rows = merge_mbta_weather(df_mbta[df_mbta['service_date'].isin(dates)], df_weather)
+        df_merged = replace_dates(read_table(merged_file), new_rows, dates)
+    if full_build or len(dates):
+        write_table(df_merged, merged_file)
+
+    save_manifest(manifest, directory)
+    record(files_added=len(added), files_removed=len(removed), dates_updated=int(len(dates)))
+    return {
+        'full_build': full_build,
+        'added': added,
+        'removed': removed,
+        'weather_changed': bool(weather_changed),
+        'dates_updated': int(len(dates)),
+    }
@@ -0,0 +1,185 @@
+"""
+Stage-level instrumentation for the processing and modelling pipeline
+
+Each stage runs inside a span (the `span` context manager, or the `traced`
+decorator on a stage function). A finished span becomes one flat JSON record:
+
+  {"span": "process_mbta", "parent": null, "start": "...", "seconds": 1.92,
+   "peak_rss_mb": 812.4, "rss_growth_mb": 310.2, "rows_in": 2031541,
+   "rows_out": 140332, "bytes_read": 14811029, "bytes_written": 1208811,
+   "status": "ok"}
+
+peak_rss_mb is the process high-water mark (resource.getrusage) when the span
+ends, and rss_growth_mb how much the span raised it (both null where the
+resource module is missing, i.e. on Windows). Bytes come from
+storage.read_table / write_table, which report to the innermost open span.
+Records are appended as JSON lines to a metrics file and/or a stream when
+configured (configure(), or the TCAST_METRICS_FILE environment variable), and
+the last few are kept in memory in `recent`.
+
+The diagnostic head() / isnull() dumps of the processing stages only run when
+verbose() is true: configure(verbose=False), or TCAST_VERBOSE=0.
+"""
+import contextlib
+import contextvars
+import datetime
+import functools
+import json
+import os
+import sys
+import time
+from collections import deque
+
+try:
+    import resource
+except ImportError:
+    # Windows: no getrusage, spans are recorded without memory
+    resource = None
+
+_settings = {
+    'verbose': os.environ.get('TCAST_VERBOSE', '1') not in ('0', 'false', 'False', ''),
+    'metrics_path': os.environ.get('TCAST_METRICS_FILE') or None,
+    'stream': None,
+}
+
+# Last finished span records, newest last
+recent = deque(maxlen=256)
+
+_stack = contextvars.ContextVar('tcast_spans', default=())
+
+
+def configure(verbose=None, metrics_path=None, stream=None):
+    """
+    verbose: print the diagnostic dumps; metrics_path: JSON-lines file to append
+    span records to; stream: file object to also write them to (e.g. sys.stderr).
+    Only the arguments given are changed.
+    """
+    if verbose is not None:
+        _settings['verbose'] = bool(verbose)
+    if metrics_path is not None:
+        _settings['metrics_path'] = metrics_path or None
+    if stream is not None:
+        _settings['stream'] = stream
+
+
+def verbose():
+    return _settings['verbose']
+
+
+def diagnostic(*args):
+    # print() that the verbosity switch turns off; guard expensive arguments with `if verbose():`
+    if _settings['verbose']:
+        print(*args)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS; None without the resource module
+    if resource is None:
+        return None
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1024 ** 2
+
+
+class Span:
+
+    def __init__(self, name, parent=None, **fields):
+        self.name = name
+        self.parent = parent
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.fields = {}
+        self.set(**fields)
+
+    def set(self, **fields):
+        # rows_in / rows_out / extra fields to record
+        for key, value in fields.items():
+            if key in ('rows_in', 'rows_out'):
+                setattr(self, key, None if value is None else int(value))
+            else:
+                self.fields[key] = value
+        return self
+
+
+def current():
+    """Innermost open span, or None."""
+    stack = _stack.get()
+    return stack[-1] if stack else None
+
+
+def record(**fields):
+    # Span.set on the innermost open span (no-op outside a span)
+    s = current()
+    if s is not None:
+        s.set(**fields)
+
+
+def add_bytes(read=0, written=0):
+    # Attribute I/O to every open span, so a parent includes its children's bytes
+    for s in _stack.get():
+        s.bytes_read += read
+        s.bytes_written += written
+
+
+def emit(record):
+    recent.append(record)
+    line = json.dumps(record, default=str)
+    if _settings['metrics_path']:
+        os.makedirs(os.path.dirname(os.path.abspath(_settings['metrics_path'])), exist_ok=True)
+        with open(_settings['metrics_path'], 'a') as f:
+            f.write(line + '\n')
+    if _settings['stream'] is not None:
+        _settings['stream'].write(line + '\n')
+
+
+@contextlib.contextmanager
+def span(name, **fields):
+    """Time a stage and emit its record when it ends (status 'error' if it raised)."""
+    parent = current()
+    s = Span(name, parent.name if parent else None, **fields)
+    token = _stack.set(_stack.get() + (s,))
+    start = datetime.datetime.now()
+    rss_before = peak_rss_mb()
+    t0 = time.perf_counter()
+    status = 'ok'
+    try:
+        yield s
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        seconds = time.perf_counter() - t0
+        _stack.reset(token)
+        rss = peak_rss_mb()
+        emit({
+            'span': s.name,
+            'parent': s.parent,
+            'start': start.isoformat(timespec='milliseconds'),
+            'seconds': round(seconds, 6),
+            'peak_rss_mb': None if rss is None else round(rss, 1),
+            'rss_growth_mb': None if rss is None else round(rss - rss_before, 1),
+            'rows_in': s.rows_in,
+            'rows_out': s.rows_out,
+            'bytes_read': s.bytes_read,
+            'bytes_written': s.bytes_written,
+            'status': status,
+            **s.fields,
+        })
+
+
+def traced(name=None):
+    """
+    Run the decorated stage in a span; rows_out is filled from a returned
+    DataFrame unless the stage set it.
+    """
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name or fn.__name__) as s:
+                result = fn(*args, **kwargs)
+                if s.rows_out is None and hasattr(result, 'shape') and hasattr(result, 'columns'):
+                    s.rows_out = len(result)
+                return result
+        return inner
+    return wrap
@@ -0,0 +1,155 @@
+"""
+Sharded ridership models: one small model per station or per line
+
+Instead of one global ridge model where stations enter as dummies, the rows are
+split into shards (station_name, or the line_color from stations.py) and every
+shard gets its own model with the same terms as make_pipeline: the degree-2
+expansion of the base features, plus the station interactions of the stations
+inside the shard (none for a station shard). Each shard's design matrix is a
+few thousand rows by a few hundred columns, so shards are fitted independently
+over a process pool and the cost grows linearly with the number of stations.
+
+The fitted shards are kept together as a ModelBank. predict routes rows to
+their shard with array lookups (station code -> shard, local station code) and
+scores each shard's rows in one batch. With line shards, a station that was
+not in the training data falls back to its line's baseline station, like the
+global model does; with station shards it has no model and gets NaN.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from .designMatrix import station_polynomial_matrix
+from .ridge import NormalEquationRidge, RidgePathCV
+from .stations import assign_line_colors, station_table
+
+# Shard mode -> column the rows are grouped by
+SHARD_KEYS = {'station': 'station_name', 'line': 'line_color'}
+
+BANK_VERSION = 1
+
+
+def _shard_pipeline(n_rows, alphas, n_splits, scoring='r2'):
+    # Scaler + ridge with the alpha picked on time-ordered folds (scored like
+    # make_pipeline by default), fixed alpha for tiny shards
+    if n_rows <= 2 * n_splits:
+        ridge = NormalEquationRidge(alpha=float(np.median(alphas)))
+    else:
+        ridge = RidgePathCV(alphas=list(alphas), n_splits=n_splits, scoring=scoring)
+    return Pipeline([('scale', StandardScaler(with_mean=False)), ('ridge', ridge)])
+
+
+def _fit_shard(base, local_codes, y, n_stations, degree, alphas, n_splits, scoring):
+    # Local code 0 is the shard's baseline station (like get_dummies(drop_first=True))
+    Z = station_polynomial_matrix(base, local_codes - 1, n_stations - 1, degree=degree)
+    return _shard_pipeline(len(y), alphas, n_splits, scoring).fit(Z, y)
+
+
+class ModelBank:
+
+    def __init__(self, by, x_cols, degree, shards, models, stations, shard_of, local_code, n_local, n_rows):
+        self.by = by
+        self.x_cols = list(x_cols)
+        self.degree = degree
+        self.shards = pd.Index(shards)
+        self.models = list(models)
+        self.stations = pd.Index(stations)
+        self.shard_of = np.asarray(shard_of)
+        self.local_code = np.asarray(local_code)
+        self.n_local = np.asarray(n_local)
+        self.n_rows = np.asarray(n_rows)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        joblib.dump({'version': BANK_VERSION, 'bank': self}, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        artifact = joblib.load(path)
+        if artifact.get('version') != BANK_VERSION:
+            raise ValueError(f"Unsupported model bank version {artifact.get('version')}")
+        return artifact['bank']
+
+    def route(self, stations):
+        """Shard (-1: none) and local station code of every row's station."""
+        codes = self.stations.get_indexer(pd.Index(stations))
+        known = codes >= 0
+        shard = np.where(known, self.shard_of[codes], -1)
+        local = np.where(known, self.local_code[codes], 0)
+        if self.by == 'line' and not known.all():
+            # Unseen stations: their line's shard, as its baseline station (local code 0)
+            unseen, inverse = np.unique(np.asarray(stations, dtype=object)[~known], return_inverse=True)
+            lines = station_table(pd.Index(unseen))['line_color'].astype(str)
+            shard[~known] = self.shards.get_indexer(lines)[inverse]
+        return shard, local
+
+    def predict(self, df):
+        """Raw predictions for rows with station_name and x_cols; NaN for rows without a shard."""
+        base = df[self.x_cols].to_numpy(dtype=np.float64)
+        shard, local = self.route(df['station_name'])
+        pred = np.full(len(df), np.nan)
+
+        # Rows grouped by shard, then one batch per shard
+        order = np.argsort(shard, kind='stable')
+        bounds = np.flatnonzero(np.r_[True, np.diff(shard[order]) != 0, True])
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            s = shard[order[start]]
+            if s < 0:
+                continue
+            rows = order[start:end]
+            Z = station_polynomial_matrix(base[rows], local[rows] - 1, self.n_local[s] - 1, degree=self.degree)
+            pred[rows] = self.models[s].predict(Z)
+        return pred
+
+    def summary(self):
+        # Stations, training rows and chosen alpha per shard
+        ridges = [m.named_steps['ridge'] for m in self.models]
+        alphas = [r.alpha_ if hasattr(r, 'alpha_') else r.alpha for r in ridges]
+        return pd.DataFrame({'shard': self.shards, 'stations': self.n_local, 'rows': self.n_rows, 'alpha': alphas})
+
+
+def fit_model_bank(df, x_cols, by='station', degree=2, alphas=(0.1, 1.0, 10.0), n_splits=5, n_jobs=None, scoring='r2'):
+    """
+    Fit one model per shard of a feature frame (see tuningModel.build_feature_frame)
+    on gated_entries, one worker process per shard (n_jobs=1 runs inline). The
+    alpha search is scored like the global model's (R^2) unless scoring is given.
+    """
+    if by == 'line' and 'line_color' not in df.columns:
+        df = assign_line_colors(df.copy(deep=False))
+    shard_codes, shards = pd.factorize(df[SHARD_KEYS[by]].astype(str), sort=True)
+    station_codes, stations = pd.factorize(df['station_name'], sort=True)
+
+    # Every station belongs to one shard; number the stations inside each shard
+    shard_of = np.empty(len(stations), dtype=np.int64)
+    shard_of[station_codes] = shard_codes
+    local_code = np.empty(len(stations), dtype=np.int64)
+    n_local = np.zeros(len(shards), dtype=np.int64)
+    for code in range(len(stations)):
+        local_code[code] = n_local[shard_of[code]]
+        n_local[shard_of[code]] += 1
+
+    base = df[x_cols].to_numpy(dtype=np.float64)
+    y = df['gated_entries'].to_numpy(dtype=np.float64)
+    days = ((df['service_date'] - df['service_date'].min()) // pd.Timedelta(days=1)).to_numpy()
+
+    # Rows grouped by shard and in time order inside a shard (for the rolling-origin folds)
+    order = np.lexsort((days, shard_codes))
+    bounds = np.searchsorted(shard_codes[order], np.arange(len(shards) + 1))
+    tasks = []
+    for s in range(len(shards)):
+        rows = order[bounds[s]:bounds[s + 1]]
+        tasks.append((base[rows], local_code[station_codes[rows]], y[rows], int(n_local[s]), degree, alphas, n_splits, scoring))
+
+    if n_jobs == 1 or len(tasks) <= 1:
+        models = [_fit_shard(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = [pool.submit(_fit_shard, *task) for task in tasks]
+            models = [future.result() for future in futures]
+
+    return ModelBank(by, x_cols, degree, shards, models, stations, shard_of, local_code, n_local, np.diff(bounds))
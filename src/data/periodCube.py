@@ -0,0 +1,209 @@
+"""
+Intra-day (time period) resolution of the gated-entry data
+
+process_mbta sums everything to daily station totals. This module keeps the
+30-minute time_period of the raw GSE files instead and aggregates them into a
+(date x period x station) cube of int32 entries:
+
+  - the yearly files are read in chunks with only the four columns needed
+    (straight out of the zip, like process_zip_streaming), summed per chunk and
+    per file in worker processes, and the partial sums are merged at the end
+  - time periods are ordered by service day, which starts at SERVICE_DAY_START
+    (a '(00:30:00)' period comes after '(23:30:00)')
+  - the cube is saved as a directory with entries.npy / present.npy and the
+    axis labels in axes.json; load() memory-maps the arrays
+
+Rollups to hours, days and lines are sums over cube axes, so they never touch
+the raw files again.
+"""
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from .instrumentation import add_bytes, record, traced
+from . import config
+from .processing import default_paths, list_mbta_sources
+from .schema import apply_schema
+from .stations import station_table
+
+PERIOD_COLUMNS = ['service_date', 'time_period', 'station_name', 'gated_entries']
+PERIOD_DTYPES = {'service_date': 'category', 'time_period': 'category', 'station_name': 'category',
+                 'gated_entries': 'float32'}
+
+# Periods before this time of day belong to the end of the previous service day
+SERVICE_DAY_START = pd.Timedelta(hours=3)
+
+
+def period_start(labels):
+    # '(HH:MM:SS)' labels -> time of day
+    return pd.to_timedelta(pd.Index(labels, dtype=object).str.strip('() '))
+
+
+def order_periods(labels):
+    """Unique period labels in service-day order."""
+    labels = pd.Index(pd.unique(np.asarray(labels, dtype=object)))
+    offset = (period_start(labels) - SERVICE_DAY_START) % pd.Timedelta(days=1)
+    return labels[np.argsort(offset.to_numpy(), kind='stable')]
+
+
+def _period_sums(chunk):
+    # (service_date, time_period, station_name) sums of one chunk, dates parsed once per category
+    sums = chunk.groupby(['service_date', 'time_period', 'station_name'], observed=True)['gated_entries'].sum().reset_index()
+    dates = pd.to_datetime(sums['service_date'].cat.categories)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    sums['service_date'] = dates.normalize()[sums['service_date'].cat.codes]
+    sums['time_period'] = sums['time_period'].astype(str)
+    sums['station_name'] = sums['station_name'].astype(str)
+    return sums
+
+
+def merge_period_sums(partials):
+    merged = pd.concat(partials, ignore_index=True)
+    return merged.groupby(['service_date', 'time_period', 'station_name'], as_index=False, sort=False)['gated_entries'].sum()
+
+
+def aggregate_period_source(source, member, chunksize=500_000):
+    """Period totals of one yearly file, read in chunks (memory bounded by a chunk plus the aggregate)."""
+    def read(handle):
+        chunks = pd.read_csv(handle, usecols=PERIOD_COLUMNS, dtype=PERIOD_DTYPES, chunksize=chunksize)
+        return [_period_sums(chunk) for chunk in chunks]
+
+    if os.path.isdir(source):
+        partials = read(member)
+    else:
+        with zipfile.ZipFile(source) as zf, zf.open(member) as handle:
+            partials = read(handle)
+    return merge_period_sums(partials)
+
+
+class PeriodCube:
+
+    def __init__(self, dates, periods, stations, entries, present):
+        self.dates = pd.DatetimeIndex(dates)
+        self.periods = pd.Index(periods)
+        self.stations = pd.Index(stations)
+        # entries: (dates x periods x stations) int32; present: (dates x stations) days with any rows
+        self.entries = entries
+        self.present = present
+
+    @classmethod
+    def from_sums(cls, sums):
+        """Cube from long (service_date, time_period, station_name, gated_entries) sums."""
+        date_codes, dates = pd.factorize(sums['service_date'], sort=True)
+        periods = order_periods(sums['time_period'])
+        period_codes = periods.get_indexer(sums['time_period'].astype(str))
+        station_codes, stations = pd.factorize(sums['station_name'].astype(str), sort=True)
+
+        shape = (len(dates), len(periods), len(stations))
+        flat = np.ravel_multi_index((date_codes, period_codes, station_codes), shape)
+        totals = np.bincount(flat, weights=sums['gated_entries'].to_numpy(dtype=np.float64), minlength=np.prod(shape))
+        present = np.zeros(shape[0] * shape[2], dtype=bool)
+        present[date_codes * shape[2] + station_codes] = True
+        return cls(dates, periods, stations, np.rint(totals).astype(np.int32).reshape(shape),
+                   present.reshape(shape[0], shape[2]))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'entries.npy'), self.entries)
+        np.save(os.path.join(directory, 'present.npy'), self.present)
+        axes = {
+            'dates': [d.strftime('%Y-%m-%d') for d in self.dates],
+            'periods': [str(p) for p in self.periods],
+            'stations': [str(s) for s in self.stations],
+        }
+        with open(os.path.join(directory, 'axes.json'), 'w') as f:
+            json.dump(axes, f)
+        add_bytes(written=sum(os.path.getsize(os.path.join(directory, name))
+                              for name in ('entries.npy', 'present.npy', 'axes.json')))
+        return directory
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, 'axes.json')) as f:
+            axes = json.load(f)
+        mode = 'r' if mmap else None
+        entries = np.load(os.path.join(directory, 'entries.npy'), mmap_mode=mode)
+        present = np.load(os.path.join(directory, 'present.npy'), mmap_mode=mode)
+        return cls(pd.to_datetime(axes['dates']), axes['periods'], axes['stations'], entries, present)
+
+    def period_order(self):
+        # time_period as an ordered categorical in service-day order
+        return pd.CategoricalDtype(self.periods, ordered=True)
+
+    def to_frame(self, nonzero=False):
+        """Long table (service_date, time_period, station_name, gated_entries) over days a station has data."""
+        d, p, s = np.indices(self.entries.shape).reshape(3, -1)
+        keep = np.broadcast_to(np.asarray(self.present)[:, None, :], self.entries.shape).ravel()
+        values = np.asarray(self.entries).ravel()
+        if nonzero:
+            keep = keep & (values != 0)
+        df = pd.DataFrame({
+            'service_date': self.dates[d[keep]],
+            'time_period': pd.Categorical.from_codes(p[keep], dtype=self.period_order()),
+            'station_name': pd.Categorical.from_codes(s[keep], categories=self.stations),
+            'gated_entries': values[keep],
+        })
+        return apply_schema(df)
+
+    def hourly(self):
+        """Cube with the periods summed per clock hour (periods named '(HH:00:00)')."""
+        hours = period_start(self.periods).components.hours.to_numpy()
+        starts = np.flatnonzero(np.r_[True, hours[1:] != hours[:-1]])
+        entries = np.add.reduceat(np.asarray(self.entries, dtype=np.int64), starts, axis=1).astype(np.int32)
+        labels = [f'({h:02d}:00:00)' for h in hours[starts]]
+        return PeriodCube(self.dates, labels, self.stations, entries, self.present)
+
+    def daily(self):
+        """Daily station totals, the same table as process_mbta."""
+        totals = np.asarray(self.entries, dtype=np.int64).sum(axis=1)
+        d, s = np.nonzero(np.asarray(self.present))
+        df = pd.DataFrame({
+            'service_date': self.dates[d],
+            'station_name': pd.Categorical.from_codes(s, categories=self.stations),
+            'gated_entries': totals[d, s],
+        })
+        return apply_schema(df)
+
+    def by_line(self):
+        """Cube summed over the stations of each primary line (stations.py line_color)."""
+        line = station_table(self.stations)['line_color']
+        lines = pd.Index([l for l in line.cat.categories if (line == l).any()])
+        membership = (line.to_numpy()[:, None] == lines.to_numpy()[None, :]).astype(np.int64)
+        entries = np.asarray(self.entries, dtype=np.int64) @ membership
+        present = (np.asarray(self.present).astype(np.int64) @ membership) > 0
+        return PeriodCube(self.dates, self.periods, lines, entries.astype(np.int32), present)
+
+
+def aggregate_period_sources(source, members, chunksize=500_000, n_jobs=None):
+    # One worker process per yearly file (n_jobs=1 runs inline)
+    if n_jobs == 1 or len(members) <= 1:
+        return [aggregate_period_source(source, member, chunksize) for member in members]
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [pool.submit(aggregate_period_source, source, member, chunksize) for member in members]
+        return [future.result() for future in futures]
+
+
+def build_period_cube(source=None, chunksize=500_000, n_jobs=None):
+    """(date x period x station) cube of the yearly files in a zip archive or folder."""
+    source = source or default_paths()['zip_path']
+    members = list_mbta_sources(source)
+    if not members:
+        raise ValueError(f"No mbta csv files found in {source}")
+    return PeriodCube.from_sums(merge_period_sums(aggregate_period_sources(source, members, chunksize, n_jobs)))
+
+
+@traced()
+def process_period_cube(source=None, chunksize=500_000, n_jobs=None, output_dir=None):
+    # Intra-day alternative to process_zip_streaming: writes processed/period_cube/
+    output_dir = output_dir or config.processed_dir()
+    cube = build_period_cube(source, chunksize, n_jobs)
+    record(rows_out=int(np.asarray(cube.present).sum()) * len(cube.periods), shape=list(cube.entries.shape))
+    cube.save(os.path.join(output_dir, 'period_cube'))
+    return cube
@@ -0,0 +1,232 @@
+"""
+Streaming output of the test predictions and their errors
+
+The prediction table used to be built as a copy of the test rows of the
+feature frame, with the predictions joined on by index and then written in
+one go. PredictionWriter instead gathers the output columns straight from the
+feature frame's column arrays and the predictor's output array:
+
+  - rows are written in (service_date, station_name) order, buffer_rows rows
+    at a time, so only one buffer of the five output columns is materialized
+  - predictions are quantized once to int32 counts (rint, clipped at 0), the
+    schema dtype of predicted_entries; rows without a prediction (a station
+    without a shard in the model bank) stay NaN
+  - partition_by='station' writes one file per station into a directory
+    instead of one table
+  - ErrorAccumulator keeps per-station error sums (count, squared, absolute
+    and relative error) over the same buffers, so RMSE / MAE / MAPE per
+    station and per line need no second pass over the predictions
+"""
+import os
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from .stations import LINE_STATIONS, OTHER, station_table
+from .storage import DEFAULT_FORMAT, TableWriter, format_of, table_path, write_table
+
+PREDICTION_COLUMNS = ['service_date', 'station_name', 'tavg', 'prcp', 'wspd', 'actual_entries', 'predicted_entries']
+
+# Rows gathered and written per buffer. Parquet buffers are pyarrow's default
+# row group size, as smaller row groups cost more to encode than they save;
+# CSV formatting costs the same per row whatever the buffer size
+BUFFER_ROWS = {'parquet': 1 << 20, 'csv': 100_000}
+
+# Error sums kept per station: scored rows, squared error, absolute error,
+# rows with actual > 0 and their absolute relative error
+SUMS = ['n', 'sse', 'sae', 'n_pct', 'sape']
+
+
+def quantize(y_pred):
+    """Predicted counts as int32 (rint, clipped at 0), or float32 when some are missing."""
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    counts = np.clip(np.rint(y_pred), 0, None)
+    if np.isnan(counts).any():
+        return counts.astype(np.float32)
+    return counts.astype(np.int32)
+
+
+def error_table(sums, index):
+    # n / rmse / mae / mape (%) per row of a (groups x SUMS) array
+    n, sse, sae, n_pct, sape = sums.T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({
+            'n': n.astype(np.int64),
+            'rmse': np.sqrt(sse / n),
+            'mae': sae / n,
+            'mape': 100 * sape / n_pct,
+        }, index=index)
+
+
+class ErrorAccumulator:
+    """
+    Running RMSE / MAE / MAPE per station. add() folds in one batch of rows
+    with np.bincount over the batch's station codes; rows without a
+    prediction are not scored, and MAPE only counts rows with actual > 0.
+    """
+
+    def __init__(self):
+        self.stations = []
+        self._codes = {}
+        self.sums = np.zeros((0, len(SUMS)))
+
+    def _station_codes(self, names):
+        codes, uniques = pd.factorize(names)
+        new = [name for name in uniques if name not in self._codes]
+        for name in new:
+            self._codes[name] = len(self.stations)
+            self.stations.append(name)
+        if new:
+            self.sums = np.vstack([self.sums, np.zeros((len(new), len(SUMS)))])
+        return np.array([self._codes[name] for name in uniques], dtype=np.int64)[codes]
+
+    def add(self, station_names, actual, predicted):
+        codes = self._station_codes(station_names)
+        actual = np.asarray(actual, dtype=np.float64)
+        predicted = np.asarray(predicted, dtype=np.float64)
+        scored = ~(np.isnan(predicted) | np.isnan(actual))
+        codes, actual, predicted = codes[scored], actual[scored], predicted[scored]
+
+        err = np.abs(predicted - actual)
+        positive = actual > 0
+        size = len(self.stations)
+        self.sums += np.stack([
+            np.bincount(codes, minlength=size),
+            np.bincount(codes, err ** 2, minlength=size),
+            np.bincount(codes, err, minlength=size),
+            np.bincount(codes[positive], minlength=size),
+            np.bincount(codes[positive], err[positive] / actual[positive], minlength=size),
+        ], axis=1)
+        return self
+
+    def by_station(self):
+        return error_table(self.sums, pd.Index(self.stations, name='station_name'))
+
+    def by_line(self, line_stations=LINE_STATIONS):
+        """Errors per line from the station sums; transfer stations count on each of their lines."""
+        table = station_table(self.stations, line_stations)
+        member = np.column_stack([table[f'on_{line.lower()}'].to_numpy() for line in line_stations]
+                                 + [table['n_lines'].to_numpy() == 0])
+        return error_table(member.T.astype(np.float64) @ self.sums, pd.Index([*line_stations, OTHER], name='line'))
+
+    def overall(self):
+        return error_table(self.sums.sum(axis=0, keepdims=True), pd.Index(['all'])).iloc[0]
+
+    def to_frame(self):
+        """Long table (group, name, n, rmse, mae, mape) of the per-station and per-line errors."""
+        parts = []
+        for group, table in [('station', self.by_station()), ('line', self.by_line())]:
+            table = table.rename_axis('name').reset_index()
+            table.insert(0, 'group', group)
+            parts.append(table)
+        return pd.concat(parts, ignore_index=True)
+
+
+def partition_file(directory, name, fmt):
+    # One file per station, its name escaped ('JFK/UMass' -> 'JFK%2FUMass')
+    return table_path(directory, quote(str(name), safe=' '), fmt)
+
+
+class PredictionWriter:
+    """
+    Writes prediction rows to `path` (any appendable format of storage.py), or
+    with partition_by='station' to one file per station in the directory
+    `path`, in the format of its extension (predictions.csv/ holds CSV
+    files) or fmt (default Parquet). Every write() is written in
+    (service_date, station_name) order; successive writes are expected to
+    cover successive date ranges, like the chunks of chunkedPipeline.py.
+    """
+
+    def __init__(self, path, partition_by=None, fmt=None, buffer_rows=None):
+        if partition_by not in (None, 'station'):
+            raise ValueError(f"Unknown partitioning {partition_by!r}")
+        self.path = path
+        self.partition_by = partition_by
+        if partition_by:
+            self.fmt = fmt or (format_of(path) if os.path.splitext(path)[1] else DEFAULT_FORMAT)
+        else:
+            self.fmt = format_of(path)
+        if self.fmt not in BUFFER_ROWS:
+            raise ValueError(f"Can't stream predictions to {self.fmt} tables: {path}")
+        self.buffer_rows = buffer_rows or BUFFER_ROWS[self.fmt]
+        self.errors = ErrorAccumulator()
+        self.rows = 0
+        self._writers = {}
+
+    def _writer(self, name):
+        writer = self._writers.get(name)
+        if writer is None:
+            path = partition_file(self.path, name, self.fmt) if self.partition_by else self.path
+            writer = self._writers[name] = TableWriter(path)
+        return writer
+
+    def write(self, frame, predicted, rows=None, actual_col='gated_entries'):
+        """
+        Write the rows of `frame` at positions `rows` (all rows by default)
+        with predicted[i] the prediction of rows[i]. Only the output columns
+        are gathered, one buffer at a time.
+        """
+        rows = np.arange(len(frame)) if rows is None else np.asarray(rows)
+        predicted = quantize(predicted)
+        if len(rows) != len(predicted):
+            raise ValueError(f"{len(rows)} rows but {len(predicted)} predictions")
+
+        # (date, station) order, unless the rows already are in it
+        dates = frame['service_date'].to_numpy()[rows]
+        stations = frame['station_name'].take(rows)
+        station_codes = stations.cat.codes.to_numpy() if isinstance(stations.dtype, pd.CategoricalDtype) \
+            else pd.factorize(stations, sort=True)[0]
+        same_day = dates[1:] == dates[:-1]
+        if (dates[1:] < dates[:-1]).any() or (same_day & (station_codes[1:] < station_codes[:-1])).any():
+            order = np.lexsort((station_codes, dates))
+            rows, predicted = rows[order], predicted[order]
+
+        columns = {col: frame[col] for col in PREDICTION_COLUMNS[:-2]}
+        columns['actual_entries'] = frame[actual_col]
+        for start in range(0, len(rows), self.buffer_rows):
+            take = rows[start:start + self.buffer_rows]
+            buffer = pd.DataFrame({col: series.array.take(take) for col, series in columns.items()})
+            buffer['predicted_entries'] = predicted[start:start + self.buffer_rows]
+            self.errors.add(buffer['station_name'], buffer['actual_entries'], buffer['predicted_entries'])
+            self._write_buffer(buffer)
+        return self
+
+    def _write_buffer(self, buffer):
+        if not self.partition_by:
+            self._writer(None).write(buffer)
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            for name, part in buffer.groupby('station_name', observed=True, sort=False):
+                self._writer(name).write(part)
+        self.rows += len(buffer)
+
+    def close(self):
+        """The written paths: the table, or one file per station."""
+        if not self.partition_by:
+            return self._writer(None).close()
+        return [writer.close() for writer in self._writers.values()]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for writer in self._writers.values():
+                writer.__exit__(exc_type, exc, tb)
+
+
+def write_predictions(path, frame, predicted, rows=None, partition_by=None, fmt=None,
+                      buffer_rows=None, errors_path=None):
+    """
+    Write one set of predictions (see PredictionWriter.write) and return the
+    ErrorAccumulator of the written rows. errors_path also stores its
+    per-station / per-line table.
+    """
+    with PredictionWriter(path, partition_by, fmt, buffer_rows) as writer:
+        writer.write(frame, predicted, rows)
+    if errors_path:
+        write_table(writer.errors.to_frame(), errors_path)
+    return writer.errors
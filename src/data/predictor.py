@@ -0,0 +1,260 @@
+"""
+Persisted model artifacts and a batch / online prediction API
+
+save_model writes the fitted pipeline with everything needed to rebuild its
+inputs (joblib, one file):
+
+  - the non-station column list and the station order behind the dummies
+  - the lag / window config and the last days of the training panel, so lag
+    and rolling features can be computed for dates after the training data,
+    plus every station's features on the last day (timeFeatures.FeatureState)
+    for stations silent for longer than those days
+
+The pipeline itself is stored as joblib bytes next to its polynomial form
+(scenarios.QuadraticModel, plain arrays), so loading an artifact and scoring
+never imports scikit-learn; the pipeline is only unpickled when asked for.
+
+Predictor loads an artifact once and scores batches of (date, station,
+weather) rows. Date features (calendar, season, COVID flags) are precomputed
+per date and stations are mapped to codes, so a batch is assembled with array
+lookups and goes straight into the sparse design matrix without get_dummies.
+For days after the last observed entries, the lag features carry the last
+observation forward; update_history feeds in newly observed days.
+"""
+import io
+import os
+import joblib
+import numpy as np
+import pandas as pd
+
+from . import config
+from .calendarFeatures import calendar_table
+from .scenarios import QuadraticModel
+from .storage import read_table
+from .timeFeatures import FeatureState, history_days, panel_features, station_panel, time_feature_columns
+from .tuningModel import (
+    EWM_SPANS,
+    FEATURE_VERSION,
+    LAGS,
+    STD_WINDOWS,
+    WINDOWS,
+    FeatureCache,
+    add_period_flags,
+    default_merged_path,
+    load_feature_frame,
+    make_pipeline,
+    model_feature_columns,
+)
+
+# 2: pipeline stored as joblib bytes, plus its polynomial form ('scorer')
+# 3: per-station feature state at the end of the history ('state')
+ARTIFACT_VERSION = 3
+READABLE_VERSIONS = (1, 2, 3)
+
+
+def save_model(path, pipeline, observed, x_cols, lags=LAGS, windows=WINDOWS, std_windows=STD_WINDOWS, ewm_spans=EWM_SPANS):
+    """
+    Write a fitted pipeline and its feature schema to `path`. observed holds the
+    stored rows (service_date, station_name, gated_entries) up to the end of
+    training, before the feature frame's dropna, so the lag history has no gaps.
+    """
+    config = {'lags': tuple(lags), 'windows': tuple(windows),
+              'std_windows': tuple(std_windows), 'ewm_spans': tuple(ewm_spans)}
+    station = observed['station_name']
+    # Same order pd.get_dummies used: categories for a categorical, sorted values otherwise
+    stations = list(station.cat.categories) if isinstance(station.dtype, pd.CategoricalDtype) else sorted(station.unique())
+
+    panel, _, _ = station_panel(observed)
+    panel = panel.reindex(columns=stations)
+    history = panel.iloc[-history_days(**config):]
+    # Features on the last day, as training computes them over the whole history
+    state = FeatureState()
+    panel_features(panel, **config, state=state)
+
+    blob = io.BytesIO()
+    joblib.dump(pipeline, blob)
+    degree = pipeline.named_steps['poly'].degree
+    artifact = {
+        'version': ARTIFACT_VERSION,
+        'feature_version': FEATURE_VERSION,
+        'pipeline': blob.getvalue(),
+        'scorer': QuadraticModel.from_pipeline(pipeline) if degree <= 2 else None,
+        'x_cols': list(x_cols),
+        'stations': stations,
+        'config': config,
+        'history': history,
+        'state': state,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    joblib.dump(artifact, path)
+    return path
+
+
+def train_model(
+    csv_path=None,
+    model_path=None,
+    train_end=None,
+    lags=LAGS,
+    windows=WINDOWS,
+    std_windows=STD_WINDOWS,
+    ewm_spans=EWM_SPANS,
+    use_cache=True
+):
+    """Fit the station-aware pipeline on every day up to train_end (default: all) and save it."""
+    csv_path = csv_path or default_merged_path()
+    feature_config = dict(lags=lags, windows=windows, std_windows=std_windows, ewm_spans=ewm_spans)
+    df = load_feature_frame(csv_path, **feature_config, cache=FeatureCache() if use_cache else None)
+    observed = read_table(csv_path, columns=['service_date', 'station_name', 'gated_entries'])
+    if train_end is not None:
+        df = df[df['service_date'] <= train_end].reset_index(drop=True)
+        observed = observed[observed['service_date'] <= train_end]
+
+    x_cols = model_feature_columns(time_feature_columns(**feature_config))
+    X = pd.concat([df[x_cols], pd.get_dummies(df['station_name'], drop_first=True)], axis=1)
+    pipeline = make_pipeline(n_base=len(x_cols))
+    pipeline.fit(X, df['gated_entries'])
+    return save_model(model_path or config.model_path(), pipeline, observed, x_cols, **feature_config)
+
+
+class Predictor:
+
+    def __init__(self, artifact, horizon_days=366):
+        if artifact.get('version') not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported model artifact version {artifact.get('version')}")
+        # Fitted pipeline, or its joblib bytes until first used
+        self._pipeline = artifact['pipeline']
+        self.scorer = artifact.get('scorer')
+        self.x_cols = artifact['x_cols']
+        self.config = artifact['config']
+        self.stations = pd.Index(artifact['stations'])
+        self.history = artifact['history']
+        # Features of stations the history can't define (none in version 1-2 artifacts)
+        self.state = artifact.get('state')
+        self._date_table = None
+        # Date features from the start of the history through horizon_days past its end
+        start = self.history.index[0]
+        self._extend_dates(pd.date_range(start, self.history.index[-1] + pd.Timedelta(days=horizon_days)))
+
+    @classmethod
+    def load(cls, path=None, **kwargs):
+        return cls(joblib.load(path or config.model_path()), **kwargs)
+
+    @property
+    def pipeline(self):
+        if isinstance(self._pipeline, bytes):
+            self._pipeline = joblib.load(io.BytesIO(self._pipeline))
+        return self._pipeline
+
+    @property
+    def last_observed(self):
+        return self.history.index[-1]
+
+    def _extend_dates(self, dates):
+        # Precompute calendar / season / period features for dates not in the table yet
+        dates = pd.DatetimeIndex(dates).unique()
+        if self._date_table is not None:
+            dates = dates.difference(self._date_table.index)
+        if not len(dates):
+            return
+        # Holidays of the neighbouring years too (calendar_table's default), as in training
+        table = calendar_table(dates)
+        table = pd.get_dummies(table, columns=['season'], drop_first=True)
+        table['service_date'] = table.index
+        table = add_period_flags(table)
+        self._date_table = table if self._date_table is None else pd.concat([self._date_table, table]).sort_index()
+
+    def update_history(self, observed):
+        """Add observed rows (service_date, station_name, gated_entries) to the lag history."""
+        panel, _, _ = station_panel(observed)
+        panel = panel.reindex(columns=self.stations)
+        index = self.history.index.union(panel.index)
+        index = pd.date_range(index[0], index[-1], freq='D')
+        history = self.history.reindex(index)
+        history.update(panel)
+        if self.state is not None:
+            panel_features(history, **self.config, state=self.state)
+        self.history = history.iloc[-history_days(**self.config):]
+        return self
+
+    def _time_features(self, days):
+        # Feature panels from the history start through the last requested day,
+        # with the last observation carried forward past the end of the history.
+        # Stations without an observation in the history keep their carried state
+        end = self.history.index[0] + pd.Timedelta(days=int(days.max()))
+        index = pd.date_range(self.history.index[0], max(end, self.last_observed), freq='D')
+        panel = self.history.reindex(index)
+        n = len(self.history)
+        panel.iloc[n - 1:] = panel.iloc[n - 1:].ffill()
+        features = panel_features(panel, **self.config)
+        if self.state is not None:
+            for name, frame in features.items():
+                frame.iloc[n - 1:] = frame.iloc[n - 1:].fillna(self.state.values[name])
+        return features
+
+    def station_codes(self, stations):
+        codes = self.stations.get_indexer(pd.Index(stations))
+        if (codes < 0).any():
+            unknown = pd.Index(stations)[codes < 0].unique()
+            raise KeyError(f"Stations not in the model: {list(unknown)}")
+        return codes
+
+    def design(self, df):
+        """
+        Non-station feature matrix and station codes for rows with service_date,
+        station_name and the weather columns.
+        """
+        dates = pd.DatetimeIndex(pd.to_datetime(df['service_date']))
+        if dates.min() < self.history.index[0]:
+            raise ValueError(f"Dates before {self.history.index[0].date()} are outside the model history")
+        self._extend_dates(dates)
+
+        codes = self.station_codes(df['station_name'])
+        date_rows = self._date_table.index.get_indexer(dates)
+        days = ((dates - self.history.index[0]) // pd.Timedelta(days=1)).to_numpy()
+        time = self._time_features(days)
+
+        base = np.empty((len(df), len(self.x_cols)))
+        for i, col in enumerate(self.x_cols):
+            if col in time:
+                base[:, i] = time[col].to_numpy()[days, codes]
+            elif col in self._date_table.columns:
+                base[:, i] = self._date_table[col].to_numpy(dtype=np.float64)[date_rows]
+            else:
+                base[:, i] = df[col].to_numpy(dtype=np.float64)
+        return base, codes
+
+    def predict(self, df):
+        """
+        Predicted gated entries (rounded, clipped at 0) for every row of df. NaN
+        where a feature is missing, e.g. a station with no entries in the history.
+        """
+        base, codes = self.design(df)
+        ok = np.isfinite(base).all(axis=1)
+        pred = np.full(len(base), np.nan)
+        if ok.any() and self.scorer is not None:
+            pred[ok] = np.clip(np.rint(self.scorer.predict(base[ok], codes[ok])), 0, None)
+        elif ok.any():
+            from .designMatrix import station_polynomial_matrix
+            poly = self.pipeline.named_steps['poly']
+            # Station 0 is the dropped baseline, like get_dummies(drop_first=True)
+            Z = station_polynomial_matrix(base[ok], codes[ok] - 1, poly.n_stations_, degree=poly.degree)
+            pred[ok] = np.clip(np.rint(self.pipeline[1:].predict(Z)), 0, None)
+        return pred
+
+    def active_stations(self):
+        # Stations with at least one observation in the lag history
+        return self.stations[self.history.notna().any().to_numpy()]
+
+    def forecast(self, weather, stations=None):
+        """
+        Predictions for every active station (or `stations`) on every date of
+        `weather`, one row per date with service_date and the weather columns,
+        e.g. the next 7 days of a weather forecast.
+        """
+        stations = self.active_stations() if stations is None else pd.Index(stations)
+        weather = weather.reset_index(drop=True)
+        rows = weather.loc[np.repeat(np.arange(len(weather)), len(stations))].reset_index(drop=True)
+        rows['station_name'] = np.tile(stations.to_numpy(), len(weather))
+        out = rows[['service_date', 'station_name']].copy()
+        out['predicted_entries'] = self.predict(rows)
+        return out
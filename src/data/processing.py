@@ -16,41 +16,73 @@ import pandas as pd
 import numpy as np
 import os
 import glob
-
-# Abs Path to Data relative to script
-script_dir = os.path.dirname(os.path.abspath(__file__))
-mbta_path = os.path.join(script_dir, "..", '..', 'data', 'raw', 'mbta_data.csv')
-weather_path = os.path.join(script_dir, "..", '..', 'data', 'raw', 'weather_data.csv')
-processed_dir = os.path.join(script_dir, "..", "..", "data", "processed")
-data_dir = os.path.join(script_dir, "..", '..', 'data', 'raw', 'yearly_mbta_data')
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from . import config
+from .instrumentation import add_bytes, diagnostic, record, traced, verbose
+from .schema import TABLES, apply_schema, concat_tables, csv_dtypes, validate
+from .storage import find_table, read_table, table_path, write_table
+from .weatherStore import SOURCE_COLUMN, WeatherStore
+
+# Default paths under the configured data directory (see config.py), resolved
+# by the stages when they run
+def default_paths():
+  raw = config.raw_dir()
+  return {
+    'mbta_path': table_path(raw, 'mbta_data'),
+    'weather_path': os.path.join(raw, 'weather_data.csv'),
+    'processed_dir': config.processed_dir(),
+    'data_dir': os.path.join(raw, 'yearly_mbta_data'),
+    'zip_path': os.path.join(raw, 'yearly_mbta_data.zip'),
+  }
+
+# Columns each stage actually reads from the stored tables
+MBTA_COLUMNS = ['service_date', 'station_name', 'gated_entries']
+
+# Compact dtypes for streaming ingestion: dates/stations repeat a lot within a chunk,
+# and float32 holds integer entry counts exactly
+MBTA_STREAM_DTYPES = {'service_date': 'category', 'station_name': 'category', 'gated_entries': 'float32'}
 
 
 # Handling the folder of yearly mbta data
 
-# Creates a combined csv file from a zip folder of mbta csv files
-def process_zip(data_dir = data_dir):
+# Creates one combined table (Parquet by default) from the folder of yearly mbta csv files
+@traced()
+def process_zip(data_dir = None, output_path = None):
+  data_dir = data_dir or default_paths()['data_dir']
+  output_path = output_path or default_paths()['mbta_path']
   # Create a list of all CSV files in the directory.
   csv_files = glob.glob(os.path.join(data_dir, "**", "*.csv"), recursive=True)
 
   # Read and collect all DataFrames.
   list_of_dfs = []
   for file in csv_files:
-      df = pd.read_csv(file)
-      list_of_dfs.append(df)
-
-  # Concatenate all the DataFrames into one
-  merged_df = pd.concat(list_of_dfs, ignore_index=True)
-
-  output_path = os.path.join(script_dir, "..", '..', 'data', 'raw', 'mbta_data.csv')
-  os.makedirs(os.path.dirname(output_path), exist_ok=True)
-  merged_df.to_csv(output_path, index=False)
-
-def process_mbta(mbta_path = mbta_path):
+      # Schema dtypes at read time: categorical identifiers; counts stay float32
+      # (some source rows are fractional) and are rounded after the daily sum
+      df = pd.read_csv(file, dtype=csv_dtypes(TABLES['mbta_raw']))
+      add_bytes(read=os.path.getsize(file))
+      list_of_dfs.append(apply_schema(df, round_counts=False))
+
+  # Concatenate all the DataFrames into one, merging the per-file categories
+  merged_df = concat_tables(list_of_dfs)
+  record(rows_in=len(merged_df), rows_out=len(merged_df), files=len(csv_files))
+
+  write_table(merged_df, output_path, round_counts=False)
+
+@traced()
+def process_mbta(mbta_path = None, fmt = None, output_dir = None):
+  mbta_path = mbta_path or find_table(config.raw_dir(), 'mbta_data')
+  output_dir = output_dir or config.processed_dir()
   # Processing MBTA data created from the combined yearly data
-  df_mbta = pd.read_csv(mbta_path)
-  print("Head of MBTA data: \n", df_mbta.head())
-  print("MBTA date range:", df_mbta['service_date'].min(), "to", df_mbta['service_date'].max())
-  print("Null values of MBTA data: \n", df_mbta.isnull().sum())
+  # Only the columns we keep are read, see the null value notes below
+  df_mbta = read_table(mbta_path, columns=MBTA_COLUMNS, round_counts=False)
+  record(rows_in=len(df_mbta))
+  # Diagnostic dumps scan the whole table, so they only run when verbose
+  if verbose():
+    print("Head of MBTA data: \n", df_mbta.head())
+    print("MBTA date range:", df_mbta['service_date'].min(), "to", df_mbta['service_date'].max())
+    print("Null values of MBTA data: \n", df_mbta.isnull().sum())
 
   """
 
@@ -76,15 +108,15 @@ def process_mbta(mbta_path = mbta_path):
 
   """
 
-  # Dropping stop_id and route_or_line columns
-  df_mbta = df_mbta.drop(columns = ['stop_id', 'route_or_line'])
-  print("Remaining columns of MBTA data: \n", df_mbta.columns)
+  # stop_id and route_or_line are never read (column projection above)
+  diagnostic("Remaining columns of MBTA data: \n", df_mbta.columns)
 
   # Grouping by service_date and station_name
-  df_mbta_grouped = df_mbta.groupby(['service_date', 'station_name'], as_index=False)['gated_entries'].sum()
-  df_mbta_grouped['service_date'] = pd.to_datetime(df_mbta_grouped['service_date']).dt.date
+  # Summed as read, then rounded once per day like the streaming path (merge_partial_sums)
+  df_mbta_grouped = df_mbta.groupby(['service_date', 'station_name'], as_index=False, observed=True)['gated_entries'].sum()
+  df_mbta_grouped = validate(apply_schema(df_mbta_grouped), 'mbta')
 
-  print(df_mbta_grouped.head())
+  diagnostic(df_mbta_grouped.head())
   """
     Going through the weathers data set and finding null values
     
@@ -93,18 +125,99 @@ def process_mbta(mbta_path = mbta_path):
   """
 
   # Creating the processed dataset for MBTA
-  mbta_processed_file = os.path.join(processed_dir, "processed_mbta.csv")
+  write_table(df_mbta_grouped, table_path(output_dir, "processed_mbta", fmt))
+  return df_mbta_grouped
+
+
+# Streaming ingestion of the yearly mbta files
+
+# Yearly csv members of a zip archive (or csv files of an extracted folder)
+def list_mbta_sources(source = None):
+  source = source or default_paths()['zip_path']
+  if os.path.isdir(source):
+    return sorted(glob.glob(os.path.join(source, "**", "*.csv"), recursive=True))
+  with zipfile.ZipFile(source) as zf:
+    return sorted(name for name in zf.namelist()
+                  if name.lower().endswith('.csv') and not name.startswith('__MACOSX'))
+
+
+def _partial_sums(chunk):
+  # (service_date, station_name) sums of one chunk, with the date categories parsed only once
+  sums = chunk.groupby(['service_date', 'station_name'], observed=True)['gated_entries'].sum().reset_index()
+  dates = pd.to_datetime(sums['service_date'].cat.categories)
+  if dates.tz is not None:
+    dates = dates.tz_localize(None)
+  sums['service_date'] = dates.normalize()[sums['service_date'].cat.codes]
+  sums['station_name'] = sums['station_name'].astype(str)
+  return sums
+
+
+def aggregate_mbta_source(source, member, chunksize = 500_000):
+  """
+    Daily station totals of one yearly file, read in chunks with only the three
+    columns we keep. Reads the member straight out of the zip (no extraction),
+    so memory is bounded by one chunk plus the per-day aggregate.
+  """
+  def read(handle):
+    chunks = pd.read_csv(handle, usecols=MBTA_COLUMNS, dtype=MBTA_STREAM_DTYPES, chunksize=chunksize)
+    return [_partial_sums(chunk) for chunk in chunks]
+
+  if os.path.isdir(source):
+    partials = read(member)
+  else:
+    with zipfile.ZipFile(source) as zf, zf.open(member) as handle:
+      partials = read(handle)
+  return merge_partial_sums(partials)
+
 
-  os.makedirs(processed_dir, exist_ok=True)
-  df_mbta_grouped.to_csv(mbta_processed_file, index=False)
+def merge_partial_sums(partials):
+  # Combine partial (service_date, station_name) sums from chunks / files
+  merged = pd.concat(partials, ignore_index=True)
+  merged = merged.groupby(['service_date', 'station_name'], as_index=False, sort=True)['gated_entries'].sum()
+  return apply_schema(merged)
+
+
+# Daily station totals per yearly file, one worker process per file (n_jobs=1 runs inline)
+def aggregate_mbta_sources(source, members, chunksize = 500_000, n_jobs = None):
+  if n_jobs == 1 or len(members) <= 1:
+    return [aggregate_mbta_source(source, member, chunksize) for member in members]
+  with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+    futures = [pool.submit(aggregate_mbta_source, source, member, chunksize) for member in members]
+    return [future.result() for future in futures]
+
+
+def stream_mbta_aggregates(source = None, chunksize = 500_000, n_jobs = None):
+  """
+    Same table as process_zip + process_mbta, without the combined raw file.
+    Each yearly file is aggregated in its own worker process and the partial
+    sums are merged at the end.
+  """
+  source = source or default_paths()['zip_path']
+  members = list_mbta_sources(source)
+  if not members:
+    raise ValueError(f"No mbta csv files found in {source}")
+  return merge_partial_sums(aggregate_mbta_sources(source, members, chunksize, n_jobs))
+
+
+# Streaming alternative to process_zip + process_mbta: writes processed_mbta directly
+@traced()
+def process_zip_streaming(source = None, chunksize = 500_000, n_jobs = None, fmt = None, output_dir = None):
+  source = source or default_paths()['zip_path']
+  output_dir = output_dir or config.processed_dir()
+  df_mbta_grouped = stream_mbta_aggregates(source, chunksize, n_jobs)
+  # Bytes of the archive as stored (or of the csv files of an extracted folder)
+  sources = list_mbta_sources(source) if os.path.isdir(source) else [source]
+  add_bytes(read=sum(os.path.getsize(path) for path in sources))
+  write_table(df_mbta_grouped, table_path(output_dir, "processed_mbta", fmt))
   return df_mbta_grouped
 
 
-def process_weather(weather_path):
-  # Processing Weather data
-  df_weather = pd.read_csv(weather_path)
-  print("Head of weather data: \n", df_weather.head())
-  print("Null values of weather data: \n", df_weather.isnull().sum())
+def read_weather_source(weather_path, source = None):
+  # One raw weather file, cleaned to service_date + weather columns (float32 measurements, see schema.py)
+  df_weather = read_table(weather_path)
+  if verbose():
+    print("Head of weather data: \n", df_weather.head())
+    print("Null values of weather data: \n", df_weather.isnull().sum())
 
   """ 
 
@@ -134,43 +247,60 @@ def process_weather(weather_path):
       
   """
 
-  # Inputing the missing null value for tavg
-  # Uses the avg of tmax and tmin for that day
-  df_weather.loc[df_weather['tavg'].isnull(), 'tavg'] = (df_weather['tmin'] + df_weather['tmax']) / 2
-
-  print("Null values of weather data: \n", df_weather.isnull().sum())
-
   # Dropping wdir and pres columns
-  df_weather = df_weather.drop(columns = ['wdir', 'pres'])
-  print("Remaining columns of weather data: \n", df_weather.columns)
+  df_weather = df_weather.drop(columns = ['wdir', 'pres'], errors = 'ignore')
+  diagnostic("Remaining columns of weather data: \n", df_weather.columns)
 
   # Renaming time in mbta data to service_date
   df_weather.rename(columns={'time': 'service_date'}, inplace=True)
-  df_weather['service_date'] = pd.to_datetime(df_weather['service_date']).dt.date
+  df_weather['service_date'] = pd.to_datetime(df_weather['service_date'])
+  if source is not None and SOURCE_COLUMN not in df_weather.columns:
+    df_weather[SOURCE_COLUMN] = source
+  return df_weather
+
+
+@traced()
+def process_weather(weather_path = None, fmt = None, output_dir = None, how = 'mean'):
+  weather_path = weather_path or default_paths()['weather_path']
+  output_dir = output_dir or config.processed_dir()
+  # One weather file, or a list of them (one weather station each, combined per day, see weatherStore.py)
+  paths = [weather_path] if isinstance(weather_path, (str, os.PathLike)) else list(weather_path)
+  sources = [read_weather_source(path, os.path.basename(path) if len(paths) > 1 else None) for path in paths]
+  df_weather = sources[0] if len(sources) == 1 else pd.concat(sources, ignore_index=True)
+  record(rows_in=len(df_weather))
+
+  # Every day from the first to the last observation, missing values imputed
+  # (tavg from tmin / tmax, short gaps interpolated, the rest from the season)
+  store = WeatherStore.from_frame(df_weather, how = how)
+  if verbose():
+    print("Imputed values of weather data: \n", store.imputed_counts())
+  record(imputed=int(store.imputed.sum()))
+
+  df_weather = validate(apply_schema(store.to_frame()), 'weather')
 
   # Creating Weather processed file
-  weather_processed_file = os.path.join(processed_dir, "processed_weather.csv")
-  os.makedirs(processed_dir, exist_ok=True)
-  df_weather.to_csv(weather_processed_file, index=False)
+  write_table(df_weather, table_path(output_dir, "processed_weather", fmt))
   return df_weather
   
   
   
-# Combines cleaned mbta and weather data
-def combine_data(df_mbta_grouped, df_weather):
-  # Merge MBTA and weather data on the date)
-  df_merged = pd.merge(df_mbta_grouped, df_weather, on='service_date', how='inner')
+# Merges cleaned mbta and weather data by date (no file output)
+def merge_mbta_weather(df_mbta_grouped, df_weather):
+  # Weather looked up by day offset; MBTA days after the last weather day are left out
+  return WeatherStore.from_frame(df_weather).join(df_mbta_grouped)
 
-  # Weather data only goes up to March 1st, 2023, so the merged data should also only go up to that date
-  end_date = pd.to_datetime("2023-03-01")
-  df_merged['service_date'] = pd.to_datetime(df_merged['service_date'])
-  df_merged = df_merged[df_merged['service_date'] <= end_date]
-  print("Merged DataFrame head: \n", df_merged.head())
+
+# Combines cleaned mbta and weather data
+@traced()
+def combine_data(df_mbta_grouped, df_weather, fmt = None, output_dir = None):
+  output_dir = output_dir or config.processed_dir()
+  record(rows_in=len(df_mbta_grouped) + len(df_weather))
+  df_merged = validate(merge_mbta_weather(df_mbta_grouped, df_weather), 'merged')
+  diagnostic("Merged DataFrame head: \n", df_merged.head())
 
 
 
-  # Creating processed csv for merged mbta and weather
-  merged_processed_file = os.path.join(processed_dir, "merged_mbta_weather.csv")
-  os.makedirs(processed_dir, exist_ok=True)
-  df_merged.to_csv(merged_processed_file, index=False)
+  # Creating processed table for merged mbta and weather
+  write_table(df_merged, table_path(output_dir, "merged_mbta_weather", fmt))
+  return df_merged
     
\ No newline at end of file
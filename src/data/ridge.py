@@ -0,0 +1,294 @@
+"""
+Ridge regression solved through the normal equations
+
+The station-aware design matrix is tall (one row per station-day) and has a
+couple of thousand columns, so X^T X is small and cheap to factor. Solving
+(X^T X + alpha I) w = X^T y directly is exact and much faster than iterating
+sparse_cg to a tight tolerance, and it accepts the sparse matrix from
+designMatrix.StationPolynomialFeatures.
+
+The same statistics give the rest of the engine: GramAccumulator sums them
+over chunks or time blocks, ridge_path solves a whole alpha grid from one
+eigendecomposition, and RidgePathCV runs the rolling-origin alpha search of
+run_model_pipeline from per-block sums instead of refitting every fold.
+"""
+import numpy as np
+import scipy.linalg
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.model_selection import TimeSeriesSplit
+
+
+def sparse_gram(X, dense_threshold=0.5):
+    """
+    X^T X for a sparse matrix whose columns are a mix of dense and sparse ones.
+
+    Columns filled above dense_threshold go through a BLAS product, the rest stay
+    sparse, which is much faster than a plain sparse X.T @ X on the design matrix.
+    """
+    if not sp.issparse(X):
+        X = np.asarray(X, dtype=np.float64)
+        return X.T @ X
+
+    X = sp.csc_matrix(X, dtype=np.float64)
+    fill = np.diff(X.indptr) / max(X.shape[0], 1)
+    dense_cols = np.flatnonzero(fill > dense_threshold)
+    sparse_cols = np.flatnonzero(fill <= dense_threshold)
+
+    D = X[:, dense_cols].toarray()
+    S = X[:, sparse_cols].tocsr()
+
+    gram = np.empty((X.shape[1], X.shape[1]))
+    gram[np.ix_(dense_cols, dense_cols)] = D.T @ D
+    cross = np.asarray(S.T @ D)
+    gram[np.ix_(sparse_cols, dense_cols)] = cross
+    gram[np.ix_(dense_cols, sparse_cols)] = cross.T
+    gram[np.ix_(sparse_cols, sparse_cols)] = (S.T @ S).toarray()
+    return gram
+
+
+def normal_equations(X, y, center=True):
+    """
+    X^T X and X^T y, centered as if the column means had been subtracted from X
+    (without densifying sparse X). Returns (gram, xty, x_mean, y_mean).
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = X.shape[0]
+    gram = sparse_gram(X)
+    xty = np.asarray(X.T @ y).ravel()
+    if not center:
+        return gram, xty, np.zeros(X.shape[1]), 0.0
+
+    x_mean = np.asarray(X.sum(axis=0)).ravel() / n
+    y_mean = y.mean()
+    gram -= n * np.outer(x_mean, x_mean)
+    xty -= n * x_mean * y_mean
+    return gram, xty, x_mean, y_mean
+
+
+def solve_ridge(gram, xty, alpha):
+    # Cholesky solve of (gram + alpha I) w = xty
+    A = gram + alpha * np.eye(gram.shape[0])
+    return scipy.linalg.solve(A, xty, assume_a='pos')
+
+
+# From this many alphas on, ridge_path solves through one eigendecomposition
+# (about 8 Cholesky solves' worth) instead of one Cholesky solve per alpha
+EIGH_MIN_ALPHAS = 8
+
+
+def ridge_path(gram, xty, alphas):
+    """
+    Solutions of (gram + alpha I) w = xty for every alpha, as columns of a
+    (n_features x n_alphas) array. A long grid costs one eigendecomposition
+    gram = Q diag(lam) Q^T, then w = Q diag(1 / (lam + alpha)) Q^T xty per alpha.
+    """
+    alphas = np.asarray(alphas, dtype=np.float64)
+    if len(alphas) < EIGH_MIN_ALPHAS:
+        return np.column_stack([solve_ridge(gram, xty, alpha) for alpha in alphas])
+    lam, Q = scipy.linalg.eigh(gram)
+    return Q @ ((Q.T @ xty)[:, None] / (lam[:, None] + alphas[None, :]))
+
+
+class NormalEquationRidge(RegressorMixin, BaseEstimator):
+    """
+    Ridge(alpha) for dense or sparse X, fitted from X^T X.
+
+    The intercept is handled by centering the Gram matrix instead of X, so
+    sparse input stays sparse and gives the same solution as centering X.
+    """
+
+    def __init__(self, alpha=1.0, fit_intercept=True):
+        self.alpha = alpha
+        self.fit_intercept = fit_intercept
+
+    def fit(self, X, y):
+        gram, xty, x_mean, y_mean = normal_equations(X, y, self.fit_intercept)
+        self.coef_ = solve_ridge(gram, xty, self.alpha)
+        self.intercept_ = y_mean - x_mean @ self.coef_
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def predict(self, X):
+        return np.asarray(X @ self.coef_).ravel() + self.intercept_
+
+
+class GramAccumulator:
+    """
+    Running X^T X, X^T y, column sums and y moments over chunks of rows, so a
+    ridge model can be fitted without ever holding all rows at once.
+
+    solve() gives the same coefficients as StandardScaler(with_mean=False)
+    followed by NormalEquationRidge on the stacked rows, expressed on the
+    unscaled columns; sse() scores a solution on the accumulated rows.
+    """
+
+    def __init__(self, n_features=None):
+        self.n = 0
+        self.gram = self.xty = self.x_sum = None
+        self.y_sum = 0.0
+        self.yy = 0.0
+        if n_features is not None:
+            self._allocate(n_features)
+
+    def _allocate(self, n_features):
+        self.gram = np.zeros((n_features, n_features))
+        self.xty = np.zeros(n_features)
+        self.x_sum = np.zeros(n_features)
+
+    def add(self, X, y):
+        y = np.asarray(y, dtype=np.float64)
+        if self.gram is None:
+            self._allocate(X.shape[1])
+        if not len(y):
+            return self
+        self.n += len(y)
+        self.gram += sparse_gram(X)
+        self.xty += np.asarray(X.T @ y).ravel()
+        self.x_sum += np.asarray(X.sum(axis=0)).ravel()
+        self.y_sum += y.sum()
+        self.yy += y @ y
+        return self
+
+    def __add__(self, other):
+        out = GramAccumulator()
+        for acc in (self, other):
+            if acc.gram is None:
+                continue
+            if out.gram is None:
+                out._allocate(acc.gram.shape[0])
+            out.n += acc.n
+            out.gram += acc.gram
+            out.xty += acc.xty
+            out.x_sum += acc.x_sum
+            out.y_sum += acc.y_sum
+            out.yy += acc.yy
+        return out
+
+    def std(self):
+        # Column stds as StandardScaler(with_mean=False) computes them (constant columns: 1)
+        self._check_rows()
+        x_mean = self.x_sum / self.n
+        std = np.sqrt(np.maximum(np.diag(self.gram) / self.n - x_mean ** 2, 0))
+        std[std == 0] = 1.0
+        return std
+
+    def scaled(self, std):
+        """Statistics of the same rows with every column divided by std."""
+        out = GramAccumulator()
+        out.n, out.y_sum, out.yy = self.n, self.y_sum, self.yy
+        if self.gram is not None:
+            out.gram = self.gram / np.outer(std, std)
+            out.xty = self.xty / std
+            out.x_sum = self.x_sum / std
+        return out
+
+    def _check_rows(self):
+        if not self.n:
+            raise ValueError("No rows accumulated: can't fit a ridge model on an empty range")
+
+    def path(self, alphas, scale=True, fit_intercept=True):
+        """
+        Coefficients (n_features x n_alphas) and intercepts (n_alphas) of the
+        ridge fit for every alpha, see ridge_path. scale=True fits on the
+        columns divided by their std, like StandardScaler(with_mean=False).
+        """
+        self._check_rows()
+        x_mean = self.x_sum / self.n if fit_intercept else np.zeros_like(self.x_sum)
+        y_mean = self.y_sum / self.n if fit_intercept else 0.0
+        gram = self.gram - self.n * np.outer(x_mean, x_mean)
+        xty = self.xty - self.n * x_mean * y_mean
+        if scale:
+            std = np.sqrt(np.maximum(np.diag(gram), 0) / self.n)
+            std[std == 0] = 1.0
+            coefs = ridge_path(gram / np.outer(std, std), xty / std, alphas) / std[:, None]
+        else:
+            coefs = ridge_path(gram, xty, alphas)
+        return coefs, y_mean - x_mean @ coefs
+
+    def solve(self, alpha, scale=True, fit_intercept=True):
+        """(coef, intercept) of the ridge fit for one alpha."""
+        coefs, intercepts = self.path([alpha], scale, fit_intercept)
+        return coefs[:, 0], float(intercepts[0])
+
+    def sse(self, coef, intercept):
+        """
+        sum((y - X coef - intercept)^2) from the accumulated moments; coef and
+        intercept may also be a (n_features x k) path and k intercepts.
+        """
+        C = np.asarray(coef, dtype=np.float64).reshape(len(coef), -1)
+        b = np.atleast_1d(np.asarray(intercept, dtype=np.float64))
+        sse = (self.yy - 2 * self.xty @ C - 2 * b * self.y_sum + np.sum(C * (self.gram @ C), axis=0)
+               + 2 * b * (self.x_sum @ C) + self.n * b ** 2)
+        return float(sse[0]) if np.ndim(coef) == 1 else sse
+
+
+def time_series_bounds(n_rows, n_splits=5):
+    # Row bounds of TimeSeriesSplit's blocks: the first fold's training rows, then the n_splits test blocks
+    test_starts = [test[0] for _, test in TimeSeriesSplit(n_splits=n_splits).split(np.empty((n_rows, 1)))]
+    return [0, *test_starts, n_rows]
+
+
+def cross_validate_blocks(blocks, alphas, scoring='r2', fit_intercept=True):
+    """
+    Rolling-origin scores (n_folds x n_alphas) from per-block statistics: fold k
+    trains on blocks[:k + 1] and is scored on blocks[k + 1]. Returns the scores
+    and the accumulator of all blocks, for the final refit.
+    """
+    train = blocks[0]
+    scores = np.empty((len(blocks) - 1, len(alphas)))
+    for k, test in enumerate(blocks[1:]):
+        coefs, intercepts = train.path(alphas, scale=False, fit_intercept=fit_intercept)
+        sse = test.sse(coefs, intercepts)
+        if scoring == 'r2':
+            scores[k] = 1 - sse / (test.yy - test.y_sum ** 2 / test.n)
+        elif scoring == 'neg_mean_squared_error':
+            scores[k] = -sse / test.n
+        else:
+            raise ValueError(f"Unsupported scoring {scoring!r}")
+        train = train + test
+    return scores, train
+
+
+class RidgePathCV(RegressorMixin, BaseEstimator):
+    """
+    Ridge with alpha picked by rolling-origin cross-validation, like
+    GridSearchCV(NormalEquationRidge(), {'alpha': alphas}, cv=TimeSeriesSplit(n_splits))
+    scored by R^2 (its default) or by 'neg_mean_squared_error', without
+    refitting per fold and alpha.
+
+    The rows are cut into the n_splits + 1 time blocks of TimeSeriesSplit and
+    X^T X / X^T y are accumulated once per block; a fold's training statistics
+    are the sum of the blocks before its test block. Each fold solves the whole
+    alpha grid at once (ridge_path) and is scored on its test block from the
+    block's moments, so a dense grid costs about one fit per fold.
+    """
+
+    def __init__(self, alphas=(0.1, 1.0, 10.0), n_splits=5, scoring='r2', fit_intercept=True):
+        self.alphas = alphas
+        self.n_splits = n_splits
+        self.scoring = scoring
+        self.fit_intercept = fit_intercept
+
+    def fit(self, X, y):
+        y = np.asarray(y, dtype=np.float64)
+        alphas = np.asarray(self.alphas, dtype=np.float64)
+        if sp.issparse(X):
+            X = sp.csr_matrix(X)
+        else:
+            X = np.asarray(X, dtype=np.float64)
+
+        # Same test blocks as TimeSeriesSplit: n_splits blocks at the end, the rest trains the first fold
+        bounds = time_series_bounds(len(y), self.n_splits)
+        blocks = [GramAccumulator(X.shape[1]).add(X[a:b], y[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+        scores, train = cross_validate_blocks(blocks, alphas, self.scoring, self.fit_intercept)
+
+        self.cv_results_ = {'alphas': alphas, 'fold_scores': scores, 'mean_score': scores.mean(axis=0)}
+        # First alpha with the best mean score, as GridSearchCV ranks ties
+        self.alpha_ = float(alphas[np.argmax(self.cv_results_['mean_score'])])
+        self.coef_, self.intercept_ = train.solve(self.alpha_, scale=False, fit_intercept=self.fit_intercept)
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def predict(self, X):
+        return np.asarray(X @ self.coef_).ravel() + self.intercept_
@@ -0,0 +1,211 @@
+"""
+Batched weather what-if scenarios on a fitted station-aware pipeline
+
+The pipeline's prediction is a polynomial of degree <= 2 in the base features
+x: the global expansion gives a constant, linear and quadratic part, and the
+station terms (dummy, dummy x base) add a station constant and a station
+linear part. QuadraticModel folds the scaler into the ridge coefficients and
+keeps it in that form,
+
+    f(x, s) = c + c_s + (b + B_s) . x + x^T Q x
+
+For a set V of weather columns that a scenario changes, every (station, date)
+row then reduces to an offset and a gradient over V, computed once from the
+non-weather features, and a batch of scenarios D (n_scenarios x |V|) is
+
+    f = offset + D @ grad^T + diag(D Q_VV D^T)
+
+i.e. one matrix product for the whole (scenario x station x date) array.
+Nothing is rebuilt per scenario.
+"""
+import math
+import numpy as np
+import pandas as pd
+
+WEATHER_COLUMNS = ['tavg', 'tmin', 'tmax', 'prcp', 'wspd']
+
+# Scenario rows per matrix product, so the float64 intermediate stays bounded
+MAX_BATCH_VALUES = 4_000_000
+
+
+def _powers(n_base, degree, include_bias):
+    from sklearn.preprocessing import PolynomialFeatures
+    if degree == 0:
+        return np.zeros((1, n_base), dtype=np.int64)
+    return PolynomialFeatures(degree=degree, include_bias=include_bias).fit(np.zeros((1, n_base))).powers_
+
+
+def _add_terms(weights, powers, const, linear, quad):
+    # Coefficients (..., n_terms) of the monomials in powers, added to the polynomial parts
+    order = powers.sum(axis=1)
+    const += weights[..., order == 0].sum(axis=-1)
+    first = np.flatnonzero(order == 1)
+    linear[..., powers[first].argmax(axis=1)] += weights[..., first]
+    for term in np.flatnonzero(order == 2):
+        i, j = np.flatnonzero(powers[term]).min(), np.flatnonzero(powers[term]).max()
+        quad[i, j] += weights[..., term] / 2
+        quad[j, i] += weights[..., term] / 2
+
+
+class QuadraticModel:
+
+    def __init__(self, intercept, linear, quad, station_const, station_linear):
+        self.intercept = float(intercept)
+        self.linear = np.asarray(linear)
+        self.quad = np.asarray(quad)
+        # Indexed by station code, 0 being the dropped baseline station (all zeros)
+        self.station_const = np.asarray(station_const)
+        self.station_linear = np.asarray(station_linear)
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Polynomial form of a fitted make_pipeline (poly -> scale -> ridge), degree <= 2."""
+        poly, scale, ridge = (pipeline.named_steps[k] for k in ('poly', 'scale', 'ridge'))
+        n_base, n_stations, degree = poly.n_base, poly.n_stations_, poly.degree
+        if degree > 2:
+            raise ValueError(f"Scenarios need a pipeline of degree <= 2, got {degree}")
+
+        weights = np.asarray(ridge.coef_, dtype=np.float64).ravel()
+        if scale.scale_ is not None:
+            weights = weights / scale.scale_
+
+        linear, quad = np.zeros(n_base), np.zeros((n_base, n_base))
+        station_const, station_linear = np.zeros(n_stations + 1), np.zeros((n_stations + 1, n_base))
+        # Global block, then one block per dummy power with n_stations x width columns (see designMatrix.py)
+        powers = _powers(n_base, degree, include_bias=False)
+        _add_terms(weights[:len(powers)], powers, np.zeros(()), linear, quad)
+        offset = len(powers)
+        for power in range(1, degree + 1):
+            width = math.comb(n_base + degree - power, degree - power)
+            block = weights[offset:offset + n_stations * width].reshape(n_stations, width)
+            _add_terms(block, _powers(n_base, degree - power, include_bias=True),
+                       station_const[1:], station_linear[1:], np.zeros((n_base, n_base)))
+            offset += n_stations * width
+        return cls(ridge.intercept_, linear, quad, station_const, station_linear)
+
+    def predict(self, base, codes):
+        """Raw predictions for base features (n_rows, n_base) and station codes."""
+        base = np.asarray(base, dtype=np.float64)
+        linear = self.linear + self.station_linear[codes]
+        return (self.intercept + self.station_const[codes] + np.einsum('ij,ij->i', base, linear)
+                + np.einsum('ij,jk,ik->i', base, self.quad, base))
+
+    def gradient(self, base, codes):
+        # d f / d x per row
+        return self.linear + self.station_linear[codes] + 2 * np.asarray(base, dtype=np.float64) @ self.quad
+
+
+def scenario_grid(**axes):
+    """Every combination of the given column values, e.g. scenario_grid(prcp=[0, 20, 40], tavg=[-5, 5, 25])."""
+    return pd.MultiIndex.from_product(list(axes.values()), names=list(axes)).to_frame(index=False)
+
+
+class ScenarioEngine:
+    """
+    Scenario predictions for a fixed (station x date) grid of rows. Rows are
+    given by their base features (the model's x_cols) and station codes;
+    (station, date) pairs without a row, or with a missing feature, are NaN.
+    """
+
+    def __init__(self, model, x_cols, base, codes, dates, stations):
+        self.model = model
+        self.x_cols = list(x_cols)
+        stations = pd.Index(stations)
+        dates = pd.DatetimeIndex(pd.to_datetime(dates))
+        codes = np.asarray(codes)
+
+        # Station axis: the stations present, in model order; date axis: sorted unique dates
+        self.station_codes = np.unique(codes)
+        self.stations = stations[self.station_codes]
+        self.dates = dates.unique().sort_values()
+        s = np.searchsorted(self.station_codes, codes)
+        d = self.dates.get_indexer(dates)
+        if np.bincount(s * len(self.dates) + d).max() > 1:
+            raise ValueError("ScenarioEngine expects one row per (station, date)")
+
+        n_rows = len(self.stations) * len(self.dates)
+        self.base = np.full((n_rows, len(self.x_cols)), np.nan)
+        self.base[s * len(self.dates) + d] = base
+        self.codes = np.repeat(self.station_codes, len(self.dates))
+
+    @classmethod
+    def from_predictor(cls, predictor, weather, stations=None):
+        """
+        Grid of every active station (or `stations`) on every date of `weather`
+        (service_date and the weather columns, the baseline the scenarios
+        change), with the lag and calendar features of Predictor.design.
+        """
+        stations = predictor.active_stations() if stations is None else pd.Index(stations)
+        weather = weather.reset_index(drop=True)
+        rows = weather.loc[np.tile(np.arange(len(weather)), len(stations))].reset_index(drop=True)
+        rows['station_name'] = np.repeat(stations.to_numpy(), len(weather))
+        base, codes = predictor.design(rows)
+        model = predictor.scorer or QuadraticModel.from_pipeline(predictor.pipeline)
+        return cls(model, predictor.x_cols, base, codes, rows['service_date'], predictor.stations)
+
+    @classmethod
+    def from_frame(cls, pipeline, frame, x_cols, stations):
+        """Grid of the rows of a feature frame (tuningModel.build_feature_frame); stations in dummy order."""
+        codes = pd.Index(stations).get_indexer(frame['station_name'])
+        if (codes < 0).any():
+            raise KeyError(f"Stations not in the model: {list(frame['station_name'][codes < 0].unique())}")
+        base = frame[x_cols].to_numpy(dtype=np.float64)
+        return cls(QuadraticModel.from_pipeline(pipeline), x_cols, base, codes, frame['service_date'], stations)
+
+    @property
+    def shape(self):
+        return len(self.stations), len(self.dates)
+
+    def baseline(self, clip=True):
+        """(station x date) predictions for the rows' own weather."""
+        pred = self.model.predict(self.base, self.codes).reshape(self.shape)
+        return np.clip(pred, 0, None) if clip else pred
+
+    def evaluate(self, scenarios, mode='set', clip=True, dtype=np.float32):
+        """
+        Predicted entries as a (scenario x station x date) array.
+
+        scenarios: DataFrame (or dict of columns) with one row per scenario and
+                   some of the weather columns; the other columns keep each
+                   row's own values
+        mode:      'set' replaces the weather values, 'shift' adds to them
+        clip:      clip predictions at 0, like Predictor.predict (not rounded,
+                   so small perturbations stay visible)
+        """
+        scenarios = pd.DataFrame(scenarios)
+        unknown = [c for c in scenarios.columns if c not in WEATHER_COLUMNS or c not in self.x_cols]
+        if unknown:
+            raise KeyError(f"Not weather columns of the model: {unknown}")
+        if mode not in ('set', 'shift'):
+            raise ValueError(f"Unknown scenario mode {mode!r}")
+        cols = [self.x_cols.index(c) for c in scenarios.columns]
+        D = scenarios.to_numpy(dtype=np.float64)
+
+        # 'set' is a shift from the rows with the scenario columns zeroed
+        base = self.base
+        if mode == 'set':
+            base = base.copy()
+            base[:, cols] = 0.0
+        offset = self.model.predict(base, self.codes)
+        grad = self.model.gradient(base, self.codes)[:, cols]
+        quad = np.einsum('sk,kl,sl->s', D, self.model.quad[np.ix_(cols, cols)], D)
+
+        out = np.empty((len(D), len(self.base)), dtype=dtype)
+        batch = max(1, MAX_BATCH_VALUES // max(len(self.base), 1))
+        for start in range(0, len(D), batch):
+            stop = start + batch
+            pred = offset + D[start:stop] @ grad.T + quad[start:stop, None]
+            out[start:stop] = np.clip(pred, 0, None) if clip else pred
+        return out.reshape(len(D), *self.shape)
+
+    def to_frame(self, values, scenarios=None):
+        """Long table (scenario, station_name, service_date, predicted_entries) of an evaluate() array."""
+        n_scenarios = values.shape[0]
+        labels = pd.RangeIndex(n_scenarios) if scenarios is None else pd.DataFrame(scenarios).index
+        n = len(self.stations) * len(self.dates)
+        return pd.DataFrame({
+            'scenario': np.repeat(labels.to_numpy(), n),
+            'station_name': np.tile(np.repeat(self.stations.to_numpy(), len(self.dates)), n_scenarios),
+            'service_date': np.tile(self.dates.to_numpy(), n_scenarios * len(self.stations)),
+            'predicted_entries': values.reshape(-1),
+        })
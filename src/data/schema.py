@@ -0,0 +1,153 @@
+"""
+Column schema of the pipeline tables
+
+Every known column has one kind, and every table is cast to it when it is read
+(see storage.read_table), instead of letting pandas infer dtypes per file:
+
+  - dates          datetime64
+  - identifiers    categorical (station_name, route_or_line, time_period, stop_id)
+  - entry counts   int32, rounded (a few source rows carry fractional entries)
+  - weather        float32
+
+validate checks a table against the columns a stage expects once, when the
+stage loads it, and memory_report compares the footprint of two versions of a
+table column by column.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+DATE = 'date'
+CATEGORY = 'category'
+COUNT = 'count'
+MEASURE = 'measure'
+
+COLUMN_KINDS = {
+    'service_date': DATE,
+    'station_name': CATEGORY,
+    'route_or_line': CATEGORY,
+    'time_period': CATEGORY,
+    'stop_id': CATEGORY,
+    'gated_entries': COUNT,
+    'actual_entries': COUNT,
+    'predicted_entries': COUNT,
+    'tavg': MEASURE,
+    'tmin': MEASURE,
+    'tmax': MEASURE,
+    'prcp': MEASURE,
+    'wdir': MEASURE,
+    'wspd': MEASURE,
+    'pres': MEASURE,
+}
+
+# Columns each table must have
+TABLES = {
+    'mbta_raw': ['service_date', 'time_period', 'stop_id', 'station_name', 'route_or_line', 'gated_entries'],
+    'mbta': ['service_date', 'station_name', 'gated_entries'],
+    'weather': ['service_date', 'tavg', 'tmin', 'tmax', 'prcp', 'wspd'],
+    'merged': ['service_date', 'station_name', 'gated_entries', 'tavg', 'tmin', 'tmax', 'prcp', 'wspd'],
+    'predictions': ['service_date', 'station_name', 'tavg', 'prcp', 'wspd', 'actual_entries', 'predicted_entries'],
+}
+
+# Columns that may never be missing
+KEY_COLUMNS = ('service_date', 'station_name')
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def columns_of(kind):
+    return [col for col, k in COLUMN_KINDS.items() if k == kind]
+
+
+def csv_dtypes(columns):
+    # read_csv dtypes for known columns; counts are read as float and rounded by apply_schema
+    read_as = {CATEGORY: 'category', COUNT: 'float64', MEASURE: 'float32'}
+    return {col: read_as[COLUMN_KINDS[col]] for col in columns if COLUMN_KINDS.get(col) in read_as}
+
+
+def _is_kind(series, kind):
+    if kind == DATE:
+        return pd.api.types.is_datetime64_any_dtype(series)
+    if kind == CATEGORY:
+        return isinstance(series.dtype, pd.CategoricalDtype)
+    if kind == COUNT:
+        # Counts with missing values stay float, see apply_schema
+        return series.dtype == np.int32 or (series.dtype.kind == 'f' and series.isna().any())
+    if kind == MEASURE:
+        return series.dtype == np.float32
+    return True
+
+
+def apply_schema(df, round_counts=True):
+    """
+    Cast every known column of df to its schema dtype (in place) and return df.
+    round_counts=False keeps counts as float32 instead, for raw rows whose
+    counts are only rounded once they are summed (fractional source entries).
+    """
+    for col in df.columns:
+        kind = COLUMN_KINDS.get(col)
+        if kind is None or _is_kind(df[col], kind):
+            continue
+        if kind == DATE:
+            df[col] = pd.to_datetime(df[col])
+        elif kind == CATEGORY:
+            df[col] = df[col].astype('category')
+        elif kind == COUNT and not round_counts:
+            if df[col].dtype != np.float32:
+                df[col] = df[col].astype(np.float32)
+        elif kind == COUNT:
+            df[col] = np.rint(df[col].to_numpy(dtype=np.float64)).astype(np.int32)
+        elif kind == MEASURE:
+            df[col] = df[col].astype(np.float32)
+    return df
+
+
+def validate(df, table):
+    """Raise SchemaError listing every problem of df as a `table` (see TABLES)."""
+    problems = []
+    missing = [col for col in TABLES[table] if col not in df.columns]
+    if missing:
+        problems.append(f"missing columns {missing}")
+    for col in df.columns:
+        kind = COLUMN_KINDS.get(col)
+        if kind is not None and not _is_kind(df[col], kind):
+            problems.append(f"{col} is {df[col].dtype}, expected {kind}")
+    for col in KEY_COLUMNS:
+        if col in df.columns and df[col].isna().any():
+            problems.append(f"{col} has {int(df[col].isna().sum())} missing values")
+    for col in columns_of(COUNT):
+        if col in df.columns and (df[col] < 0).any():
+            problems.append(f"{col} has negative values")
+    if problems:
+        raise SchemaError(f"{table} table: " + "; ".join(problems))
+    return df
+
+
+def concat_tables(frames):
+    """
+    pd.concat that keeps categorical columns categorical when the frames have
+    different categories (plain concat falls back to object strings).
+    """
+    frames = [f.copy(deep=False) for f in frames]
+    for col in frames[0].columns if frames else []:
+        parts = [f[col] for f in frames if col in f.columns]
+        if len(parts) == len(frames) and all(isinstance(p.dtype, pd.CategoricalDtype) for p in parts):
+            categories = union_categoricals([p.array for p in parts], sort_categories=True).categories
+            for f in frames:
+                f[col] = f[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def memory_usage(df):
+    # Deep memory of every column in bytes (object strings included)
+    return df.memory_usage(deep=True, index=False)
+
+
+def memory_report(before, after):
+    """Per-column and total bytes of two versions of a table, with the reduction factor."""
+    report = pd.DataFrame({'before': memory_usage(before), 'after': memory_usage(after)})
+    report.loc['total'] = report.sum()
+    report['ratio'] = report['before'] / report['after']
+    return report
@@ -0,0 +1,175 @@
+"""
+Station metadata shared by the model and the visualizations
+
+One table per set of station names, built over the unique names only:
+
+  - the lines serving each station (transfer stations keep every line), a
+    primary line_color and one membership column per line
+  - the schematic map coordinates used by heatmapvisualization.py
+
+Row-level columns are filled by factorizing station_name once and taking from
+the table by code, so assigning lines costs O(unique stations) lookups instead
+of one regex scan of the whole column per (line, station) pair.
+"""
+import numpy as np
+import pandas as pd
+
+# Line order also decides the primary line of a transfer station
+LINES = ('Red', 'Green', 'Orange', 'Blue', 'Silver')
+OTHER = 'Other'
+
+# Station names per line; a station is on a line when one of these names is
+# contained in it (case-insensitive), so 'Hynes' matches 'Hynes Convention Center'
+LINE_STATIONS = {
+    'Red': ['Alewife', 'Davis', 'Porter', 'Harvard', 'Central', 'Kendall', 'Charles/MGH', 'Park Street',
+        'Downtown Crossing', 'South Station', 'Broadway', 'Andrew', 'JFK/UMass', 'Savin Hill',
+        'Fields Corner', 'Shawmut', 'Ashmont', 'North Quincy', 'Wollaston', 'Quincy Center',
+        'Quincy Adams', 'Braintree', 'Mattapan'],
+    'Green': ['Lechmere', 'Science Park', 'North Station', 'Haymarket', 'Government Center',
+          'Park Street', 'Boylston', 'Arlington', 'Copley', 'Hynes', 'Kenmore', 'Prudential',
+          'Symphony', 'Northeastern', 'Museum of Fine Arts', 'Longwood Medical Area', 'Brigham Circle',
+          'Fenwood Road', 'Mission Park', 'Riverway', 'Back of the Hill', 'Heath Street', 'Cleveland Circle',
+          'Beaconsfield', 'Reservoir', 'Chestnut Hill', 'Newton Centre', 'Boston College', 'Riverside',
+          'Union Square', 'East Somerville', 'Gilman Square', 'Magoun Square', 'Ball Square', 'Medford/Tufts'],
+    'Orange': ['Oak Grove', 'Malden Center', 'Wellington', 'Assembly', 'Sullivan Square', 'Community College',
+          'North Station', 'Haymarket', 'State', 'Downtown Crossing', 'Chinatown', 'Tufts Medical Center',
+          'Back Bay', 'Massachusetts Avenue', 'Ruggles', 'Roxbury Crossing', 'Jackson Square',
+          'Stony Brook', 'Green Street', 'Forest Hills'],
+    'Blue': ['Wonderland', 'Revere Beach', 'Beachmont', 'Suffolk Downs', 'Orient Heights', 'Wood Island',
+        'Airport', 'Maverick', 'Aquarium', 'State', 'Government Center', 'Bowdoin'],
+    'Silver': ['South Station', 'Courthouse', 'World Trade Center']
+}
+
+# Schematic (x, y) position of each station on the heatmap, both axes 0-100
+STATION_COORDS = {
+    'Alewife': (13,86),
+    'Davis': (14.3,83),
+    'Porter': (15.600000000000001,80),
+    'Harvard': (16.900000000000002,77),
+    'Central': (18.200000000000003,74),
+    'Kendall/MIT': (19.500000000000004,71),
+    'Charles/MGH': (20.800000000000004,67),
+    'Park Street': (22,63),
+    'Downtown Crossing': (23,60),
+
+    'Wonderland': (34,91),
+    'Revere Beach': (33,88),
+    'Beachmont': (32,85),
+    'Suffolk Downs': (31,82),
+    'Orient Heights': (30,79),
+    'Wood Island': (29,76),
+    'Airport': (28,73),
+    'Maverick': (27,70),
+    'Aquarium': (26,67),
+    'State Street': (25,64),
+
+    'Oak Grove': (24,92.5),
+    'Malden Center': (24,90.0),
+    'Wellington': (24,87.5),
+    'Assembly': (24,85.0),
+    'Sullivan Square': (24,82.5),
+    'Community College': (24,80.0),
+
+    'Chinatown': (22,56),
+    'Tufts Medical Center': (21,53),
+    'Back Bay': (20,50),
+    'Massachusetts Avenue': (19,47),
+    'Ruggles': (18,44),
+    'Roxbury Crossing': (17,41),
+    'Jackson Square': (16,38),
+    'Stony Brook': (15,35),
+    'Green Street': (14,32),
+    'Forest Hills': (13,29),
+
+    'Medford/Tufts': (18,90),
+    'Ball Square': (18.7,88),
+    'Magoun Square': (19.4,86),
+    'Gilman Square': (20.099999999999998,84),
+    'East Somerville': (20.799999999999997,82),
+
+    'Lechmere': (23, 77),
+    'Science Park': (23.7, 75),
+    'North Station': (24, 72),
+    'Haymarket': (24, 70),
+
+    'Boylston': (21,60),
+    'Arlington': (19,59),
+    'Copley': (17.5,59),
+    'Hynes Convention Center': (16,59),
+    'Kenmore': (14.5,59),
+
+    'Broadway': (26,47),
+    'Andrew': (26,44),
+    'JFK/UMass': (26,41),
+
+    'Bowdoin': (22, 69),
+    'Government Center': (23, 67),
+    'South Station': (25, 56),
+    'Prudential': (16.5, 56),
+    'Symphony': (16.5, 52),
+
+    'North Quincy': (28,29),
+    'Wollaston': (29,26),
+    'Quincy Center': (30,23),
+    'Quincy Adams': (30.5,20),
+    'Braintree': (30.5, 17),
+
+    'Savin Hill': (24,29),
+    'Fields Corner': (24,27),
+    'Shawmut': (24,25),
+    'Ashmont': (24,23),
+
+    'Riverside': (6, 38),
+    'Mattapan Line': (20, 18),
+    'Union Square': (20, 79),
+}
+
+
+def station_lines(name, line_stations=LINE_STATIONS):
+    # Every line serving `name`, in line_stations order
+    lowered = str(name).lower()
+    return tuple(line for line, names in line_stations.items() if any(s.lower() in lowered for s in names))
+
+
+def station_table(names, line_stations=LINE_STATIONS, coords=STATION_COORDS):
+    """
+    One row per unique station name: line_color (primary line, or 'Other'),
+    lines ('Red/Green' for transfers), n_lines, on_<line> membership flags and
+    the map coordinates x, y (NaN for stations without a position).
+    """
+    index = pd.Index(pd.unique(np.asarray(names, dtype=object)), name='station_name')
+    lines = [station_lines(name, line_stations) for name in index]
+    colors = pd.CategoricalDtype([*line_stations, OTHER])
+
+    table = pd.DataFrame({
+        'line_color': pd.Categorical([l[0] if l else OTHER for l in lines], dtype=colors),
+        'lines': pd.Categorical(['/'.join(l) if l else OTHER for l in lines]),
+        'n_lines': np.array([len(l) for l in lines], dtype=np.int8),
+    }, index=index)
+    for line in line_stations:
+        table[f'on_{line.lower()}'] = np.array([line in l for l in lines])
+    xy = np.array([coords.get(name, (np.nan, np.nan)) for name in index], dtype=np.float64).reshape(-1, 2)
+    table['x'], table['y'] = xy[:, 0], xy[:, 1]
+    return table
+
+
+def add_station_columns(df, columns, station_col='station_name', line_stations=LINE_STATIONS):
+    # Broadcast station_table columns to the rows by factorized station code
+    codes, uniques = pd.factorize(df[station_col])
+    table = station_table(uniques, line_stations)
+    for col in columns:
+        df[col] = table[col].array.take(codes)
+    return df
+
+
+def assign_line_colors(df, line_colors=LINE_STATIONS):
+    """Primary line (line_color) and all lines (lines) of every row's station."""
+    return add_station_columns(df, ['line_color', 'lines'], line_stations=line_colors)
+
+
+def line_membership(df, station_col='station_name', line_stations=LINE_STATIONS):
+    # (rows x lines) boolean frame: True where the row's station is on the line
+    codes, uniques = pd.factorize(df[station_col])
+    table = station_table(uniques, line_stations)
+    flags = table[[f'on_{line.lower()}' for line in line_stations]].to_numpy()
+    return pd.DataFrame(flags[codes], columns=list(line_stations), index=df.index)
@@ -0,0 +1,217 @@
+"""
+Table storage for the processing and modelling pipeline
+
+Every stage reads and writes its tables through read_table / write_table. The
+format is picked from the file extension, and the default is Parquet, a typed
+columnar file: service_date comes back as datetime64 and station_name as a
+categorical without re-parsing, and `columns=` reads only the columns a stage
+needs. Feather (Arrow IPC) is also built in, and CSV stays available for
+exports and for the older data files. Whatever the format, tables are cast to
+the column schema (schema.py) on read and write, and the file sizes are
+counted as bytes read / written by the open instrumentation span.
+
+Tables too large for memory can be read in batches with iter_table and
+written chunk by chunk with TableWriter (Parquet row groups or CSV blocks).
+
+Other formats can be plugged in with register_backend.
+"""
+import hashlib
+import os
+import zipfile
+import pandas as pd
+
+from .instrumentation import add_bytes
+from .schema import DATE, apply_schema, columns_of, csv_dtypes
+
+DEFAULT_FORMAT = 'parquet'
+
+
+def _read_parquet(path, columns):
+    return pd.read_parquet(path, columns=columns)
+
+
+def _write_parquet(df, path):
+    df.to_parquet(path, index=False)
+
+
+def _read_feather(path, columns):
+    return pd.read_feather(path, columns=columns)
+
+
+def _write_feather(df, path):
+    df.reset_index(drop=True).to_feather(path)
+
+
+def _read_csv(path, columns):
+    header = pd.read_csv(path, nrows=0).columns
+    wanted = [c for c in header if columns is None or c in columns]
+    dates = [c for c in columns_of(DATE) if c in wanted]
+    return pd.read_csv(path, usecols=columns, parse_dates=dates, dtype=csv_dtypes(wanted))
+
+
+def _write_csv(df, path):
+    df.to_csv(path, index=False)
+
+
+# format -> (file extension, reader(path, columns), writer(df, path))
+BACKENDS = {
+    'parquet': ('.parquet', _read_parquet, _write_parquet),
+    'feather': ('.feather', _read_feather, _write_feather),
+    'csv':     ('.csv', _read_csv, _write_csv),
+}
+
+
+def register_backend(fmt, extension, reader, writer):
+    BACKENDS[fmt] = (extension, reader, writer)
+
+
+def format_of(path):
+    ext = os.path.splitext(path)[1].lower()
+    for fmt, (extension, _, _) in BACKENDS.items():
+        if ext == extension:
+            return fmt
+    raise ValueError(f"No storage backend for '{ext}' files: {path}")
+
+
+def table_path(directory, name, fmt=None):
+    # Path of table `name` in `directory` for a given format
+    extension = BACKENDS[fmt or DEFAULT_FORMAT][0]
+    return os.path.join(directory, name + extension)
+
+
+def find_table(directory, name):
+    """
+    Existing file for table `name`, trying the default format first and CSV last,
+    so data written before the columnar store keeps working.
+    """
+    order = [DEFAULT_FORMAT] + [f for f in BACKENDS if f not in (DEFAULT_FORMAT, 'csv')] + ['csv']
+    for fmt in order:
+        path = table_path(directory, name, fmt)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No stored table '{name}' in {directory}")
+
+
+def typed(df, round_counts=True):
+    # Schema dtypes: datetime64 dates, categorical identifiers, int32 counts, float32 weather
+    return apply_schema(df, round_counts)
+
+
+def read_table(path, columns=None, round_counts=True):
+    """Read a stored table, only loading `columns` when given (raw counts: round_counts=False)."""
+    reader = BACKENDS[format_of(path)][1]
+    df = typed(reader(path, None if columns is None else list(columns)), round_counts)
+    add_bytes(read=os.path.getsize(path))
+    return df
+
+
+def write_table(df, path, round_counts=True):
+    """Write a table in the format given by the path's extension and return the path."""
+    writer = BACKENDS[format_of(path)][2]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    writer(typed(df.copy(deep=False), round_counts), path)
+    add_bytes(written=os.path.getsize(path))
+    return path
+
+
+def iter_table(path, columns=None, batch_rows=250_000):
+    """
+    Read a stored table in batches of about batch_rows rows, typed like
+    read_table. Parquet and CSV are streamed; other formats are read at once.
+    """
+    columns = None if columns is None else list(columns)
+    fmt = format_of(path)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=batch_rows, columns=columns):
+            yield typed(batch.to_pandas())
+    elif fmt == 'csv':
+        header = pd.read_csv(path, nrows=0).columns
+        wanted = [c for c in header if columns is None or c in columns]
+        dates = [c for c in columns_of(DATE) if c in wanted]
+        for chunk in pd.read_csv(path, usecols=columns, parse_dates=dates, dtype=csv_dtypes(wanted), chunksize=batch_rows):
+            yield typed(chunk)
+    else:
+        df = read_table(path, columns)
+        for start in range(0, len(df), batch_rows):
+            yield df.iloc[start:start + batch_rows]
+        return
+    add_bytes(read=os.path.getsize(path))
+
+
+class TableWriter:
+    """
+    Appends DataFrame chunks to one table file: a Parquet row group or a block
+    of CSV lines per chunk. Categorical columns stay dictionary-encoded in
+    Parquet, with int32 indices so every chunk has the same file schema
+    whatever its categories (each row group carries its own dictionary).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = format_of(path)
+        if self.format not in ('parquet', 'csv'):
+            raise ValueError(f"Can't append to {self.format} tables: {path}")
+        self.rows = 0
+        self._writer = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def write(self, df):
+        df = typed(df.copy(deep=False))
+        if self.format == 'csv':
+            df.to_csv(self.path, index=False, mode='w' if self._writer is None else 'a', header=self._writer is None)
+            self._writer = True
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                for i, field in enumerate(self._schema):
+                    if pa.types.is_dictionary(field.type):
+                        self._schema = self._schema.set(i, field.with_type(pa.dictionary(pa.int32(), field.type.value_type)))
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(table.cast(self._schema))
+        self.rows += len(df)
+        return self
+
+    def close(self):
+        if self._writer is None:
+            raise ValueError(f"No rows written to {self.path}")
+        if self.format == 'parquet':
+            self._writer.close()
+        add_bytes(written=os.path.getsize(self.path))
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.format == 'parquet' and self._writer is not None:
+            self._writer.close()
+
+
+def export_csv(path, csv_path=None):
+    # Convert a stored table to CSV (next to it by default)
+    csv_path = csv_path or os.path.splitext(path)[0] + '.csv'
+    return write_table(read_table(path), csv_path)
+
+
+def content_hash(source, member=None, block_size=1 << 20):
+    # sha256 of a file, or of a member read straight out of a zip archive
+    digest = hashlib.sha256()
+
+    def update(handle):
+        for block in iter(lambda: handle.read(block_size), b''):
+            digest.update(block)
+
+    if member is None or os.path.isdir(source):
+        with open(member or source, 'rb') as handle:
+            update(handle)
+    else:
+        with zipfile.ZipFile(source) as zf, zf.open(member) as handle:
+            update(handle)
+    return digest.hexdigest()
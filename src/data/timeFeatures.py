@@ -0,0 +1,151 @@
+"""
+Per-station lag, rolling and exponentially weighted ridership features
+
+The rows are scattered once into a dense (calendar day x station) panel, with
+NaN for days a station has no data. Every feature is then a vectorized pandas
+operation down the day axis of the panel, so:
+
+  - stations never mix, whatever order the rows come in
+  - lags and windows count calendar days: lag{k} is the station's last
+    observation on or before k days back (carried forward over missing
+    service days), and roll{w} is the mean over the observed days among the
+    previous w calendar days. Unlike the old row-based shift(1).rolling(7),
+    which needed 7 rows and could reach back past a gap, a window needs only
+    min_periods observed days (1 by default)
+  - a window without any observed day (a gap longer than the window) keeps
+    the station's last defined window value (e.g. the last rolling mean
+    before the gap, not the last observed day), so only the days before a
+    station's first observation have no features
+  - cost is linear in days x stations, i.e. in the number of rows
+
+The features are gathered back to the rows by (day, station) index lookup.
+"""
+import numpy as np
+import pandas as pd
+
+# Default feature sets used by run_model_pipeline
+LAGS = (1,)
+WINDOWS = (7,)
+STD_WINDOWS = ()
+EWM_SPANS = ()
+
+
+def time_feature_columns(lags=LAGS, windows=WINDOWS, std_windows=STD_WINDOWS, ewm_spans=EWM_SPANS):
+    # Column names created by add_time_series_features for a given config
+    return ([f'lag{k}' for k in lags] + [f'roll{w}' for w in windows]
+            + [f'rollstd{w}' for w in std_windows] + [f'ewm{s}' for s in ewm_spans])
+
+
+def station_panel(df, value_col='gated_entries', group_col='station_name', date_col='service_date'):
+    """
+    Scatter rows into a (day x station) DataFrame on a contiguous daily index.
+
+    Returns the panel plus, for every row, its day offset and station code so
+    panel-shaped features can be gathered back with features[day, code].
+    """
+    dates = pd.to_datetime(df[date_col])
+    start = dates.min()
+    day = ((dates - start) // pd.Timedelta(days=1)).to_numpy()
+    code, stations = pd.factorize(df[group_col])
+
+    n_days = day.max() + 1
+    if np.bincount(day * len(stations) + code).max() > 1:
+        raise ValueError(f"station_panel expects one row per ({group_col}, {date_col})")
+
+    values = np.full((n_days, len(stations)), np.nan)
+    values[day, code] = df[value_col].to_numpy(dtype=np.float64)
+
+    panel = pd.DataFrame(values, index=pd.date_range(start, periods=n_days, freq='D'), columns=stations)
+    return panel, day, code
+
+
+class FeatureState:
+    """
+    Every station's feature values on `day`, the last day of a panel, so the
+    features of a later panel can carry them over (see panel_features). A
+    station silent for longer than the history kept with that panel then
+    still gets the values it would have on the whole table.
+    """
+
+    def __init__(self, day=None, values=None):
+        self.day = day
+        # (station x feature name) frame
+        self.values = pd.DataFrame() if values is None else values
+
+
+def panel_features(panel, lags=LAGS, windows=WINDOWS, std_windows=STD_WINDOWS, ewm_spans=EWM_SPANS, min_periods=1,
+                   state=None):
+    """
+    {column name: (day x station) frame} for every configured feature of a
+    station panel. Lags carry the last observed value forward, windows / EWMs
+    their last defined value.
+
+    With a FeatureState, the panel days up to state.day are only history for
+    the windows: their features are the carried ones, and the state is moved
+    to the panel's last day afterwards. The panel is extended to state.day and
+    to the state's stations when it doesn't cover them.
+    """
+    if state is not None and state.day is not None:
+        index = pd.date_range(min(state.day, panel.index[0]), panel.index[-1], freq='D')
+        extra = [s for s in state.values.index if s not in set(panel.columns)]
+        panel = panel.reindex(index=index, columns=pd.Index([*panel.columns, *extra], dtype=object))
+
+    # Values defined by the days in reach of each feature only, then forward filled
+    previous = panel.shift(1)
+    raw = {}
+    for k in lags:
+        raw[f'lag{k}'] = panel.shift(k)
+    for w in windows:
+        raw[f'roll{w}'] = previous.rolling(w, min_periods=min_periods).mean()
+    for w in std_windows:
+        raw[f'rollstd{w}'] = previous.rolling(w, min_periods=max(min_periods, 2)).std()
+    for span in ewm_spans:
+        raw[f'ewm{span}'] = previous.ewm(span=span, min_periods=min_periods).mean()
+
+    if state is not None and state.day is not None:
+        for name, frame in raw.items():
+            frame.loc[:state.day] = np.nan
+            frame.loc[state.day] = state.values[name].reindex(frame.columns).to_numpy(dtype=np.float64)
+
+    features = {name: frame.ffill() for name, frame in raw.items()}
+    if state is not None:
+        state.day = panel.index[-1]
+        last = pd.DataFrame({name: frame.iloc[-1] for name, frame in features.items()})
+        kept = state.values.loc[state.values.index.difference(last.index)]
+        state.values = last if not len(kept) else pd.concat([kept, last])
+    return features
+
+
+def history_days(lags=LAGS, windows=WINDOWS, std_windows=STD_WINDOWS, ewm_spans=EWM_SPANS):
+    # Days of history needed to compute the features for the next day (EWMs truncated at 5 spans)
+    return max([0, *lags, *windows, *std_windows, *(5 * s for s in ewm_spans)]) + 1
+
+
+def add_time_series_features(
+    df,
+    value_col='gated_entries',
+    group_col='station_name',
+    date_col='service_date',
+    lags=LAGS,
+    windows=WINDOWS,
+    std_windows=STD_WINDOWS,
+    ewm_spans=EWM_SPANS,
+    min_periods=1,
+    state=None
+):
+    """
+    Add lag{k}, roll{w} (mean), rollstd{w} and ewm{span} columns per station.
+
+    Windows and EWMs only look at days strictly before the row's date, like the
+    old shift(1).rolling(7). A window needs at least min_periods observed days,
+    otherwise it keeps the station's last defined value of that window;
+    features are NaN only before a station's history starts. state carries the
+    features over from the previous rows of a chunked table (FeatureState).
+    """
+    panel, day, code = station_panel(df, value_col, group_col, date_col)
+    features = panel_features(panel, lags, windows, std_windows, ewm_spans, min_periods, state)
+    for name, frame in features.items():
+        # The frames start earlier than the panel when extended to a carried state
+        offset = (panel.index[0] - frame.index[0]) // pd.Timedelta(days=1)
+        df[name] = frame.to_numpy()[day + offset, code]
+    return df
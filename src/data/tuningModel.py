@@ -1,147 +1,216 @@
 import pandas as pd
 import numpy as np
-import holidays
-from sklearn.linear_model import LinearRegression, RidgeCV
-from sklearn.preprocessing import PolynomialFeatures, StandardScaler
-from sklearn.pipeline import Pipeline
-from sklearn.model_selection import TimeSeriesSplit
-from sklearn.metrics import mean_squared_error, r2_score
-import os
-
-
-def assign_line_colors(df, line_colors):
-    df['line_color'] = 'Other'
-    for color, stations in line_colors.items():
-        for station in stations:
-            mask = df['station_name'].str.contains(station, case=False, na=False)
-            df.loc[mask, 'line_color'] = color
-    return df
 
+# scikit-learn (and the estimators built on it) is imported where a model is
+# built or fitted, so feature code and the prediction path load without it
+from . import config
+from .calendarFeatures import add_calendar_features
+from .featureCache import FeatureCache
+from .instrumentation import record, span, traced
+from .schema import concat_tables, validate
+from .stations import LINE_STATIONS as LINE_COLORS, assign_line_colors
+from .predictionWriter import write_predictions
+from .storage import content_hash, find_table, iter_table, read_table
+from .timeFeatures import EWM_SPANS, LAGS, STD_WINDOWS, WINDOWS, add_time_series_features, time_feature_columns
 
-def run_model_pipeline(
-    csv_path='../../data/processed/merged_mbta_weather.csv',
-    output_csv='mbta_test_predictions.csv',
-    plot=False
-):
-    # Load data
-    df = pd.read_csv(csv_path)
-    df['service_date'] = pd.to_datetime(df['service_date'])
-
-    # Feature engineering
-    df['day_of_week'] = df['service_date'].dt.dayofweek
-    df['is_weekend'] = df['day_of_week'].apply(lambda x: 1 if x >= 5 else 0)
-    
-    def month_to_season(month):
-        if month in [12, 1, 2]: return 'winter'
-        elif month in [3, 4, 5]: return 'spring'
-        elif month in [6, 7, 8]: return 'summer'
-        else: return 'fall'
-
-    df['month'] = df['service_date'].dt.month
-    df['season'] = df['month'].apply(month_to_season)
-    df = pd.get_dummies(df, columns=['season'], drop_first=True)
+# Bump when the feature code changes so cached feature frames are rebuilt
+FEATURE_VERSION = 5
 
-    years = df['service_date'].dt.year.unique().tolist()
-    us_hols = holidays.US(years=years)
-    df['is_holiday'] = df['service_date'].apply(lambda d: 1 if d in us_hols else 0)
+HOLIDAY_COLUMNS = ['days_to_next_hol', 'days_from_prev_hol']
 
-    holiday_dates = sorted(us_hols.keys())
+MODEL_COLUMNS = ['service_date', 'station_name', 'gated_entries', 'tavg', 'tmin', 'tmax', 'prcp', 'wspd']
 
-    def days_to_next_hol(dt):
-        d = dt.date()
-        future = [(hol - d).days for hol in holiday_dates if hol >= d]
-        return min(future) if future else np.nan
 
-    def days_from_prev_hol(dt):
-        d = dt.date()
-        past = [(d - hol).days for hol in holiday_dates if hol <= d]
-        return min(past) if past else np.nan
+def default_merged_path():
+    # Stored merged_mbta_weather in the configured processed directory (see config.py), CSV included
+    return find_table(config.processed_dir(), 'merged_mbta_weather')
 
-    df['days_to_next_hol']   = df['service_date'].apply(days_to_next_hol)
-    df['days_from_prev_hol'] = df['service_date'].apply(days_from_prev_hol)
 
-    df['week_start'] = df['service_date'] - pd.to_timedelta(df['service_date'].dt.weekday, unit='d')
-    df['lag1']  = df['gated_entries'].shift(1)
-    df['roll7'] = df['gated_entries'].shift(1).rolling(7).mean()
-    df = df.dropna()
+def model_feature_columns(time_cols=None):
+    # Non-station model inputs; station dummies are appended after these
+    if time_cols is None:
+        time_cols = time_feature_columns()
+    return [
+        'tavg', 'tmin', 'tmax', 'prcp', 'wspd',
+        'is_weekend', 'is_holiday', 'days_to_next_hol', 'days_from_prev_hol',
+        'season_spring', 'season_summer', 'season_winter',
+        *time_cols,
+        'month_sin', 'month_cos',
+        'is_covid_period', 'is_recovery_period', 'is_post_covid',
+        'covid_weekend', 'recovery_weekend']
 
-    df['month_norm'] = 2 * np.pi * (df['month'] - 1) / 12
-    df['month_sin']  = np.sin(df['month_norm'])
-    df['month_cos']  = np.cos(df['month_norm'])
 
+def add_period_flags(df):
+    # COVID shutdown / recovery / post-COVID indicators and their weekend interactions
     df['is_covid_period'] = ((df['service_date'] >= '2020-03-15') & (df['service_date'] < '2021-03-01')).astype(int)
     df['is_recovery_period'] = ((df['service_date'] >= '2021-03-01') & (df['service_date'] < '2022-01-01')).astype(int)
     df['is_post_covid'] = (df['service_date'] >= '2022-01-01').astype(int)
     df['covid_weekend'] = df['is_covid_period'] * df['is_weekend']
     df['recovery_weekend'] = df['is_recovery_period'] * df['is_weekend']
+    return df
 
-    line_colors = {
-        'Red': ['Alewife', 'Davis', 'Porter', 'Harvard', 'Central', 'Kendall', 'Charles/MGH', 'Park Street', 
-            'Downtown Crossing', 'South Station', 'Broadway', 'Andrew', 'JFK/UMass', 'Savin Hill',
-            'Fields Corner', 'Shawmut', 'Ashmont', 'North Quincy', 'Wollaston', 'Quincy Center', 
-            'Quincy Adams', 'Braintree'],
-        'Green': ['Lechmere', 'Science Park', 'North Station', 'Haymarket', 'Government Center', 
-              'Park Street', 'Boylston', 'Arlington', 'Copley', 'Hynes', 'Kenmore', 'Prudential',
-              'Symphony', 'Northeastern', 'Museum of Fine Arts', 'Longwood Medical Area', 'Brigham Circle',
-              'Fenwood Road', 'Mission Park', 'Riverway', 'Back of the Hill', 'Heath Street', 'Cleveland Circle',
-              'Beaconsfield', 'Reservoir', 'Chestnut Hill', 'Newton Centre', 'Boston College'],
-        'Orange': ['Oak Grove', 'Malden Center', 'Wellington', 'Assembly', 'Sullivan Square', 'Community College',
-              'North Station', 'Haymarket', 'State', 'Downtown Crossing', 'Chinatown', 'Tufts Medical Center',
-              'Back Bay', 'Massachusetts Avenue', 'Ruggles', 'Roxbury Crossing', 'Jackson Square',
-              'Stony Brook', 'Green Street', 'Forest Hills'],
-        'Blue': ['Wonderland', 'Revere Beach', 'Beachmont', 'Suffolk Downs', 'Orient Heights', 'Wood Island',
-            'Airport', 'Maverick', 'Aquarium', 'State', 'Government Center', 'Bowdoin'],
-        'Silver': ['South Station', 'Courthouse', 'World Trade Center']
-    }
-    df = assign_line_colors(df, line_colors)
 
-    train_mask = df['service_date'] <= '2022-03-01'
-    X_cols = [
-        'tavg', 'tmin', 'tmax', 'prcp', 'wspd',
-        'is_weekend', 'is_holiday', 'days_to_next_hol', 'days_from_prev_hol',
-        'season_spring', 'season_summer', 'season_winter',
-        'lag1', 'roll7',
-        'month_sin', 'month_cos',
-        'is_covid_period', 'is_recovery_period', 'is_post_covid',
-        'covid_weekend', 'recovery_weekend']
+def build_feature_frame(df, lags=LAGS, windows=WINDOWS, std_windows=STD_WINDOWS, ewm_spans=EWM_SPANS, holiday_years=None,
+                        state=None):
+    # Feature engineering (state: timeFeatures.FeatureState carried between date chunks)
+    # Calendar / holiday features are computed once per unique date, see calendarFeatures.py
+    df = add_calendar_features(df, holiday_years=holiday_years)
+    df = pd.get_dummies(df, columns=['season'], drop_first=True)
 
-    df_enc = pd.get_dummies(df, columns=['station_name'], drop_first=True)
-    station_dummies = [c for c in df_enc.columns if c.startswith('station_name_')]
-    X_cols_ext = X_cols + station_dummies
+    # Per-station lag / rolling features over calendar days, see timeFeatures.py
+    # Only rows without a target or without any station history yet are dropped;
+    # missing service days are carried over by the features themselves. The holiday
+    # distances are always defined (see calendar_table), listed here as a guard
+    df = add_time_series_features(df, lags=lags, windows=windows, std_windows=std_windows, ewm_spans=ewm_spans,
+                                  state=state)
+    df = df.dropna(subset=['gated_entries', *HOLIDAY_COLUMNS, *time_feature_columns(lags, windows, std_windows, ewm_spans)])
+
+    df = add_period_flags(df)
+    df = assign_line_colors(df, LINE_COLORS)
+    return df.reset_index(drop=True)
+
+
+def make_pipeline(n_base, degree=2, alphas=(0.1, 1.0, 10.0)):
+    # Same terms as PolynomialFeatures(degree=2) over X_cols_ext, built as a sparse matrix
+    # without the always-zero station x station products. Sparse input can't be centered,
+    # so the scaler only divides by the std and the ridge fits the intercept instead.
+    # RidgePathCV is the grid search RidgeCV(cv=TimeSeriesSplit(5)) runs, solved from
+    # per-block normal equations (see ridge.py), so long alpha grids are cheap.
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    from .designMatrix import StationPolynomialFeatures
+    from .ridge import RidgePathCV
+    return Pipeline([
+        ('poly',  StationPolynomialFeatures(n_base=n_base, degree=degree)),
+        ('scale', StandardScaler(with_mean=False)),
+        ('ridge', RidgePathCV(alphas=list(alphas), n_splits=5))
+    ])
 
-    X = df_enc[X_cols_ext]
-    y = df_enc['gated_entries']
-    train_mask = df_enc['service_date'] <= '2022-03-01'
 
-    X_train, X_test = X.loc[train_mask], X.loc[~train_mask]
-    y_train, y_test = y.loc[train_mask], y.loc[~train_mask]
+def load_feature_frame(csv_path, lags=LAGS, windows=WINDOWS, std_windows=STD_WINDOWS, ewm_spans=EWM_SPANS, cache=None):
+    """
+    Feature frame for a stored merged table. With a FeatureCache it is keyed on the
+    file's content hash, FEATURE_VERSION and the lag/window config, so an unchanged
+    input skips feature engineering and is memory-mapped from the cache instead.
+    """
+    def build():
+        # Load data (any stored format, see storage.py), only the columns the model uses
+        df = validate(read_table(csv_path, columns=MODEL_COLUMNS), 'merged')
+        return build_feature_frame(df, lags, windows, std_windows, ewm_spans)
+
+    if cache is None:
+        return build()
+    key = cache.key(content_hash(csv_path), FEATURE_VERSION, MODEL_COLUMNS, lags, windows, std_windows, ewm_spans)
+    return cache.get_or_build(key, build)
+
+
+def rows_without_features(csv_path, df, start, end):
+    """
+    Rows of the stored table from start to end that are not in the feature
+    frame df (or a frame of its service_date / station_name keys): a station's
+    first days, with no history for the lag features. The table is streamed,
+    so only the rows from start to end are held.
+    """
+    keys = ['service_date', 'station_name']
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    known = df.loc[(df['service_date'] >= start) & (df['service_date'] <= end), keys]
+    known = pd.MultiIndex.from_arrays([known['service_date'], known['station_name'].astype(str)])
+    parts = []
+    for rows in iter_table(csv_path, MODEL_COLUMNS):
+        rows = rows[(rows['service_date'] >= start) & (rows['service_date'] <= end)]
+        found = pd.MultiIndex.from_arrays([rows['service_date'], rows['station_name'].astype(str)]).isin(known)
+        parts.append(rows.loc[~found])
+    if not parts:
+        return read_table(csv_path, columns=MODEL_COLUMNS)
+    return concat_tables(parts).reset_index(drop=True)
+
+
+@traced()
+def run_model_pipeline(
+    csv_path=None,
+    output_csv='mbta_test_predictions.csv',
+    lags=LAGS,
+    windows=WINDOWS,
+    std_windows=STD_WINDOWS,
+    ewm_spans=EWM_SPANS,
+    use_cache=True,
+    model_path=None,
+    shard_by=None,
+    n_jobs=None,
+    alphas=(0.1, 1.0, 10.0),
+    partition_by=None,
+    errors_path=None
+):
+    """
+    Fit on the days up to 2022-03-01, predict the next year and write the
+    test predictions (see predictionWriter.py; partition_by='station' writes
+    one file per station into the directory output_csv, errors_path the
+    per-station / per-line errors). Returns the test RMSE.
+    """
+    csv_path = csv_path or default_merged_path()
+    time_cols = time_feature_columns(lags, windows, std_windows, ewm_spans)
+    cache = FeatureCache() if use_cache else None
+    with span('load_feature_frame') as s:
+        df = load_feature_frame(csv_path, lags, windows, std_windows, ewm_spans, cache=cache)
+        s.set(rows_out=len(df), cached=cache is not None)
+
+    X_cols = model_feature_columns(time_cols)
+    train_mask = df['service_date'] <= '2022-03-01'
 
-    pipeline = Pipeline([
-        ('poly',  PolynomialFeatures(degree=2, include_bias=False)),
-        ('scale', StandardScaler()),
-        ('ridge', RidgeCV(alphas=[0.1, 1.0, 10.0], cv=TimeSeriesSplit(n_splits=5)))
-    ])
-    pipeline.fit(X_train, y_train)
-
-    y_pred = pipeline.predict(X_test)
-    y_pred_int = np.rint(y_pred).astype(int)
-    y_pred_clipped = np.clip(y_pred_int, 0, None)
-
-    df_enc.loc[~train_mask, 'predicted_entries'] = y_pred_clipped
-
-    start_date = '2022-03-02'
-    end_date   = '2023-03-01'
-    test_mask_orig = (
-        (df['service_date'] >= start_date) &
-        (df['service_date'] <=   end_date)
-    )
-
-    test_orig = df.loc[test_mask_orig, [
-        'service_date','station_name','tavg','prcp','wspd','gated_entries'
-    ]].copy()
-    test_orig.rename(columns={'gated_entries':'actual_entries'}, inplace=True)
-    test_orig['predicted_entries'] = df_enc.loc[test_mask_orig, 'predicted_entries'].values
-    test_orig.to_csv(output_csv, index=False)
-
-    rmse = np.sqrt(mean_squared_error(test_orig['actual_entries'], test_orig['predicted_entries']))
-    return rmse
+    if shard_by:
+        # Independent per-station / per-line models, see modelBank.py
+        from .modelBank import fit_model_bank
+        with span('fit', rows_in=int(train_mask.sum())) as s:
+            bank = fit_model_bank(df.loc[train_mask], X_cols, by=shard_by, alphas=alphas, n_jobs=n_jobs)
+            s.set(shards=len(bank.shards))
+        if model_path:
+            bank.save(model_path)
+        with span('predict', rows_in=int((~train_mask).sum())) as s:
+            # Stations without a shard (unseen in training) stay missing
+            y_pred = bank.predict(df.loc[~train_mask])
+            s.set(rows_out=int(np.isfinite(y_pred).sum()))
+    else:
+        # Station dummies next to the model columns, without copying the rest of the frame
+        dummies = pd.get_dummies(df['station_name'], prefix='station_name', drop_first=True)
+        X = pd.concat([df[X_cols], dummies], axis=1)
+        y = df['gated_entries']
+
+        X_train, X_test = X.loc[train_mask], X.loc[~train_mask]
+        y_train = y.loc[train_mask]
+
+        pipeline = make_pipeline(n_base=len(X_cols), alphas=alphas)
+        with span('fit', rows_in=len(X_train)) as s:
+            pipeline.fit(X_train, y_train)
+            s.set(features=X_train.shape[1])
+        if model_path:
+            from .predictor import save_model
+            observed = read_table(csv_path, columns=['service_date', 'station_name', 'gated_entries'])
+            observed = observed[observed['service_date'] <= '2022-03-01']
+            save_model(model_path, pipeline, observed, X_cols, lags, windows, std_windows, ewm_spans)
+
+        with span('predict') as s:
+            y_pred = pipeline.predict(X_test)
+            s.set(rows_in=len(X_test), rows_out=len(y_pred))
+
+    # Test rows up to 2023-03-01, written straight from the prediction array
+    test_rows = np.flatnonzero(~train_mask)
+    in_window = (df['service_date'].to_numpy()[test_rows] <= np.datetime64('2023-03-01'))
+    frame, test_rows, y_pred = df, test_rows[in_window], y_pred[in_window]
+
+    # Test days of stations without history yet are written unscored (NaN), so the
+    # output still covers the whole test year
+    unscored = rows_without_features(csv_path, df, '2022-03-02', '2023-03-01')
+    if len(unscored):
+        columns = ['service_date', 'station_name', 'tavg', 'prcp', 'wspd', 'gated_entries']
+        frame = concat_tables([df[columns].iloc[test_rows], unscored[columns]])
+        test_rows = np.arange(len(frame))
+        y_pred = np.concatenate([y_pred, np.full(len(unscored), np.nan)])
+
+    with span('write_predictions') as s:
+        errors = write_predictions(output_csv, frame, y_pred, test_rows,
+                                   partition_by=partition_by, errors_path=errors_path)
+        s.set(rows_out=len(test_rows), unscored=len(unscored))
+
+    overall = errors.overall()
+    record(rmse=float(overall['rmse']), mae=float(overall['mae']), mape=float(overall['mape']))
+    return overall['rmse']
@@ -0,0 +1,200 @@
+"""
+Daily weather on a contiguous date index
+
+WeatherStore keeps the weather as one (day x column) array starting at a
+fixed date, so the weather of a date is the row at its day offset:
+
+  - every day from the first to the last observed one has a row; gaps are
+    imputed instead of dropping the ridership of those days in the merge
+  - the store ends at the last observed day, so the merge cutoff comes from
+    the data instead of a fixed date
+  - join looks rows up by integer day offset, O(rows) without a hash merge
+
+Gaps are filled in order: tavg from (tmin + tmax) / 2 as before, short runs of
+missing days (up to max_gap) by linear interpolation between the neighbouring
+days, and everything else (longer gaps, and precipitation, which does not
+interpolate) from the day-of-year climatology of the column.
+
+Several sources (weather stations) are rows with a `station` column; each
+day's values are the mean over the sources that have them (how='mean'), or
+the first source that has them in source order (how='first').
+"""
+import numpy as np
+import pandas as pd
+
+WEATHER_COLUMNS = ['tavg', 'tmin', 'tmax', 'prcp', 'wspd']
+
+# Column naming the weather station of each row, for multi-source weather
+SOURCE_COLUMN = 'station'
+
+# Longest run of missing days filled by interpolation, and columns that never are
+MAX_GAP_DAYS = 3
+NO_INTERPOLATION = ('prcp',)
+
+# Half-width in days of the day-of-year window the climatology averages over
+SEASON_WINDOW = 7
+
+DAY = np.timedelta64(1, 'D')
+
+
+def day_offsets(dates, start):
+    # Whole days from start to every date (int64), in the dates' own resolution
+    dates = np.asarray(dates if pd.api.types.is_datetime64_dtype(dates) else pd.to_datetime(dates))
+    return (dates - np.datetime64(start)) // DAY
+
+
+def gap_lengths(missing):
+    # Length of the run of missing values each position belongs to (0 where present), per column
+    lengths = np.zeros(missing.shape, dtype=np.int64)
+    for j in range(missing.shape[1]):
+        run = np.cumsum(~missing[:, j])
+        counts = np.bincount(run[missing[:, j]], minlength=run[-1] + 1 if len(run) else 0)
+        lengths[missing[:, j], j] = counts[run[missing[:, j]]]
+    return lengths
+
+
+def interpolate_gaps(values, max_gap=MAX_GAP_DAYS, skip=()):
+    """Linearly interpolate runs of at most max_gap missing days that have data on both sides."""
+    values = values.copy()
+    missing = np.isnan(values)
+    lengths = gap_lengths(missing)
+    days = np.arange(len(values))
+    for j in range(values.shape[1]):
+        known = np.flatnonzero(~missing[:, j])
+        if j in skip or len(known) < 2:
+            continue
+        fill = missing[:, j] & (lengths[:, j] <= max_gap) & (days > known[0]) & (days < known[-1])
+        values[fill, j] = np.interp(days[fill], known, values[known, j])
+    return values
+
+
+def climatology(values, day_of_year, window=SEASON_WINDOW):
+    """(366 x column) mean of each day of year over +-window days, wrapping around the year."""
+    n_cols = values.shape[1]
+    present = ~np.isnan(values)
+    sums = np.zeros((366, n_cols))
+    counts = np.zeros((366, n_cols))
+    for j in range(n_cols):
+        sums[:, j] = np.bincount(day_of_year[present[:, j]], values[present[:, j], j], minlength=366)
+        counts[:, j] = np.bincount(day_of_year[present[:, j]], minlength=366)
+
+    # Circular moving sums over the window
+    kernel = np.ones(2 * window + 1)
+    pad = lambda a: np.concatenate([a[-window:], a, a[:window]])
+    sums = np.stack([np.convolve(pad(sums[:, j]), kernel, 'valid') for j in range(n_cols)], axis=1)
+    counts = np.stack([np.convolve(pad(counts[:, j]), kernel, 'valid') for j in range(n_cols)], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        clim = sums / counts
+    # Days of year with no data in the window at all: the column mean
+    return np.where(counts > 0, clim, np.nanmean(np.where(present, values, np.nan), axis=0))
+
+
+class WeatherStore:
+
+    def __init__(self, values, start, columns=WEATHER_COLUMNS, imputed=None, dtype=np.float32):
+        self.values = np.asarray(values, dtype=dtype)
+        self.start = pd.Timestamp(start).normalize()
+        self.columns = list(columns)
+        self.imputed = np.zeros(self.values.shape, dtype=bool) if imputed is None else np.asarray(imputed)
+
+    @classmethod
+    def from_frame(
+        cls,
+        df,
+        columns=WEATHER_COLUMNS,
+        date_col='service_date',
+        how='mean',
+        max_gap=MAX_GAP_DAYS,
+        window=SEASON_WINDOW
+    ):
+        """
+        Store of a table with one row per (date[, station]) and the weather
+        columns, from its first to its last observed date, gaps imputed.
+        """
+        if how not in ('mean', 'first'):
+            raise ValueError(f"Unknown source combination {how!r}")
+        dates = pd.to_datetime(df[date_col])
+        days = day_offsets(dates, dates.min().normalize())
+        if SOURCE_COLUMN in df.columns:
+            source, _ = pd.factorize(df[SOURCE_COLUMN])
+        else:
+            source = np.zeros(len(df), dtype=np.int64)
+        measured = ~df[columns].isna().to_numpy().all(axis=1)
+        if not measured.any():
+            raise ValueError("No weather observations")
+
+        # Scatter every source into a (source x day x column) array
+        first, last = days[measured].min(), days[measured].max()
+        inside = (days >= first) & (days <= last)
+        n_sources, n_days = source.max() + 1, last - first + 1
+        slot = source[inside] * n_days + (days[inside] - first)
+        if np.bincount(slot).max() > 1:
+            raise ValueError(f"WeatherStore expects one row per ({SOURCE_COLUMN}, {date_col})")
+        stacked = np.full((n_sources * n_days, len(columns)), np.nan)
+        stacked[slot] = df[columns].to_numpy(dtype=np.float64)[inside]
+        stacked = stacked.reshape(n_sources, n_days, len(columns))
+
+        with np.errstate(invalid='ignore'):
+            if how == 'mean':
+                values = np.nanmean(stacked, axis=0) if n_sources > 1 else stacked[0]
+            else:
+                # First source with a value: sources after it only fill its gaps
+                order = np.argmax(~np.isnan(stacked), axis=0)
+                values = np.take_along_axis(stacked, order[None], axis=0)[0]
+        missing = np.isnan(values)
+
+        # tavg from the day's min and max, then short gaps, then the season
+        if {'tavg', 'tmin', 'tmax'} <= set(columns):
+            t, lo, hi = (columns.index(c) for c in ('tavg', 'tmin', 'tmax'))
+            values[:, t] = np.where(np.isnan(values[:, t]), (values[:, lo] + values[:, hi]) / 2, values[:, t])
+        skip = [columns.index(c) for c in NO_INTERPOLATION if c in columns]
+        if np.isnan(values).any():
+            values = interpolate_gaps(values, max_gap, skip)
+        if np.isnan(values).any():
+            index = pd.date_range(dates.min().normalize() + pd.Timedelta(days=int(first)), periods=n_days)
+            day_of_year = index.dayofyear.to_numpy() - 1
+            values = np.where(np.isnan(values), climatology(values, day_of_year, window)[day_of_year], values)
+
+        dtypes = [df[c].dtype for c in columns if df[c].dtype.kind == 'f']
+        dtype = np.result_type(*dtypes) if dtypes else np.float64
+        # Start as a Timestamp of the input's own date resolution
+        start = dates[days == first].iloc[0].normalize()
+        return cls(values, start, columns, missing, dtype)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def index(self):
+        return pd.date_range(self.start, periods=len(self), freq='D', unit=self.start.unit)
+
+    @property
+    def end(self):
+        return self.start + pd.Timedelta(days=len(self) - 1)
+
+    def offsets(self, dates):
+        """Row of each date in the store, -1 outside its date range."""
+        offset = day_offsets(dates, self.start)
+        return np.where((offset >= 0) & (offset < len(self)), offset, -1)
+
+    def join(self, df, date_col='service_date'):
+        """
+        Rows of df inside the store's date range with the weather columns
+        appended (same rows and columns as an inner merge on the date).
+        """
+        offset = self.offsets(df[date_col])
+        keep = offset >= 0
+        joined = (df.loc[keep] if not keep.all() else df).reset_index(drop=True)
+        if not pd.api.types.is_datetime64_dtype(joined[date_col]):
+            joined[date_col] = pd.to_datetime(joined[date_col])
+        weather = pd.DataFrame(self.values[offset[keep]], columns=self.columns)
+        return pd.concat([joined, weather], axis=1)
+
+    def to_frame(self, date_col='service_date'):
+        # Contiguous daily table, as stored in processed_weather
+        df = pd.DataFrame(self.values, columns=self.columns)
+        df.insert(0, date_col, self.index)
+        return df
+
+    def imputed_counts(self):
+        return pd.Series(self.imputed.sum(axis=0), index=self.columns)
@@ -0,0 +1,235 @@
+"""
+Command line entry point for the T-Cast pipeline
+
+    python tcast.py process              raw MBTA + weather files -> processed tables
+    python tcast.py evaluate             fit on the training years, score the test year
+    python tcast.py train                fit on every day and save the model
+    python tcast.py predict ...          forecast station entries with the saved model
+    python tcast.py viz ...              heatmap of the test predictions
+    python tcast.py status               what is on disk
+
+Every subcommand imports the modules it needs when it runs, so `status` loads
+no scientific libraries and `predict` loads no scikit-learn.
+"""
+import argparse
+import os
+import sys
+import time
+
+from src.data import config
+
+TABLES = ('mbta_data', 'processed_mbta', 'processed_weather', 'merged_mbta_weather')
+TABLE_EXTENSIONS = ('.parquet', '.feather', '.csv')
+WEATHER_ARGS = ('tavg', 'tmin', 'tmax', 'prcp', 'wspd')
+
+
+def cmd_process(args):
+    from src.data.processing import combine_data, process_weather, process_zip, process_mbta, process_zip_streaming
+
+    if args.mode == 'incremental':
+        from src.data.incremental import process_incremental
+        summary = process_incremental(n_jobs=args.jobs, fmt=args.fmt)
+        print(f"Updated {summary['dates_updated']} dates "
+              f"({len(summary['added'])} files added, {len(summary['removed'])} removed)")
+        return 0
+
+    if args.mode == 'folder':
+        process_zip()
+        df_mbta = process_mbta(fmt=args.fmt)
+    else:
+        df_mbta = process_zip_streaming(n_jobs=args.jobs, fmt=args.fmt)
+    df_weather = process_weather(args.weather or None, fmt=args.fmt)
+    if args.chunked:
+        from src.data.chunkedPipeline import combine_data_chunked
+        from src.data.storage import table_path
+        paths = [table_path(config.processed_dir(), name, args.fmt) for name in TABLES[1:]]
+        combine_data_chunked(*paths)
+    else:
+        combine_data(df_mbta, df_weather, fmt=args.fmt)
+    if args.period_cube:
+        from src.data.periodCube import process_period_cube
+        process_period_cube(n_jobs=args.jobs)
+    return 0
+
+
+# Options of the in-memory evaluate that the chunked fit has no equivalent for
+IN_MEMORY_ONLY = {'model': '--model', 'shard_by': '--shard-by', 'jobs': '--jobs', 'no_cache': '--no-cache'}
+
+
+def cmd_evaluate(args):
+    alphas = tuple(args.alphas) if args.alphas else (0.1, 1.0, 10.0)
+    output = args.output or config.predictions_path()
+    if args.chunked:
+        unsupported = [flag for name, flag in IN_MEMORY_ONLY.items() if getattr(args, name)]
+        if unsupported:
+            args.parser.error(f"{', '.join(unsupported)} can't be used with --chunked")
+        from src.data.chunkedPipeline import run_model_pipeline_chunked
+        rmse = run_model_pipeline_chunked(args.input, output, alphas=alphas, partition_by=args.partition_by,
+                                          errors_path=args.errors)
+    else:
+        from src.data.tuningModel import run_model_pipeline
+        rmse = run_model_pipeline(args.input, output, model_path=args.model, shard_by=args.shard_by,
+                                  n_jobs=args.jobs, alphas=alphas, use_cache=not args.no_cache,
+                                  partition_by=args.partition_by, errors_path=args.errors)
+    print(f"Test RMSE: {rmse:.2f}")
+    return 0
+
+
+def cmd_train(args):
+    from src.data.predictor import train_model
+    path = train_model(args.input, args.model, train_end=args.train_end, use_cache=not args.no_cache)
+    print(f"Model saved to {path}")
+    return 0
+
+
+def forecast_weather(args):
+    # Weather rows from a file, or one day from the command line
+    import pandas as pd
+    from src.data.storage import read_table
+    if args.weather:
+        return read_table(args.weather)
+    missing = [name for name in WEATHER_ARGS if getattr(args, name) is None]
+    if missing:
+        raise SystemExit(f"predict needs --weather FILE or all of --{', --'.join(missing)}")
+    row = {name: [getattr(args, name)] for name in WEATHER_ARGS}
+    return pd.DataFrame({'service_date': [pd.Timestamp(args.date)], **row})
+
+
+def cmd_predict(args):
+    import pandas as pd
+    from src.data.predictor import Predictor
+    from src.data.storage import write_table
+
+    predictor = Predictor.load(args.model)
+    if args.date is None and not args.weather:
+        args.date = predictor.last_observed + pd.Timedelta(days=1)
+    out = predictor.forecast(forecast_weather(args), stations=args.stations or None)
+    if args.output:
+        write_table(out, args.output)
+        print(f"{len(out)} predictions written to {args.output}")
+    else:
+        print(out.to_string(index=False))
+    return 0
+
+
+def cmd_viz(args):
+    # Predictions default to where evaluate writes them in the configured data directory
+    import heatmapvisualization
+    return heatmapvisualization.main(args.viz_args)
+
+
+def describe(path):
+    stat = os.stat(path)
+    changed = time.strftime('%Y-%m-%d %H:%M', time.localtime(stat.st_mtime))
+    return f"{stat.st_size / 1e6:9.1f} MB  {changed}  {path}"
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def cmd_status(args):
+    # Only os / json: nothing of the pipeline is imported
+    import json
+
+    print(f"Data directory: {config.data_dir()}")
+    for label, path in [('raw zip', config.raw_dir('yearly_mbta_data.zip')), ('raw weather', config.raw_dir('weather_data.csv'))]:
+        print(f"  {label:<20}" + (describe(path) if os.path.exists(path) else "missing"))
+
+    for name in TABLES:
+        directory = config.raw_dir() if name == 'mbta_data' else config.processed_dir()
+        found = [os.path.join(directory, name + ext) for ext in TABLE_EXTENSIONS
+                 if os.path.exists(os.path.join(directory, name + ext))]
+        lines = [describe(path) for path in found] or ["missing"]
+        print(f"  {name:<20}" + ("\n  " + " " * 20).join(lines))
+
+    manifest = config.processed_dir('manifest.json')
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            sources = json.load(f).get('mbta_sources', {})
+        print(f"  {'manifest':<20}{len(sources)} MBTA source files tracked")
+
+    cube = config.processed_dir('period_cube')
+    print(f"  {'period_cube':<20}" + (f"{directory_size(cube) / 1e6:9.1f} MB  {cube}" if os.path.isdir(cube) else "missing"))
+    model = args.model or config.model_path()
+    print(f"  {'model':<20}" + (describe(model) if os.path.exists(model) else "missing"))
+    cache = config.cache_dir('features')
+    if os.path.isdir(cache):
+        print(f"  {'feature cache':<20}{directory_size(cache) / 1e6:9.1f} MB  {len(os.listdir(cache))} entries")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='tcast', description="MBTA ridership from weather: processing, models and forecasts")
+    parser.add_argument('--data-dir', help="data directory (default: $TCAST_DATA_DIR or data/ in the repository)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="no diagnostic dumps")
+    parser.add_argument('--metrics', help="append stage metrics (JSON lines) to this file")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    process = sub.add_parser('process', help="raw MBTA and weather files -> processed tables")
+    process.add_argument('--mode', choices=['streaming', 'folder', 'incremental'], default='streaming',
+                         help="read the yearly files from the zip (streaming), an extracted folder, or only what changed")
+    process.add_argument('--weather', nargs='+', help="weather file(s), one per weather station")
+    process.add_argument('--chunked', action='store_true', help="merge one year at a time")
+    process.add_argument('--period-cube', action='store_true', help="also build the intra-day period cube")
+    process.add_argument('--fmt', choices=['parquet', 'feather', 'csv'])
+    process.add_argument('--jobs', type=int)
+    process.set_defaults(func=cmd_process)
+
+    evaluate = sub.add_parser('evaluate', help="fit on the training years and score the test year")
+    evaluate.add_argument('--input', help="merged table (default: processed merged_mbta_weather)")
+    evaluate.add_argument('--output', help="predictions table (default: processed mbta_test_predictions.csv)")
+    evaluate.add_argument('--model', help="also save the fitted model here")
+    evaluate.add_argument('--shard-by', choices=['station', 'line'])
+    evaluate.add_argument('--alphas', type=float, nargs='+')
+    evaluate.add_argument('--partition-by', choices=['station'], help="one file per station in the directory --output")
+    evaluate.add_argument('--errors', help="write RMSE / MAE / MAPE per station and per line to this table")
+    evaluate.add_argument('--chunked', action='store_true', help="out-of-core fit, one year at a time")
+    evaluate.add_argument('--no-cache', action='store_true')
+    evaluate.add_argument('--jobs', type=int)
+    evaluate.set_defaults(func=cmd_evaluate, parser=evaluate)
+
+    train = sub.add_parser('train', help="fit on every day and save the model for predict")
+    train.add_argument('--input')
+    train.add_argument('--model')
+    train.add_argument('--train-end')
+    train.add_argument('--no-cache', action='store_true')
+    train.set_defaults(func=cmd_train)
+
+    predict = sub.add_parser('predict', help="forecast entries per station with the saved model")
+    predict.add_argument('--model')
+    predict.add_argument('--weather', help="table of service_date + weather columns, e.g. a 7-day forecast")
+    predict.add_argument('--date', help="single day (default: the day after the last observed one)")
+    for name in WEATHER_ARGS:
+        predict.add_argument(f'--{name}', type=float)
+    predict.add_argument('--stations', nargs='+')
+    predict.add_argument('--output')
+    predict.set_defaults(func=cmd_predict)
+
+    viz = sub.add_parser('viz', help="heatmap of the test predictions (options of heatmapvisualization.py)")
+    viz.add_argument('viz_args', nargs=argparse.REMAINDER)
+    viz.set_defaults(func=cmd_viz)
+
+    status = sub.add_parser('status', help="data, tables and model on disk")
+    status.add_argument('--model')
+    status.set_defaults(func=cmd_status)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    # viz passes its options on to heatmapvisualization.py (REMAINDER alone misses a leading --option)
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command != 'viz':
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    if args.command == 'viz':
+        args.viz_args = extra + args.viz_args
+    config.configure(data_dir=args.data_dir)
+    if args.quiet or args.metrics:
+        from src.data import instrumentation
+        instrumentation.configure(verbose=False if args.quiet else None, metrics_path=args.metrics)
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
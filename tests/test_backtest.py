@@ -0,0 +1,69 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.backtest import evaluate_grid, leaderboard, rolling_origin_cutoffs
+from data.designMatrix import StationPolynomialFeatures
+
+
+def make_frame(days=120, seed=0):
+    rng = np.random.default_rng(seed)
+    stations = ["Airport", "Alewife", "Park Street", "Wonderland"]
+    df = pd.DataFrame({
+        "service_date": np.repeat(pd.date_range("2022-01-01", periods=days), len(stations)),
+        "station_name": pd.Categorical(np.tile(stations, days)),
+        "x1": rng.normal(size=days * len(stations)),
+        "x2": rng.normal(size=days * len(stations)),
+    })
+    codes = df["station_name"].cat.codes.to_numpy(dtype=float)
+    df["gated_entries"] = 1000 + 200 * codes + 50 * df["x1"] * codes - 30 * df["x2"] + rng.normal(0, 5, len(df))
+    return df
+
+
+def test_fold_matches_sklearn_pipeline():
+    df = make_frame()
+    cutoff = pd.Timestamp("2022-03-01")
+    results = evaluate_grid(df, alphas=[1.0], feature_sets={"x": ["x1", "x2"]}, cutoffs=[cutoff],
+                            horizon_days=30, n_jobs=1)
+
+    train = df["service_date"] <= cutoff
+    test = (df["service_date"] > cutoff) & (df["service_date"] <= cutoff + pd.Timedelta(days=30))
+    X = pd.concat([df[["x1", "x2"]], pd.get_dummies(df["station_name"], drop_first=True)], axis=1)
+    pipeline = Pipeline([
+        ("poly", StationPolynomialFeatures(n_base=2)),
+        ("scale", StandardScaler(with_mean=False)),
+        ("ridge", Ridge(alpha=1.0, solver="sparse_cg", tol=1e-10)),
+    ]).fit(X[train], df.loc[train, "gated_entries"])
+    pred = np.clip(np.rint(pipeline.predict(X[test])), 0, None)
+    expected = np.sqrt(np.mean((pred - df.loc[test, "gated_entries"]) ** 2))
+
+    assert results.loc[0, "n_test"] == test.sum()
+    np.testing.assert_allclose(results.loc[0, "rmse"], expected, rtol=1e-6)
+
+
+def test_parallel_grid_and_leaderboard():
+    df = make_frame()
+    cutoffs = rolling_origin_cutoffs("2022-01-15", "2022-03-15", n_splits=3, step_days=20)
+    grid = dict(alphas=[0.1, 10.0], degrees=[1, 2], feature_sets={"x1": ["x1"], "both": ["x1", "x2"]},
+                cutoffs=cutoffs, horizon_days=20)
+
+    serial = evaluate_grid(df, n_jobs=1, **grid)
+    parallel = evaluate_grid(df, n_jobs=2, **grid)
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert len(serial) == 3 * 2 * 2 * 2
+
+    board = leaderboard(serial)
+    assert len(board) == 2 * 2 * 2
+    assert board["rmse"].is_monotonic_increasing
+    assert (board["folds"] == 3).all()
+    assert board.loc[0, "features"] == "both" and board.loc[0, "degree"] == 2
+
+
+def test_rolling_origin_cutoffs():
+    cutoffs = rolling_origin_cutoffs("2022-01-01", "2022-03-01", n_splits=4, step_days=30)
+    assert cutoffs == [pd.Timestamp("2022-01-30"), pd.Timestamp("2022-03-01")]
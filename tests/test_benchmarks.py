@@ -0,0 +1,34 @@
+import sys
+import os
+import zipfile
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+from bench_pipeline import compare, run_suite, save_results, load_results
+from synthetic_data import write_sources
+
+
+def test_synthetic_sources_have_the_requested_size(tmp_path):
+    paths = write_sources(str(tmp_path), stations=4, years=2, time_periods=3)
+    with zipfile.ZipFile(paths["zip"]) as zf:
+        assert sorted(zf.namelist()) == ["yearly_mbta_data/GSE_2018.csv", "yearly_mbta_data/GSE_2019.csv"]
+    year = pd.read_csv(os.path.join(paths["folder"], "GSE_2018.csv"))
+    assert len(year) == 365 * 3 * 4
+    assert year["station_name"].nunique() == 4
+    weather = pd.read_csv(paths["weather"])
+    assert list(weather.columns) == ["time", "tavg", "tmin", "tmax", "prcp", "wdir", "wspd", "pres"]
+
+
+def test_suite_records_every_stage_and_compare_flags_regressions(tmp_path):
+    results = run_suite(stations=4, years=1, time_periods=2, memory=False, n_jobs=1, log=lambda *a: None)
+    stages = [r["stage"] for r in results["stages"]]
+    assert stages[:5] == ["process_zip", "process_mbta", "process_zip_streaming", "process_weather", "combine_data"]
+    assert {"time_features", "fit", "predict", "heatmap_frames"} <= set(stages)
+
+    path = save_results(results, str(tmp_path / "base.json"))
+    baseline = load_results(path)
+    slower = {"meta": baseline["meta"], "stages": [dict(r) for r in baseline["stages"]]}
+    slower["stages"][0]["seconds"] = baseline["stages"][0]["seconds"] * 2 + 1
+    table = compare(baseline, slower)
+    assert table.loc[table["regression"], "stage"].tolist() == ["process_zip"]
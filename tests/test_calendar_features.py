@@ -0,0 +1,91 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+import holidays
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.calendarFeatures import add_calendar_features, holiday_distances, month_to_season
+from data.tuningModel import build_feature_frame, model_feature_columns
+
+
+def legacy_calendar_features(df):
+    # Row-wise feature code as it was in run_model_pipeline before calendarFeatures.py
+    df['day_of_week'] = df['service_date'].dt.dayofweek
+    df['is_weekend'] = df['day_of_week'].apply(lambda x: 1 if x >= 5 else 0)
+
+    def month_to_season(month):
+        if month in [12, 1, 2]: return 'winter'
+        elif month in [3, 4, 5]: return 'spring'
+        elif month in [6, 7, 8]: return 'summer'
+        else: return 'fall'
+
+    df['month'] = df['service_date'].dt.month
+    df['season'] = df['month'].apply(month_to_season)
+
+    years = df['service_date'].dt.year.unique().tolist()
+    us_hols = holidays.US(years=years)
+    df['is_holiday'] = df['service_date'].apply(lambda d: 1 if d in us_hols else 0)
+
+    holiday_dates = sorted(us_hols.keys())
+
+    def days_to_next_hol(dt):
+        d = dt.date()
+        future = [(hol - d).days for hol in holiday_dates if hol >= d]
+        return min(future) if future else np.nan
+
+    def days_from_prev_hol(dt):
+        d = dt.date()
+        past = [(d - hol).days for hol in holiday_dates if hol <= d]
+        return min(past) if past else np.nan
+
+    df['days_to_next_hol']   = df['service_date'].apply(days_to_next_hol)
+    df['days_from_prev_hol'] = df['service_date'].apply(days_from_prev_hol)
+    df['week_start'] = df['service_date'] - pd.to_timedelta(df['service_date'].dt.weekday, unit='D')
+    return df
+
+
+def test_holiday_distances_edges():
+    hols = np.array(['2022-07-04', '2022-09-05'], dtype='datetime64[D]')
+    dates = np.array(['2022-07-01', '2022-07-04', '2022-08-01', '2022-09-10'], dtype='datetime64[D]')
+    to_next, from_prev = holiday_distances(dates, hols)
+
+    np.testing.assert_array_equal(to_next, [3, 0, 35, np.nan])
+    np.testing.assert_array_equal(from_prev, [np.nan, 0, 28, 5])
+
+
+def test_month_to_season():
+    seasons = month_to_season([1, 3, 6, 9, 12])
+    assert list(seasons) == ['winter', 'spring', 'summer', 'fall', 'winter']
+    assert list(seasons.categories) == ['fall', 'spring', 'summer', 'winter']
+
+
+def test_calendar_features_match_row_wise_version():
+    dates = pd.date_range('2021-11-20', '2022-01-10', freq='D')
+    df = pd.DataFrame({
+        'service_date': np.repeat(dates, 3),
+        'station_name': np.tile(['Airport', 'Alewife', 'Andrew'], len(dates)),
+    })
+    fast = add_calendar_features(df.copy())
+    legacy = legacy_calendar_features(df.copy())
+
+    cols = ['day_of_week', 'is_weekend', 'month', 'is_holiday', 'days_to_next_hol', 'days_from_prev_hol', 'week_start']
+    pd.testing.assert_frame_equal(fast[cols], legacy[cols], check_dtype=False)
+    assert (fast['season'].astype(str) == legacy['season']).all()
+
+
+def test_holiday_distances_defined_up_to_the_end_of_the_year():
+    # After the last holiday of the final year the next one is in the following year
+    dates = pd.date_range('2021-01-01', '2022-12-31', freq='D')
+    df = pd.DataFrame({'service_date': np.repeat(dates, 2), 'station_name': np.tile(['Airport', 'Alewife'], len(dates))})
+    df['gated_entries'] = 1000.0
+    for col in ['tavg', 'tmin', 'tmax', 'prcp', 'wspd']:
+        df[col] = 1.0
+
+    table = add_calendar_features(df.copy())
+    assert not table[['days_to_next_hol', 'days_from_prev_hol']].isna().any().any()
+    assert table.loc[table['service_date'] == '2022-12-31', 'days_to_next_hol'].eq(1).all()
+
+    features = build_feature_frame(df)
+    assert features['service_date'].max() == pd.Timestamp('2022-12-31')
+    assert not features[model_feature_columns()].isna().any().any()
@@ -0,0 +1,117 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.chunkedPipeline import combine_data_chunked, iter_date_chunks, iter_feature_chunks, run_model_pipeline_chunked
+from data.processing import merge_mbta_weather
+from data.storage import read_table, write_table
+from data.tuningModel import build_feature_frame, load_feature_frame, make_pipeline, model_feature_columns
+
+
+def make_tables(days=500, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2021-06-01", periods=days)
+    stations = ["Alewife", "Park Street", "Wonderland"]
+    mbta = pd.DataFrame({
+        "service_date": np.repeat(dates, len(stations)),
+        "station_name": np.tile(stations, days),
+    })
+    level = np.tile([3000.0, 9000.0, 2000.0], days)
+    weekday = np.where(mbta["service_date"].dt.dayofweek >= 5, 0.6, 1.0)
+    mbta["gated_entries"] = np.rint(level * weekday + rng.normal(0, 100, len(mbta)))
+    # One station closed for a week, so lags cross a gap
+    mbta = mbta[~((mbta["station_name"] == "Wonderland") & mbta["service_date"].between("2021-12-28", "2022-01-03"))]
+    weather = pd.DataFrame({
+        "service_date": dates, "tavg": rng.normal(10, 8, days), "tmin": 0.0, "tmax": 20.0,
+        "prcp": rng.exponential(2, days), "wspd": rng.gamma(4, 3, days),
+    })
+    return mbta.reset_index(drop=True), weather
+
+
+def test_chunked_combine_matches_in_memory_merge(tmp_path):
+    mbta, weather = make_tables()
+    write_table(mbta, str(tmp_path / "mbta.parquet"))
+    write_table(weather, str(tmp_path / "weather.parquet"))
+    out = combine_data_chunked(str(tmp_path / "mbta.parquet"), str(tmp_path / "weather.parquet"),
+                               str(tmp_path / "merged.parquet"), freq="M", batch_rows=100)
+
+    expected = merge_mbta_weather(read_table(str(tmp_path / "mbta.parquet")), read_table(str(tmp_path / "weather.parquet")))
+    merged = read_table(out)
+    pd.testing.assert_frame_equal(merged, expected.reset_index(drop=True), check_categorical=False)
+
+    # Chunks follow calendar months even when batches don't
+    chunks = list(iter_date_chunks(iter([merged.iloc[:250], merged.iloc[250:]]), freq="M"))
+    assert [c["service_date"].dt.month.nunique() for c in chunks] == [1] * len(chunks)
+    assert sum(len(c) for c in chunks) == len(merged)
+
+
+# One alpha, then grids where the rolling-origin folds pick the alpha (the last one long enough for the eigh path)
+@pytest.mark.parametrize("alphas", [(1.0,), (0.1, 1.0, 10.0, 1000.0), tuple(np.logspace(-2, 5, 10))])
+def test_chunked_fit_matches_in_memory_pipeline(tmp_path, alphas):
+    mbta, weather = make_tables()
+    merged_path = str(tmp_path / "merged.parquet")
+    write_table(merge_mbta_weather(mbta, weather), merged_path)
+
+    rmse = run_model_pipeline_chunked(merged_path, str(tmp_path / "pred.parquet"), train_end="2022-06-30",
+                                      test_end="2022-09-30", freq="Q", alphas=alphas, batch_rows=400)
+
+    df = build_feature_frame(read_table(merged_path))
+    x_cols = model_feature_columns()
+    X = pd.concat([df[x_cols], pd.get_dummies(df["station_name"], drop_first=True)], axis=1)
+    train = df["service_date"] <= "2022-06-30"
+    test = ~train & (df["service_date"] <= "2022-09-30")
+    pipeline = make_pipeline(n_base=len(x_cols), alphas=alphas).fit(X[train], df.loc[train, "gated_entries"])
+    expected = np.clip(np.rint(pipeline.predict(X[test])), 0, None)
+
+    pred = read_table(str(tmp_path / "pred.parquet"))
+    np.testing.assert_allclose(pred["predicted_entries"], expected, atol=1)
+    assert (pred["service_date"].to_numpy() == df.loc[test, "service_date"].to_numpy()).all()
+    np.testing.assert_allclose(rmse, np.sqrt(np.mean((expected - df.loc[test, "gated_entries"]) ** 2)), rtol=1e-3)
+
+
+def test_chunked_fit_needs_training_rows(tmp_path):
+    mbta, weather = make_tables(days=60)
+    merged_path = str(tmp_path / "merged.parquet")
+    write_table(merge_mbta_weather(mbta, weather), merged_path)
+
+    with pytest.raises(ValueError, match="No training rows"):
+        run_model_pipeline_chunked(merged_path, str(tmp_path / "pred.parquet"), train_end="2021-01-01")
+
+
+def test_chunked_features_carry_over_long_gaps(tmp_path):
+    # Wonderland closed across the year boundary for longer than the carried days (29 here)
+    mbta, weather = make_tables()
+    closed = (mbta["station_name"] == "Wonderland") & mbta["service_date"].between("2021-11-01", "2022-01-10")
+    merged_path = str(tmp_path / "merged.parquet")
+    write_table(merge_mbta_weather(mbta[~closed], weather), merged_path)
+
+    config = dict(lags=(1, 7), windows=(7, 28), std_windows=(7,))
+    expected = load_feature_frame(merged_path, **config)
+    years = range(2020, 2024)
+    chunked = pd.concat(list(iter_feature_chunks(merged_path, "Y", **config, holiday_years=years, batch_rows=400)),
+                        ignore_index=True)
+    assert (chunked["service_date"] == pd.Timestamp("2022-01-11")).sum() == 3
+    pd.testing.assert_frame_equal(chunked[expected.columns], expected, check_categorical=False)
+
+
+def test_chunked_pipeline_writes_unscored_rows(tmp_path):
+    # A station opening in the test range has no features on its first day
+    mbta, weather = make_tables()
+    opening = mbta[(mbta["station_name"] == "Alewife") & (mbta["service_date"] >= "2022-08-01")]
+    mbta = pd.concat([mbta, opening.assign(station_name="Union Square")], ignore_index=True)
+    mbta = mbta.sort_values(["service_date", "station_name"], ignore_index=True)
+    merged_path = str(tmp_path / "merged.parquet")
+    write_table(merge_mbta_weather(mbta, weather), merged_path)
+
+    run_model_pipeline_chunked(merged_path, str(tmp_path / "pred.parquet"), train_end="2022-06-30",
+                               test_end="2022-09-30", freq="Q", batch_rows=400)
+    pred = read_table(str(tmp_path / "pred.parquet"))
+    test = mbta["service_date"].between("2022-07-01", "2022-09-30")
+    assert len(pred) == test.sum()
+    unscored = pred[pred["predicted_entries"].isna()]
+    assert list(unscored["station_name"].astype(str)) == ["Union Square"]
+    assert unscored["service_date"].iloc[0] == pd.Timestamp("2022-08-01")
+    assert pred["service_date"].is_monotonic_increasing
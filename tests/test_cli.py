@@ -0,0 +1,110 @@
+import sys
+import os
+import subprocess
+import zipfile
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import tcast
+from src.data.storage import read_table, write_table
+
+repo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def make_merged(path, days=120, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2022-01-01", periods=days)
+    stations = ["Alewife", "Park Street", "Wonderland"]
+    n = days * len(stations)
+    df = pd.DataFrame({
+        "service_date": np.repeat(dates, len(stations)),
+        "station_name": np.tile(stations, days),
+        "tavg": np.repeat(rng.normal(10, 5, days), len(stations)),
+        "tmin": np.repeat(rng.normal(5, 5, days), len(stations)),
+        "tmax": np.repeat(rng.normal(15, 5, days), len(stations)),
+        "prcp": np.repeat(rng.exponential(2, days), len(stations)),
+        "wspd": np.repeat(rng.normal(12, 3, days), len(stations)),
+    })
+    df["gated_entries"] = 3000 + 1000 * (np.arange(n) % 3) - 40 * df["prcp"] + rng.normal(0, 50, n)
+    return write_table(df, str(path))
+
+
+def make_raw(directory, days=30, stations=("Alewife", "Park Street", "Wonderland")):
+    # yearly_mbta_data.zip (one GSE file per year, two time periods per day) and weather_data.csv
+    os.makedirs(directory)
+    dates = pd.date_range("2022-12-20", periods=days)
+    rows = pd.DataFrame({
+        "service_date": np.repeat(dates.strftime("%Y/%m/%d"), 2 * len(stations)),
+        "time_period": np.tile(np.repeat(["(05:00:00)", "(05:30:00)"], len(stations)), days),
+        "stop_id": np.tile([f"place-{i}" for i in range(len(stations))], 2 * days),
+        "station_name": np.tile(stations, 2 * days),
+        "route_or_line": "Red Line",
+        "gated_entries": np.arange(days * 2 * len(stations)) % 97 + 0.5,
+    })
+    with zipfile.ZipFile(directory / "yearly_mbta_data.zip", "w") as zf:
+        for year, part in rows.groupby(rows["service_date"].str[:4]):
+            zf.writestr(f"yearly_mbta_data/GSE_{year}.csv", part.to_csv(index=False))
+    pd.DataFrame({
+        "time": dates.strftime("%Y-%m-%d"), "tavg": 1.0, "tmin": -2.0, "tmax": 4.0,
+        "prcp": 0.5, "wdir": 180.0, "wspd": 10.0, "pres": 1015.0,
+    }).to_csv(directory / "weather_data.csv", index=False)
+    return rows
+
+
+def test_process_with_default_paths(tmp_path, monkeypatch):
+    monkeypatch.setitem(tcast.config._settings, "data_dir", tcast.config._settings["data_dir"])
+    rows = make_raw(tmp_path / "raw")
+
+    assert tcast.main(["--data-dir", str(tmp_path), "-q", "process", "--jobs", "1"]) == 0
+    merged = read_table(str(tmp_path / "processed" / "merged_mbta_weather.parquet"))
+    assert len(merged) == rows.groupby(["service_date", "station_name"]).ngroups
+    assert merged["gated_entries"].sum() == rows["gated_entries"].sum()
+    assert merged["tavg"].eq(1.0).all()
+
+
+def test_train_and_predict_use_the_configured_data_dir(tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(tcast.config._settings, "data_dir", tcast.config._settings["data_dir"])
+    os.makedirs(tmp_path / "processed")
+    make_merged(tmp_path / "processed" / "merged_mbta_weather.parquet")
+
+    assert tcast.main(["--data-dir", str(tmp_path), "-q", "train", "--no-cache"]) == 0
+    assert os.path.exists(tmp_path / "models" / "ridership_model.joblib")
+
+    out = str(tmp_path / "forecast.csv")
+    tcast.main(["--data-dir", str(tmp_path), "predict", "--tavg", "5", "--tmin", "2", "--tmax", "8",
+                "--prcp", "40", "--wspd", "20", "--output", out])
+    forecast = read_table(out)
+    assert len(forecast) == 3 and forecast["predicted_entries"].notna().all()
+    assert (forecast["service_date"] == pd.Timestamp("2022-05-01")).all()
+
+    tcast.main(["--data-dir", str(tmp_path), "status"])
+    status = capsys.readouterr().out
+    assert "merged_mbta_weather.parquet" in status and "ridership_model.joblib" in status
+
+
+def test_evaluate_and_viz_use_the_configured_data_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(tcast.config._settings, "data_dir", tcast.config._settings["data_dir"])
+    os.makedirs(tmp_path / "processed")
+    make_merged(tmp_path / "processed" / "merged_mbta_weather.parquet")
+
+    assert tcast.main(["--data-dir", str(tmp_path), "-q", "evaluate", "--no-cache"]) == 0
+    assert os.path.exists(tmp_path / "processed" / "mbta_test_predictions.csv")
+    html = str(tmp_path / "heatmap.html")
+    tcast.main(["--data-dir", str(tmp_path), "viz", "--html", html, "--cdn"])
+    assert os.path.getsize(html) > 0
+
+    # Options the chunked fit can't honour are rejected instead of ignored
+    for extra in (["--model", "m.joblib"], ["--shard-by", "line"], ["--jobs", "2"], ["--no-cache"]):
+        with pytest.raises(SystemExit) as exit:
+            tcast.main(["--data-dir", str(tmp_path), "evaluate", "--chunked", *extra])
+        assert exit.value.code == 2
+
+
+def test_status_and_imports_stay_light():
+    # status never imports pandas; the modelling modules import without scikit-learn
+    code = ("import sys, tcast; tcast.main(['status']); assert 'pandas' not in sys.modules; "
+            "import src.data.predictor, src.data.processing, src.data.tuningModel; "
+            "assert not [m for m in sys.modules if m.startswith('sklearn')]")
+    subprocess.run([sys.executable, "-c", code], cwd=repo_dir, check=True, capture_output=True)
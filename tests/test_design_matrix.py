@@ -0,0 +1,65 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.designMatrix import StationPolynomialFeatures, station_codes
+from data.ridge import NormalEquationRidge
+
+
+def make_station_data(n_rows=600, n_base=4, n_stations=5, seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=(n_rows, n_base))
+    codes = rng.integers(-1, n_stations, n_rows)
+    dummies = np.zeros((n_rows, n_stations), dtype=bool)
+    has = codes >= 0
+    dummies[np.flatnonzero(has), codes[has]] = True
+    X = pd.DataFrame(np.hstack([base, dummies]), columns=[f'c{i}' for i in range(n_base + n_stations)])
+    y = base @ rng.normal(size=n_base) + 5 * (codes + 1) + base[:, 0] * codes + rng.normal(size=n_rows)
+    return X, y, n_base
+
+
+def test_station_codes():
+    codes = station_codes([[0, 1, 0], [0, 0, 0], [1, 0, 0]])
+    assert codes.tolist() == [1, -1, 0]
+
+
+def test_sparse_matrix_has_no_station_cross_products():
+    X, _, n_base = make_station_data()
+    Z = StationPolynomialFeatures(n_base=n_base).fit_transform(X)
+    dense = PolynomialFeatures(degree=2, include_bias=False).fit_transform(X.to_numpy(float))
+
+    assert sp.issparse(Z)
+    assert Z.shape[1] < dense.shape[1]
+    assert Z.nnz == np.count_nonzero(dense)
+
+
+def test_sparse_pipeline_matches_dense_polynomial_pipeline():
+    X, y, n_base = make_station_data()
+    dense = Pipeline([
+        ('poly',  PolynomialFeatures(degree=2, include_bias=False)),
+        ('scale', StandardScaler()),
+        ('ridge', Ridge(alpha=1.0))
+    ]).fit(X.to_numpy(float), y)
+    sparse = Pipeline([
+        ('poly',  StationPolynomialFeatures(n_base=n_base)),
+        ('scale', StandardScaler(with_mean=False)),
+        ('ridge', NormalEquationRidge(alpha=1.0))
+    ]).fit(X, y)
+
+    np.testing.assert_allclose(sparse.predict(X), dense.predict(X.to_numpy(float)), rtol=1e-6, atol=1e-6)
+
+
+def test_normal_equation_ridge_matches_sklearn_on_sparse_input():
+    X, y, n_base = make_station_data()
+    Z = StationPolynomialFeatures(n_base=n_base).fit_transform(X)
+    ours = NormalEquationRidge(alpha=0.5).fit(Z, y)
+    ref = Ridge(alpha=0.5).fit(Z.toarray(), y)
+
+    np.testing.assert_allclose(ours.coef_, ref.coef_, rtol=1e-6, atol=1e-8)
+    np.testing.assert_allclose(ours.intercept_, ref.intercept_, rtol=1e-6)
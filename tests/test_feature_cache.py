@@ -0,0 +1,65 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.featureCache import FeatureCache
+from data.storage import write_table
+from data.tuningModel import load_feature_frame
+
+
+def make_merged(path, days=40):
+    dates = pd.date_range("2021-12-01", periods=days)
+    stations = ["Alewife", "Park Street", "Wonderland"]
+    df = pd.DataFrame({
+        "service_date": np.repeat(dates, len(stations)),
+        "station_name": np.tile(stations, days),
+        "gated_entries": np.arange(days * len(stations)) % 97 * 10.0,
+        "tavg": 1.0, "tmin": -2.0, "tmax": 4.0, "prcp": 0.5, "wspd": 12.0,
+    })
+    return write_table(df, str(path))
+
+
+def test_get_or_build_only_builds_once(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    calls = []
+
+    def build():
+        calls.append(1)
+        return pd.DataFrame({"a": [1.0, 2.0], "station_name": pd.Categorical(["x", "y"])})
+
+    first = cache.get_or_build("k", build)
+    second = cache.get_or_build("k", build)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = FeatureCache(str(tmp_path), max_entries=2)
+    frame = pd.DataFrame({"a": np.arange(10.0)})
+    cache.put("old", frame)
+    cache.put("used", frame)
+    os.utime(cache.path("old"), (1, 1))
+    os.utime(cache.path("used"), (2, 2))
+    assert cache.get("used") is not None
+    cache.put("new", frame)
+
+    assert cache.get("old") is None
+    assert cache.get("used") is not None and cache.get("new") is not None
+
+
+def test_cached_feature_frame_matches_fresh_build(tmp_path):
+    merged = make_merged(tmp_path / "merged.parquet")
+    cache = FeatureCache(str(tmp_path / "cache"))
+
+    fresh = load_feature_frame(merged)
+    built = load_feature_frame(merged, cache=cache)
+    hit = load_feature_frame(merged, cache=cache)
+    assert len(cache.entries()) == 1
+    pd.testing.assert_frame_equal(hit, fresh, check_dtype=False)
+    pd.testing.assert_frame_equal(built, fresh, check_dtype=False)
+
+    # A different config is a different entry
+    load_feature_frame(merged, windows=(3,), cache=cache)
+    assert len(cache.entries()) == 2
@@ -0,0 +1,109 @@
+import sys
+import os
+import types
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.heatmapExport import aggregate_cube, decode_deltas, encode_deltas, export_html, render_frames, write_gif
+from data.heatmapFrames import HeatmapCube, build_cube, figure_dict, iter_frames
+
+
+def make_predictions():
+    return pd.DataFrame({
+        "service_date": pd.to_datetime(["2022-03-02", "2022-03-02", "2022-03-03", "2022-03-04", "2022-03-04"]),
+        "station_name": ["Alewife", "Park Street", "Alewife", "Park Street", "Nowhere"],
+        "tavg": [40.0, 40.0, 45.0, 50.0, 50.0],
+        "prcp": [0.0, 0.0, 0.2, 0.0, 0.0],
+        "wspd": [10.0, 10.0, 12.0, 8.0, 8.0],
+        "actual_entries": [1000, 4000, 1200, 3000, 99],
+        "predicted_entries": [1100, 3500, 1200, 3600, 99],
+    })
+
+
+def test_cube_pivots_dates_by_stations():
+    cube = build_cube(make_predictions(), end="2022-03-03", stations=["Alewife", "Park Street"])
+    assert cube.labels() == ["2022-03-02", "2022-03-03"]
+    np.testing.assert_array_equal(cube.actual, [[1000, 4000], [1200, 0]])
+    np.testing.assert_array_equal(cube.error, [[100, 500], [0, 0]])
+    np.testing.assert_allclose(cube.size[0], [10.0, 40.0])
+    np.testing.assert_array_equal(cube.weather[1], [45.0, 0.2, 12.0])
+
+
+def test_unscored_rows_are_missing_and_empty_ranges_fail(tmp_path):
+    entries = make_predictions()
+    entries.loc[1, "predicted_entries"] = np.nan
+    cube = build_cube(entries, stations=["Alewife", "Park Street"])
+    np.testing.assert_array_equal(cube.present[0], [True, False])
+    assert np.isfinite(cube.predicted).all() and np.isfinite(cube.error).all()
+
+    empty = build_cube(entries, start="2023-01-01", stations=["Alewife", "Park Street"])
+    with pytest.raises(ValueError, match="No dates"):
+        figure_dict(empty)
+    with pytest.raises(ValueError, match="No dates"):
+        export_html(empty, str(tmp_path / "heatmap.html"))
+
+
+def test_frames_are_lazy_slices():
+    cube = build_cube(make_predictions(), stations=["Alewife", "Park Street"])
+    frames = iter_frames(cube)
+    assert isinstance(frames, types.GeneratorType)
+    last = list(frames)[-1]
+    assert last["name"] == "2022-03-04"
+    np.testing.assert_array_equal(last["data"][0]["customdata"], [[0, 0, 0], [3000, 600, 3600]])
+    assert "50.0°F" in last["layout"]["title"]["text"]
+
+    fig = figure_dict(cube)
+    assert len(fig["frames"]) == 3
+    assert [s["label"] for s in fig["layout"]["sliders"][0]["steps"]] == cube.labels()
+
+
+def test_weekly_aggregation_averages_present_days():
+    cube = build_cube(make_predictions(), stations=["Alewife", "Park Street"])
+    weekly = aggregate_cube(cube, "W")
+    assert weekly.labels() == ["2022-02-28"]
+    # Alewife has two days, Park Street two (Mar 2 and Mar 4)
+    np.testing.assert_allclose(weekly.actual, [[1100, 3500]])
+    np.testing.assert_allclose(weekly.error, [[50, 550]])
+    np.testing.assert_allclose(weekly.weather, [[45.0, 0.2 / 3, 10.0]])
+
+
+def test_html_export_embeds_delta_encoded_arrays(tmp_path):
+    cube = build_cube(make_predictions(), stations=["Alewife", "Park Street"])
+    encoded = encode_deltas(cube.predicted)
+    np.testing.assert_array_equal(decode_deltas(encoded, 2), cube.predicted)
+
+    path = export_html(cube, str(tmp_path / "heatmap.html"), include_plotlyjs=False)
+    html = open(path, encoding="utf-8").read()
+    assert encoded in html
+    assert "Plotly.addFrames" in html
+
+
+def test_missing_station_days_are_zero_filled(tmp_path):
+    # Park Street has no scored row on the second day (NaN left in the arrays)
+    present = np.array([[True, True], [True, False]])
+    cube = HeatmapCube(pd.DatetimeIndex(["2022-03-07", "2022-03-08"]), ["Alewife", "Park Street"],
+                       np.array([[1000.0, 4000.0], [1200.0, 3800.0]]), np.array([[1100.0, 3500.0], [1200.0, np.nan]]),
+                       np.zeros((2, 3)), present=present)
+    weekly = aggregate_cube(cube, "W")
+    np.testing.assert_allclose(weekly.predicted, [[1150, 3500]])
+    np.testing.assert_allclose(weekly.error, [[50, 500]])
+
+    path = export_html(cube, str(tmp_path / "heatmap.html"), include_plotlyjs=False)
+    html = open(path, encoding="utf-8").read()
+    assert encode_deltas([[1100.0, 3500.0], [1200.0, 0.0]]) in html and encode_deltas(present) in html
+    with pytest.raises(ValueError):
+        encode_deltas(cube.predicted)
+
+    # Decoding wraps around like the page's Int32Array
+    extremes = np.array([[2 ** 31 - 1], [-(2 ** 31) + 1]])
+    np.testing.assert_array_equal(decode_deltas(encode_deltas(extremes), 1), extremes)
+
+
+def test_png_frames_and_gif(tmp_path):
+    cube = build_cube(make_predictions(), stations=["Alewife", "Park Street"])
+    paths = render_frames(cube, str(tmp_path / "frames"), n_jobs=1, chunk_size=2, dpi=20)
+    assert [os.path.basename(p) for p in paths] == ["frame_00000.png", "frame_00001.png", "frame_00002.png"]
+    gif = write_gif(paths, str(tmp_path / "heatmap.gif"))
+    assert os.path.getsize(gif) > 0
@@ -0,0 +1,72 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.incremental import load_manifest, process_incremental
+from data.processing import merge_mbta_weather, process_weather, stream_mbta_aggregates
+from data.storage import read_table, table_path
+
+
+def write_year(directory, year, days=6):
+    rows = []
+    for day in pd.date_range(f"{year}-01-01", periods=days):
+        for station in ["Alewife", "Park Street"]:
+            for period in ["(04:30:00)", "(05:00:00)"]:
+                rows.append({
+                    "service_date": day.strftime("%Y-%m-%d"), "time_period": period, "stop_id": None,
+                    "station_name": station, "route_or_line": "Red Line", "gated_entries": day.day * 10 + len(station),
+                })
+    pd.DataFrame(rows).to_csv(os.path.join(directory, f"GSE_{year}.csv"), index=False)
+
+
+def write_weather(path, change_day=None):
+    dates = pd.date_range("2018-01-01", "2019-12-31")
+    weather = pd.DataFrame({
+        "time": dates.strftime("%Y-%m-%d"), "tavg": np.arange(len(dates)) % 30 * 1.0, "tmin": 0.0, "tmax": 5.0,
+        "prcp": 0.0, "wdir": 180.0, "wspd": 10.0, "pres": 1010.0,
+    })
+    if change_day is not None:
+        weather.loc[weather["time"] == change_day, "prcp"] = 42.0
+    weather.to_csv(path, index=False)
+
+
+def full_rebuild(source, weather, tmp_dir):
+    merged = merge_mbta_weather(stream_mbta_aggregates(source, n_jobs=1), process_weather(weather, output_dir=tmp_dir))
+    return merged.astype({"station_name": str}).sort_values(["service_date", "station_name"], ignore_index=True)
+
+
+def stored_merged(directory):
+    merged = read_table(table_path(directory, "merged_mbta_weather"))
+    return merged.astype({"station_name": str}).sort_values(["service_date", "station_name"], ignore_index=True)
+
+
+def test_incremental_processing_only_touches_new_dates(tmp_path):
+    source, processed, scratch = tmp_path / "yearly", tmp_path / "processed", tmp_path / "scratch"
+    source.mkdir()
+    weather = str(tmp_path / "weather.csv")
+    write_year(source, 2018)
+    write_weather(weather)
+
+    first = process_incremental(str(source), weather, str(processed), n_jobs=1)
+    assert first["full_build"]
+    pd.testing.assert_frame_equal(stored_merged(processed), full_rebuild(str(source), weather, scratch), check_dtype=False)
+
+    again = process_incremental(str(source), weather, str(processed), n_jobs=1)
+    assert again["added"] == [] and again["dates_updated"] == 0
+
+    write_year(source, 2019, days=4)
+    update = process_incremental(str(source), weather, str(processed), n_jobs=1)
+    assert [os.path.basename(m) for m in update["added"]] == ["GSE_2019.csv"]
+    assert update["dates_updated"] == 4
+    pd.testing.assert_frame_equal(stored_merged(processed), full_rebuild(str(source), weather, scratch), check_dtype=False)
+
+    write_weather(weather, change_day="2018-01-03")
+    update = process_incremental(str(source), weather, str(processed), n_jobs=1)
+    assert update["weather_changed"] and update["dates_updated"] == 1
+    pd.testing.assert_frame_equal(stored_merged(processed), full_rebuild(str(source), weather, scratch), check_dtype=False)
+
+    manifest = load_manifest(str(processed))
+    assert len(manifest["mbta_sources"]) == 2
+    assert all(os.path.exists(processed / entry["part"]) for entry in manifest["mbta_sources"].values())
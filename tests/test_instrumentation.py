@@ -0,0 +1,67 @@
+import sys
+import os
+import io
+import json
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data import instrumentation
+from data.instrumentation import configure, span
+from data.processing import process_weather
+
+
+@pytest.fixture
+def metrics(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    configure(verbose=False, metrics_path=str(path))
+    yield path
+    configure(verbose=True, metrics_path='')
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_stage_records_rows_bytes_and_quiet_output(tmp_path, metrics, capsys):
+    weather = tmp_path / "weather.csv"
+    pd.DataFrame({
+        "time": ["2022-01-01", "2022-01-02"], "tavg": [None, 2.0], "tmin": [0.0, 1.0], "tmax": [3.0, 4.0],
+        "prcp": [0.0, 2.5], "wdir": [None, 180.0], "wspd": [10.0, 12.0], "pres": [1012.0, None],
+    }).to_csv(weather, index=False)
+
+    with span("outer"):
+        process_weather(str(weather), output_dir=str(tmp_path / "out"))
+
+    assert capsys.readouterr().out == ""
+    stage, outer = read_records(metrics)
+    assert stage["span"] == "process_weather" and stage["parent"] == "outer" and stage["status"] == "ok"
+    assert stage["rows_in"] == 2 and stage["rows_out"] == 2
+    assert stage["bytes_read"] == os.path.getsize(weather)
+    assert stage["bytes_written"] == os.path.getsize(tmp_path / "out" / "processed_weather.parquet")
+    assert stage["seconds"] > 0 and stage["peak_rss_mb"] > 0
+    # The parent span includes its children's I/O
+    assert outer["bytes_read"] == stage["bytes_read"]
+
+
+def test_failed_span_is_recorded_as_error(metrics):
+    stream = io.StringIO()
+    configure(stream=stream)
+    try:
+        with pytest.raises(KeyError):
+            with span("broken", rows_in=3):
+                raise KeyError("x")
+    finally:
+        instrumentation._settings['stream'] = None
+    record = json.loads(stream.getvalue())
+    assert record["status"] == "error" and record["rows_in"] == 3
+    assert read_records(metrics) == [record]
+
+
+def test_spans_without_the_resource_module(metrics, monkeypatch):
+    # Windows has no resource module: memory is left out, the span is still recorded
+    monkeypatch.setattr(instrumentation, "resource", None)
+    with span("no_rss", rows_in=1):
+        pass
+    record, = read_records(metrics)
+    assert record["status"] == "ok" and record["peak_rss_mb"] is None and record["rss_growth_mb"] is None
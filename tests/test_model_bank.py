@@ -0,0 +1,80 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.modelBank import ModelBank, fit_model_bank
+
+
+def make_frame(days=120, seed=0):
+    rng = np.random.default_rng(seed)
+    # Two Red Line stations, two Blue Line stations
+    stations = ["Alewife", "Airport", "Park Street", "Wonderland"]
+    df = pd.DataFrame({
+        "service_date": np.repeat(pd.date_range("2022-01-01", periods=days), len(stations)),
+        "station_name": pd.Categorical(np.tile(stations, days)),
+        "x1": rng.normal(size=days * len(stations)),
+        "x2": rng.normal(size=days * len(stations)),
+    })
+    codes = df["station_name"].cat.codes.to_numpy(dtype=float)
+    df["gated_entries"] = 1000 + 200 * codes + 50 * df["x1"] * codes - 30 * df["x2"] + rng.normal(0, 5, len(df))
+    return df
+
+
+def test_station_shard_matches_its_own_pipeline(tmp_path):
+    df = make_frame()
+    bank = fit_model_bank(df, ["x1", "x2"], by="station", alphas=[1.0], n_jobs=1)
+    assert list(bank.shards) == ["Airport", "Alewife", "Park Street", "Wonderland"]
+
+    one = df[df["station_name"] == "Park Street"]
+    expected = Pipeline([
+        ("poly", PolynomialFeatures(degree=2, include_bias=False)),
+        ("scale", StandardScaler(with_mean=False)),
+        ("ridge", Ridge(alpha=1.0)),
+    ]).fit(one[["x1", "x2"]], one["gated_entries"]).predict(one[["x1", "x2"]])
+    np.testing.assert_allclose(bank.predict(one), expected, rtol=1e-8)
+
+    # Rows of every shard in one call, in any order, and through a saved bank
+    shuffled = df.sample(frac=1, random_state=0)
+    loaded = ModelBank.load(bank.save(str(tmp_path / "bank.joblib")))
+    pred = loaded.predict(shuffled)
+    np.testing.assert_allclose(pred[(shuffled["station_name"] == "Park Street").to_numpy()],
+                               bank.predict(shuffled[shuffled["station_name"] == "Park Street"]))
+    assert np.sqrt(np.mean((pred - shuffled["gated_entries"]) ** 2)) < 10
+
+
+def test_line_shards_in_parallel_and_unseen_stations():
+    df = make_frame()
+    serial = fit_model_bank(df, ["x1", "x2"], by="line", n_jobs=1)
+    parallel = fit_model_bank(df, ["x1", "x2"], by="line", n_jobs=2)
+    assert list(serial.shards) == ["Blue", "Red"]
+    summary = serial.summary().set_index("shard")
+    assert summary.loc["Red", "stations"] == 2 and summary.loc["Blue", "rows"] == 2 * 120
+    np.testing.assert_allclose(serial.predict(df), parallel.predict(df))
+
+    # Unseen Red Line station: the Red shard's baseline station; no model in a station bank
+    new = df[df["station_name"] == "Alewife"].assign(station_name="Davis")
+    np.testing.assert_allclose(serial.predict(new), serial.predict(df[df["station_name"] == "Alewife"]))
+    station_bank = fit_model_bank(df, ["x1", "x2"], by="station", n_jobs=1)
+    assert np.isnan(station_bank.predict(new)).all()
+
+
+def test_shard_alpha_search_scores_like_the_global_model():
+    df = make_frame()
+    alphas = list(np.logspace(-2, 4, 12))
+    alewife = df[df["station_name"] == "Alewife"]
+    for scoring in ["r2", "neg_mean_squared_error"]:
+        bank = fit_model_bank(df, ["x1", "x2"], by="station", alphas=alphas, n_jobs=1,
+                              **({} if scoring == "r2" else {"scoring": scoring}))
+        ridge = bank.models[list(bank.shards).index("Alewife")].named_steps["ridge"]
+        # The shard scales once on all its rows, then searches alpha on the scaled columns
+        X = PolynomialFeatures(degree=2, include_bias=False).fit_transform(alewife[["x1", "x2"]])
+        X = StandardScaler(with_mean=False).fit_transform(X)
+        expected = GridSearchCV(Ridge(), {"alpha": alphas}, cv=TimeSeriesSplit(n_splits=5),
+                                scoring=None if scoring == "r2" else scoring).fit(X, alewife["gated_entries"])
+        assert ridge.scoring == scoring and ridge.alpha_ == expected.best_params_["alpha"]
@@ -1,13 +1,16 @@
 import sys
 import os
+import numpy as np
 import pandas as pd
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data import config
+from data.storage import find_table
 from data.tuningModel import run_model_pipeline
 
 def test_run_model_pipeline_outputs_csv():
     rmse = run_model_pipeline(
-        csv_path="data/processed/merged_mbta_weather.csv",  
+        csv_path=find_table("data/processed", "merged_mbta_weather"),
         output_csv="mbta_test_predictions.csv"
     )
 
@@ -22,3 +25,25 @@ def test_run_model_pipeline_outputs_csv():
 
     # Check output quality
     assert rmse < 10000, f"RMSE is too high: {rmse}"
+
+
+def test_default_input_falls_back_to_the_legacy_csv(tmp_path, monkeypatch):
+    # Only merged_mbta_weather.csv in the configured data directory, as written before the columnar store
+    monkeypatch.setitem(config._settings, "data_dir", str(tmp_path))
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2021-06-01", "2023-03-01")
+    stations = ["Alewife", "Wonderland"]
+    df = pd.DataFrame({
+        "service_date": np.repeat(dates, len(stations)),
+        "station_name": np.tile(stations, len(dates)),
+        "tavg": np.repeat(rng.normal(10, 8, len(dates)), len(stations)),
+        "tmin": 0.0, "tmax": 20.0, "prcp": 1.0, "wspd": 10.0,
+    })
+    df["gated_entries"] = np.rint(np.tile([3000.0, 2000.0], len(dates)) + rng.normal(0, 50, len(df)))
+    os.makedirs(tmp_path / "processed")
+    df.to_csv(tmp_path / "processed" / "merged_mbta_weather.csv", index=False)
+
+    output = str(tmp_path / "predictions.csv")
+    rmse = run_model_pipeline(output_csv=output, use_cache=False)
+    assert len(pd.read_csv(output)) == 2 * len(pd.date_range("2022-03-02", "2023-03-01"))
+    assert rmse < 200
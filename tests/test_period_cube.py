@@ -0,0 +1,67 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.periodCube import PeriodCube, build_period_cube, order_periods, process_period_cube
+from data.processing import stream_mbta_aggregates
+
+
+def write_year(path, year=2018, days=3):
+    rows = []
+    for day in pd.date_range(f"{year}-01-01", periods=days):
+        # Periods out of order in the file; the after-midnight period ends the service day
+        for period in ["(05:00:00)", "(00:30:00)", "(04:30:00)", "(05:30:00)"]:
+            for station, line in [("Alewife", "Red Line"), ("Park Street", "Red Line"), ("Wonderland", "Blue Line")]:
+                if station == "Wonderland" and day.day == 2:
+                    continue
+                rows.append({
+                    "service_date": day.strftime("%Y-%m-%d"), "time_period": period, "stop_id": None,
+                    "station_name": station, "route_or_line": line, "gated_entries": day.day * 10 + len(station),
+                })
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def test_cube_rollups_match_daily_totals(tmp_path):
+    folder = tmp_path / "yearly"
+    folder.mkdir()
+    write_year(folder / "GSE_2018.csv")
+    write_year(folder / "GSE_2019.csv", year=2019)
+
+    cube = process_period_cube(str(folder), chunksize=7, n_jobs=1, output_dir=str(tmp_path / "out"))
+    assert cube.entries.shape == (6, 4, 3) and cube.entries.dtype == np.int32
+    assert list(cube.periods) == ["(04:30:00)", "(05:00:00)", "(05:30:00)", "(00:30:00)"]
+    assert not cube.present[1, 2] and cube.entries[1, :, 2].sum() == 0
+
+    # Daily rollup is the processed_mbta table
+    expected = stream_mbta_aggregates(str(folder), n_jobs=1)
+    daily = cube.daily()
+    pd.testing.assert_frame_equal(daily[["service_date", "gated_entries"]], expected[["service_date", "gated_entries"]])
+    assert daily["station_name"].astype(str).tolist() == expected["station_name"].astype(str).tolist()
+
+    hourly = cube.hourly()
+    assert list(hourly.periods) == ["(04:00:00)", "(05:00:00)", "(00:00:00)"]
+    np.testing.assert_array_equal(hourly.entries[:, 1], cube.entries[:, 1] + cube.entries[:, 2])
+
+    lines = cube.by_line()
+    assert list(lines.stations) == ["Red", "Blue"]
+    np.testing.assert_array_equal(lines.entries[..., 0], cube.entries[..., 0] + cube.entries[..., 1])
+
+    # Saved cube is memory-mapped back
+    loaded = PeriodCube.load(str(tmp_path / "out" / "period_cube"))
+    assert isinstance(loaded.entries, np.memmap)
+    frame = loaded.to_frame()
+    assert frame["time_period"].cat.ordered and len(frame) == cube.present.sum() * 4
+    assert frame["gated_entries"].sum() == cube.entries.sum()
+
+
+def test_zip_and_folder_sources_agree(tmp_path):
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+    from synthetic_data import write_sources
+
+    paths = write_sources(str(tmp_path), stations=5, years=2, time_periods=6)
+    from_zip = build_period_cube(paths["zip"], n_jobs=2)
+    from_folder = build_period_cube(paths["folder"], chunksize=1000, n_jobs=1)
+    np.testing.assert_array_equal(from_zip.entries, from_folder.entries)
+    assert list(order_periods(["(23:30:00)", "(02:00:00)", "(03:00:00)"])) == ["(03:00:00)", "(23:30:00)", "(02:00:00)"]
@@ -0,0 +1,93 @@
+import sys
+import os
+import glob
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.predictionWriter import PREDICTION_COLUMNS, PredictionWriter, quantize, write_predictions
+from data.storage import read_table
+
+
+def make_frame(days=40, seed=0):
+    # Rows in station-major order, the reverse of the output order
+    rng = np.random.default_rng(seed)
+    stations = ["Park Street", "JFK/UMass", "Wonderland", "Nowhere"]
+    n = days * len(stations)
+    return pd.DataFrame({
+        "service_date": np.tile(pd.date_range("2022-03-02", periods=days), len(stations)),
+        "station_name": pd.Categorical(np.repeat(stations, days)),
+        "gated_entries": rng.integers(0, 3000, n).astype(np.int32),
+        "tavg": rng.normal(10, 5, n).astype(np.float32),
+        "prcp": rng.exponential(2, n).astype(np.float32),
+        "wspd": rng.normal(12, 3, n).astype(np.float32),
+        "lag1": rng.normal(size=n),
+    })
+
+
+def expected_errors(df, by):
+    err = (df["predicted_entries"] - df["actual_entries"]).abs()
+    positive = df["actual_entries"] > 0
+    groups = df.assign(err=err, sq=err ** 2, pct=np.where(positive, err / df["actual_entries"], np.nan))
+    stats = groups.groupby(by, observed=True).agg(n=("err", "count"), sse=("sq", "sum"), sae=("err", "sum"), pct=("pct", "mean"))
+    return pd.DataFrame({"rmse": np.sqrt(stats["sse"] / stats["n"]), "mae": stats["sae"] / stats["n"], "mape": 100 * stats["pct"]})
+
+
+def test_rows_in_output_order_with_errors(tmp_path):
+    df = make_frame()
+    rows = np.flatnonzero(df["service_date"] >= "2022-03-10")
+    y = np.random.default_rng(1).normal(1500, 800, len(rows))
+    y[:5] = np.nan
+
+    errors = write_predictions(str(tmp_path / "pred.csv"), df, y, rows, buffer_rows=17)
+    out = read_table(str(tmp_path / "pred.csv"))
+    assert list(out.columns) == PREDICTION_COLUMNS
+    assert len(out) == len(rows)
+    assert out["service_date"].is_monotonic_increasing
+    assert (out.groupby("service_date")["station_name"].apply(lambda s: s.astype(str).is_monotonic_increasing)).all()
+
+    # Same rows and values as the old copy-and-join output
+    expected = df.iloc[rows][PREDICTION_COLUMNS[:-2] + ["gated_entries"]].rename(columns={"gated_entries": "actual_entries"})
+    expected["predicted_entries"] = quantize(y)
+    key = ["service_date", "station_name"]
+    pd.testing.assert_frame_equal(out.sort_values(key).reset_index(drop=True)[["actual_entries", "predicted_entries"]],
+                                  expected.sort_values(key).reset_index(drop=True)[["actual_entries", "predicted_entries"]],
+                                  check_dtype=False)
+
+    # Errors of the scored rows in one pass, per station and per line
+    scored = expected.dropna(subset=["predicted_entries"])
+    by_station = errors.by_station()
+    want = expected_errors(scored, "station_name")
+    np.testing.assert_allclose(by_station.loc[want.index, ["rmse", "mae", "mape"]].to_numpy(), want.to_numpy())
+    assert by_station["n"].sum() == len(rows) - 5
+    overall = errors.overall()
+    assert np.isclose(overall["rmse"], np.sqrt(np.mean((scored["predicted_entries"] - scored["actual_entries"]) ** 2)))
+
+    by_line = errors.by_line()
+    red = scored[scored["station_name"].isin(["Park Street", "JFK/UMass"])]
+    assert by_line.loc["Red", "n"] == len(red)
+    assert np.isclose(by_line.loc["Red", "rmse"], np.sqrt(np.mean((red["predicted_entries"] - red["actual_entries"]) ** 2)))
+    assert by_line.loc["Green", "n"] == (scored["station_name"] == "Park Street").sum()
+    assert by_line.loc["Other", "n"] == (scored["station_name"] == "Nowhere").sum()
+
+
+def test_partitioned_output_matches_single_table(tmp_path):
+    df = make_frame()
+    y = np.random.default_rng(2).normal(1500, 800, len(df))
+    write_predictions(str(tmp_path / "pred.parquet"), df, y)
+    single = read_table(str(tmp_path / "pred.parquet"))
+
+    # Two writes (date chunks) into one file per station
+    first = (df["service_date"] < "2022-03-20").to_numpy()
+    with PredictionWriter(str(tmp_path / "by_station"), partition_by="station", buffer_rows=13) as writer:
+        writer.write(df, y[first], np.flatnonzero(first))
+        writer.write(df, y[~first], np.flatnonzero(~first))
+    files = sorted(glob.glob(str(tmp_path / "by_station" / "*.parquet")))
+    assert [os.path.basename(f) for f in files] == ["JFK%2FUMass.parquet", "Nowhere.parquet", "Park Street.parquet", "Wonderland.parquet"]
+
+    parts = pd.concat([read_table(f).assign(station_name=lambda d: d["station_name"].astype(str)) for f in files])
+    assert all(read_table(f)["service_date"].is_monotonic_increasing for f in files)
+    key = ["service_date", "station_name"]
+    single["station_name"] = single["station_name"].astype(str)
+    pd.testing.assert_frame_equal(parts.sort_values(key).reset_index(drop=True), single.sort_values(key).reset_index(drop=True))
+    assert writer.errors.overall()["n"] == len(df)
@@ -0,0 +1,82 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.predictor import Predictor, train_model
+from data.storage import read_table, write_table
+from data.tuningModel import build_feature_frame, load_feature_frame
+
+
+def make_merged(path, days=150, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2022-01-01", periods=days)
+    stations = ["Alewife", "Park Street", "Wonderland"]
+    n = days * len(stations)
+    df = pd.DataFrame({
+        "service_date": np.repeat(dates, len(stations)),
+        "station_name": np.tile(stations, days),
+        "tavg": np.repeat(rng.normal(10, 5, days), len(stations)),
+        "tmin": np.repeat(rng.normal(5, 5, days), len(stations)),
+        "tmax": np.repeat(rng.normal(15, 5, days), len(stations)),
+        "prcp": np.repeat(rng.exponential(2, days), len(stations)),
+        "wspd": np.repeat(rng.normal(12, 3, days), len(stations)),
+    })
+    df["gated_entries"] = 3000 + 1000 * (np.arange(n) % 3) - 40 * df["prcp"] + rng.normal(0, 50, n)
+    return write_table(df, str(path))
+
+
+def test_predictions_match_training_pipeline(tmp_path):
+    data = make_merged(tmp_path / "merged.parquet")
+    model = train_model(data, str(tmp_path / "model.joblib"), train_end="2022-04-30", use_cache=False)
+    predictor = Predictor.load(model)
+
+    # Score the day after the newly observed ones and compare with the in-memory pipeline
+    observed = read_table(data, columns=["service_date", "station_name", "gated_entries"])
+    predictor.update_history(observed[observed["service_date"] <= "2022-05-09"])
+    frame = load_feature_frame(data)
+    rows = frame[frame["service_date"] == "2022-05-10"]
+    X = pd.concat([rows[predictor.x_cols], pd.get_dummies(rows["station_name"], drop_first=True)], axis=1)
+    expected = np.clip(np.rint(predictor.pipeline.predict(X)), 0, None)
+    np.testing.assert_array_equal(predictor.predict(rows), expected)
+
+
+def test_forecast_scores_every_station_and_day(tmp_path):
+    data = make_merged(tmp_path / "merged.parquet")
+    predictor = Predictor.load(train_model(data, str(tmp_path / "model.joblib"), use_cache=False))
+    weather = pd.DataFrame({
+        "service_date": pd.date_range(predictor.last_observed + pd.Timedelta(days=1), periods=7),
+        "tavg": 12.0, "tmin": 8.0, "tmax": 16.0, "prcp": 0.0, "wspd": 10.0,
+    })
+    out = predictor.forecast(weather)
+    assert len(out) == 7 * 3
+    assert out["predicted_entries"].notna().all()
+    # Station order and levels survive the round trip
+    means = out.groupby("station_name")["predicted_entries"].mean()
+    assert means["Alewife"] < means["Park Street"] < means["Wonderland"]
+
+    with pytest.raises(KeyError):
+        predictor.forecast(weather, stations=["Nowhere"])
+
+
+def test_silent_station_keeps_its_training_features(tmp_path):
+    # Ends on Dec 31 (holiday distances into the next year) with Wonderland silent
+    # for its last month, longer than the saved lag history
+    path = make_merged(tmp_path / "merged.parquet", days=730)
+    df = read_table(path)
+    df["service_date"] = df["service_date"] - pd.Timedelta(days=365)
+    df = df[~((df["station_name"] == "Wonderland") & (df["service_date"] > "2022-11-30"))]
+    data = write_table(df, str(tmp_path / "merged.parquet"))
+    predictor = Predictor.load(train_model(data, str(tmp_path / "model.joblib"), use_cache=False))
+    assert predictor.last_observed == pd.Timestamp("2022-12-31")
+
+    # Features of a Wonderland row on Jan 1, as training would compute them
+    day = df[df["service_date"] == "2022-12-31"].iloc[:1]
+    day = day.assign(station_name="Wonderland", service_date=pd.Timestamp("2023-01-01"))
+    expected = build_feature_frame(pd.concat([df, day], ignore_index=True))
+    expected = expected[expected["service_date"] == "2023-01-01"]
+    base, _ = predictor.design(expected)
+    np.testing.assert_allclose(base, expected[predictor.x_cols].to_numpy(dtype=np.float64))
+    assert np.isfinite(predictor.predict(expected)).all()
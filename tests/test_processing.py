@@ -6,6 +6,7 @@ import os
 import sys
 import zipfile
 import pandas as pd
+import numpy as np
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
@@ -14,10 +15,13 @@ from src.data.processing import (
     process_mbta,
     process_weather,
     combine_data,
-    mbta_path,
-    weather_path,
-    processed_dir
+    default_paths
 )
+from src.data.storage import read_table, table_path
+
+mbta_path = default_paths()['mbta_path']
+weather_path = default_paths()['weather_path']
+processed_dir = default_paths()['processed_dir']
 
 
 
@@ -41,24 +45,23 @@ def test_process_zip_creates_mbta_data():
     process_zip()
 
     # Check output file exists
-    output_file = os.path.join(os.path.dirname(__file__), "..", "data", "raw", "mbta_data.csv")
-    assert os.path.isfile(output_file), "mbta_data.csv was not created"
+    assert os.path.isfile(mbta_path), "mbta_data table was not created"
 
 @pytest.mark.order(2)
 def test_process_mbta_creates_processed_file():
     process_mbta(mbta_path)
 
     # Check output file exists
-    output_file = os.path.join(processed_dir, "processed_mbta.csv")
-    assert os.path.isfile(output_file), "processed_mbta.csv was not created"
+    output_file = table_path(processed_dir, "processed_mbta")
+    assert os.path.isfile(output_file), "processed_mbta table was not created"
 
 @pytest.mark.order(3)
 def test_process_weather_creates_processed_file():
     process_weather(weather_path)
 
     # Check output file exists
-    output_file = os.path.join(processed_dir, "processed_weather.csv")
-    assert os.path.isfile(output_file), "processed_weather.csv was not created"
+    output_file = table_path(processed_dir, "processed_weather")
+    assert os.path.isfile(output_file), "processed_weather table was not created"
 
 
 @pytest.mark.order(4)
@@ -72,11 +75,70 @@ def test_process_combine_data():
     combine_data(df_mbta, df_weather)
 
     # Check if output exists
-    merged_file = os.path.join(processed_dir, "merged_mbta_weather.csv")
+    merged_file = table_path(processed_dir, "merged_mbta_weather")
     assert os.path.exists(merged_file), "Merged output not created"
 
     # Optionally validate the merged content
-    df_merged = pd.read_csv(merged_file)
+    df_merged = read_table(merged_file)
     assert not df_merged.empty, "Merged file is empty"
     assert "station_name" in df_merged.columns, "Missing station_name in merged data"
     assert "tavg" in df_merged.columns, "Missing tavg (temperature avg) in merged data"
+
+
+def write_yearly_zip(path):
+    # Two small yearly files in GSE format, one inside a folder
+    frames = {}
+    for year in (2018, 2019):
+        rows = []
+        for day in pd.date_range(f"{year}-01-01", periods=5):
+            for station in ["Alewife", "Park Street", "State"]:
+                for period in ["(04:30:00)", "(05:00:00)"]:
+                    rows.append({
+                        "service_date": day.strftime("%Y/%m/%d"),
+                        "time_period": period,
+                        "stop_id": None,
+                        "station_name": station,
+                        "route_or_line": "Red Line",
+                        "gated_entries": (day.day * 7 + len(station)) % 50,
+                    })
+        frames[f"yearly/GSE_{year}.csv"] = pd.DataFrame(rows)
+
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, frame in frames.items():
+            zf.writestr(name, frame.to_csv(index=False))
+    return pd.concat(frames.values(), ignore_index=True)
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_stream_mbta_aggregates_matches_full_groupby(tmp_path, n_jobs):
+    from src.data.processing import stream_mbta_aggregates
+
+    raw = write_yearly_zip(tmp_path / "yearly.zip")
+    result = stream_mbta_aggregates(str(tmp_path / "yearly.zip"), chunksize=7, n_jobs=n_jobs)
+
+    expected = raw.groupby(["service_date", "station_name"], as_index=False)["gated_entries"].sum()
+    expected["service_date"] = pd.to_datetime(expected["service_date"])
+
+    assert len(result) == len(expected)
+    merged = result.merge(expected, on=["service_date", "station_name"], suffixes=("", "_expected"))
+    assert (merged["gated_entries"] == merged["gated_entries_expected"]).all()
+    assert result["station_name"].dtype == "category"
+
+
+def test_folder_and_streaming_paths_round_after_the_daily_sum(tmp_path):
+    from src.data.processing import stream_mbta_aggregates
+
+    raw = write_yearly_zip(tmp_path / "yearly.zip")
+    # Fractional source rows: 2 x 0.5 must sum to 1, not round to 0 + 0 (or 1 + 1) first
+    raw["gated_entries"] = raw["gated_entries"] + 0.5
+    folder = tmp_path / "yearly"
+    os.makedirs(folder)
+    raw.to_csv(folder / "GSE_all.csv", index=False)
+
+    process_zip(str(folder), str(tmp_path / "mbta_data.parquet"))
+    folder_path = process_mbta(str(tmp_path / "mbta_data.parquet"), output_dir=str(tmp_path / "out"))
+    streaming = stream_mbta_aggregates(str(folder), chunksize=7, n_jobs=1)
+
+    expected = raw.groupby(["service_date", "station_name"])["gated_entries"].sum().to_numpy()
+    assert (folder_path["gated_entries"].to_numpy() == np.rint(expected)).all()
+    assert (streaming["gated_entries"].to_numpy() == folder_path["gated_entries"].to_numpy()).all()
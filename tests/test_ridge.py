@@ -0,0 +1,66 @@
+import sys
+import os
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.ridge import GramAccumulator, RidgePathCV, ridge_path, solve_ridge
+
+
+def make_data(n_rows=400, n_features=12, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features)) * rng.uniform(0.1, 10, n_features) + rng.normal(0, 3, n_features)
+    # A drift over time, so the folds disagree a little
+    y = X @ rng.normal(size=n_features) + np.linspace(0, 5, n_rows) + rng.normal(0, 2, n_rows) + 100
+    return X, y
+
+
+def test_alpha_path_matches_per_alpha_solves():
+    X, y = make_data()
+    gram, xty = X.T @ X, X.T @ y
+    alphas = np.logspace(-3, 3, 40)
+    path = ridge_path(gram, xty, alphas)
+    for i in [0, 17, 39]:
+        np.testing.assert_allclose(path[:, i], solve_ridge(gram, xty, alphas[i]), rtol=1e-8)
+        ours = Ridge(alpha=alphas[i], fit_intercept=False).fit(X, y).coef_
+        np.testing.assert_allclose(path[:, i], ours, rtol=1e-6)
+
+
+@pytest.mark.parametrize("scoring", ["r2", "neg_mean_squared_error"])
+def test_path_cv_matches_grid_search(scoring):
+    X, y = make_data()
+    alphas = list(np.logspace(-2, 4, 60))
+    cv = RidgePathCV(alphas=alphas, n_splits=5, scoring=scoring).fit(X, y)
+    grid = GridSearchCV(Ridge(), {'alpha': alphas}, cv=TimeSeriesSplit(n_splits=5),
+                        scoring=None if scoring == "r2" else scoring).fit(X, y)
+
+    np.testing.assert_allclose(cv.cv_results_['mean_score'], grid.cv_results_['mean_test_score'], rtol=1e-7)
+    assert cv.alpha_ == grid.best_params_['alpha']
+    np.testing.assert_allclose(cv.coef_, grid.best_estimator_.coef_, rtol=1e-7)
+    np.testing.assert_allclose(cv.predict(X), grid.predict(X), rtol=1e-9)
+
+    # Sparse input gives the same fit
+    sparse = RidgePathCV(alphas=alphas, n_splits=5, scoring=scoring).fit(sp.csr_matrix(X), y)
+    np.testing.assert_allclose(sparse.coef_, cv.coef_, rtol=1e-8)
+
+
+def test_accumulated_chunks_match_scaled_ridge():
+    X, y = make_data()
+    acc = GramAccumulator()
+    for start in range(0, len(y), 64):
+        acc.add(X[start:start + 64], y[start:start + 64])
+    coef, intercept = acc.solve(3.0)
+
+    pipeline = Pipeline([('scale', StandardScaler(with_mean=False)), ('ridge', Ridge(alpha=3.0))]).fit(X, y)
+    np.testing.assert_allclose(X @ coef + intercept, pipeline.predict(X), rtol=1e-9)
+    np.testing.assert_allclose(acc.sse(coef, intercept), np.sum((y - X @ coef - intercept) ** 2), rtol=1e-7)
+
+    # The scaler's std, and no fit without rows
+    np.testing.assert_allclose(acc.std(), pipeline.named_steps['scale'].scale_, rtol=1e-9)
+    with pytest.raises(ValueError, match="No rows"):
+        GramAccumulator(X.shape[1]).solve(3.0)
@@ -0,0 +1,94 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.designMatrix import station_polynomial_matrix
+from data.predictor import Predictor, train_model
+from data.scenarios import ScenarioEngine, scenario_grid
+from data.storage import write_table
+from data.tuningModel import load_feature_frame
+
+
+def make_merged(path, days=150, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2022-01-01", periods=days)
+    stations = ["Alewife", "Park Street", "Wonderland"]
+    n = days * len(stations)
+    df = pd.DataFrame({
+        "service_date": np.repeat(dates, len(stations)),
+        "station_name": np.tile(stations, days),
+        "tavg": np.repeat(rng.normal(10, 5, days), len(stations)),
+        "tmin": np.repeat(rng.normal(5, 5, days), len(stations)),
+        "tmax": np.repeat(rng.normal(15, 5, days), len(stations)),
+        "prcp": np.repeat(rng.exponential(2, days), len(stations)),
+        "wspd": np.repeat(rng.normal(12, 3, days), len(stations)),
+    })
+    # Rain lowers ridership more on cold days, so the fit has weather interactions
+    df["gated_entries"] = (3000 + 1000 * (np.arange(n) % 3) - 40 * df["prcp"]
+                           + 2 * df["prcp"] * (df["tavg"] - 10) + rng.normal(0, 50, n))
+    return write_table(df, str(path))
+
+
+def forecast_weather(predictor, days=5):
+    return pd.DataFrame({
+        "service_date": pd.date_range(predictor.last_observed + pd.Timedelta(days=1), periods=days),
+        "tavg": 12.0, "tmin": 8.0, "tmax": 16.0, "prcp": np.arange(days, dtype=float), "wspd": 10.0,
+    })
+
+
+def pipeline_predictions(predictor, engine, weather):
+    # Scenario rows scored one by one through the fitted pipeline, as a (station x date) array
+    rows = weather.loc[np.tile(np.arange(len(weather)), len(engine.stations))].reset_index(drop=True)
+    rows["station_name"] = np.repeat(engine.stations.to_numpy(), len(weather))
+    base, codes = predictor.design(rows)
+    poly = predictor.pipeline.named_steps["poly"]
+    Z = station_polynomial_matrix(base, codes - 1, poly.n_stations_, degree=poly.degree)
+    return predictor.pipeline[1:].predict(Z).reshape(engine.shape)
+
+
+def test_scenarios_match_pipeline(tmp_path):
+    data = make_merged(tmp_path / "merged.parquet")
+    predictor = Predictor.load(train_model(data, str(tmp_path / "model.joblib"), use_cache=False))
+    weather = forecast_weather(predictor)
+    engine = ScenarioEngine.from_predictor(predictor, weather)
+
+    grid = scenario_grid(prcp=[0.0, 20.0, 40.0], tavg=[-5.0, 5.0, 25.0])
+    out = engine.evaluate(grid, clip=False, dtype=np.float64)
+    assert out.shape == (9, 3, 5)
+    for k in range(len(grid)):
+        changed = weather.assign(prcp=grid["prcp"][k], tavg=grid["tavg"][k])
+        np.testing.assert_allclose(out[k], pipeline_predictions(predictor, engine, changed), rtol=1e-9)
+
+    # Shifts add to each day's own weather
+    shifted = engine.evaluate({"prcp": [0.0, 10.0]}, mode="shift", clip=False, dtype=np.float64)
+    np.testing.assert_allclose(shifted[0], engine.baseline(clip=False), rtol=1e-12)
+    expected = pipeline_predictions(predictor, engine, weather.assign(prcp=weather["prcp"] + 10))
+    np.testing.assert_allclose(shifted[1], expected, rtol=1e-9)
+
+    frame = engine.to_frame(out, grid)
+    assert len(frame) == 9 * 3 * 5
+    assert frame.set_index(["scenario", "station_name", "service_date"])["predicted_entries"].is_unique
+
+    with pytest.raises(KeyError):
+        engine.evaluate({"lag1": [0.0]})
+
+
+def test_scenarios_from_feature_frame_leave_gaps_missing(tmp_path):
+    data = make_merged(tmp_path / "merged.parquet")
+    predictor = Predictor.load(train_model(data, str(tmp_path / "model.joblib"), use_cache=False))
+    frame = load_feature_frame(data)
+    frame = frame[frame["service_date"] >= "2022-05-01"]
+    # One station is missing a day
+    frame = frame.drop(frame.index[(frame["station_name"] == "Wonderland") & (frame["service_date"] == "2022-05-03")])
+
+    engine = ScenarioEngine.from_frame(predictor.pipeline, frame, predictor.x_cols, predictor.stations)
+    baseline = engine.baseline(clip=False)
+    assert np.isnan(baseline).sum() == 1
+    scored = frame[["service_date", "station_name"]].assign(predicted_entries=predictor.pipeline.predict(
+        pd.concat([frame[predictor.x_cols], pd.get_dummies(frame["station_name"], drop_first=True)], axis=1)))
+    out = engine.to_frame(baseline[None]).dropna().merge(scored, on=["service_date", "station_name"])
+    assert len(out) == len(frame)
+    np.testing.assert_allclose(out["predicted_entries_x"], out["predicted_entries_y"], rtol=1e-9)
@@ -0,0 +1,57 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.schema import SchemaError, apply_schema, concat_tables, memory_report, validate
+from data.storage import read_table
+
+
+def make_merged():
+    return pd.DataFrame({
+        "service_date": ["2022-01-01", "2022-01-01", "2022-01-02"],
+        "station_name": ["Alewife", "Park Street", "Alewife"],
+        "gated_entries": [1200.0, 3400.4, 999.6],
+        "tavg": [1.5, 1.5, 2.0], "tmin": [0.0, 0.0, 1.0], "tmax": [3.0, 3.0, 4.0],
+        "prcp": [0.0, 0.0, 2.5], "wspd": [10.0, 10.0, 12.0],
+    })
+
+
+def test_csv_tables_are_read_with_schema_dtypes(tmp_path):
+    path = tmp_path / "merged.csv"
+    make_merged().to_csv(path, index=False)
+    df = validate(read_table(str(path)), "merged")
+    assert pd.api.types.is_datetime64_any_dtype(df["service_date"])
+    assert df["station_name"].dtype == "category"
+    assert df["gated_entries"].dtype == np.int32
+    assert df["gated_entries"].tolist() == [1200, 3400, 1000]
+    assert (df[["tavg", "tmin", "tmax", "prcp", "wspd"]].dtypes == np.float32).all()
+
+    report = memory_report(make_merged(), df)
+    assert report.loc["total", "ratio"] > 1
+
+
+def test_validate_lists_every_problem():
+    df = make_merged().drop(columns=["wspd"])
+    df.loc[0, "station_name"] = None
+    with pytest.raises(SchemaError) as err:
+        validate(df, "merged")
+    message = str(err.value)
+    assert "missing columns ['wspd']" in message
+    assert "gated_entries is float64, expected count" in message
+    assert "station_name has 1 missing values" in message
+
+    # Once cast, only the structural problems remain
+    with pytest.raises(SchemaError, match="wspd"):
+        validate(apply_schema(df), "merged")
+
+
+def test_concat_keeps_categories_across_files():
+    a = apply_schema(pd.DataFrame({"station_name": ["Alewife", "Davis"], "gated_entries": [1, 2]}))
+    b = apply_schema(pd.DataFrame({"station_name": ["Wonderland"], "gated_entries": [3]}))
+    out = concat_tables([a, b])
+    assert out["station_name"].dtype == "category"
+    assert out["station_name"].tolist() == ["Alewife", "Davis", "Wonderland"]
+    assert out["gated_entries"].dtype == np.int32
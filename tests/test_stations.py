@@ -0,0 +1,33 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.stations import STATION_COORDS, assign_line_colors, line_membership, station_table
+
+
+def test_transfer_stations_keep_every_line():
+    table = station_table(["Park Street", "Downtown Crossing", "State Street", "Kendall/MIT", "Nowhere"])
+    assert table.loc["Park Street", "lines"] == "Red/Green"
+    assert table.loc["Downtown Crossing", "lines"] == "Red/Orange"
+    assert table.loc["State Street", "lines"] == "Orange/Blue"
+    assert table.loc["Kendall/MIT", "line_color"] == "Red"
+    assert table.loc["Nowhere", "line_color"] == "Other"
+    assert table["n_lines"].tolist() == [2, 2, 2, 1, 0]
+    assert table.loc["Park Street", ["on_red", "on_green", "on_blue"]].tolist() == [True, True, False]
+    assert table.loc["Kendall/MIT", ["x", "y"]].tolist() == list(STATION_COORDS["Kendall/MIT"])
+    assert np.isnan(table.loc["Nowhere", "x"])
+
+
+def test_row_lookup_matches_table():
+    names = ["Wonderland", "Park Street", "Alewife", "Park Street", "Courthouse"] * 3
+    df = pd.DataFrame({"station_name": pd.Categorical(names)})
+    out = assign_line_colors(df)
+    table = station_table(names)
+    assert out["line_color"].tolist() == table.loc[names, "line_color"].tolist()
+    assert out["lines"].tolist() == table.loc[names, "lines"].tolist()
+
+    members = line_membership(df)
+    assert members.loc[1, ["Red", "Green"]].all()
+    assert members.sum(axis=1).tolist() == [1, 2, 1, 2, 1] * 3
@@ -0,0 +1,57 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.timeFeatures import add_time_series_features, time_feature_columns
+
+
+def make_rows():
+    dates = pd.date_range('2022-01-01', periods=10, freq='D')
+    a = pd.DataFrame({'service_date': dates, 'station_name': 'A', 'gated_entries': np.arange(10) * 10.0})
+    b = pd.DataFrame({'service_date': dates, 'station_name': 'B', 'gated_entries': 1000 + np.arange(10.0)})
+    # B has no service on Jan 5th
+    b = b[b['service_date'] != '2022-01-05']
+    return pd.concat([a, b]).sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def test_lags_do_not_mix_stations_and_carry_over_missing_days():
+    df = add_time_series_features(make_rows())
+    b = df[df['station_name'] == 'B'].set_index('service_date')
+
+    assert b.loc['2022-01-04', 'lag1'] == 1002
+    # Jan 5th is missing: the 6th carries the last observation (the 4th) forward
+    assert b.loc['2022-01-06', 'lag1'] == 1003
+    assert b.loc['2022-01-06', 'roll7'] == np.mean([1000, 1001, 1002, 1003])
+    # Only the days before a station's first observation have no features
+    assert np.isnan(b.loc['2022-01-01', 'lag1'])
+    assert df.drop(columns=['lag1', 'roll7']).notna().all().all()
+    assert df['lag1'].isna().sum() == 2
+
+
+def test_features_match_per_station_calendar_reference():
+    df = add_time_series_features(make_rows(), lags=(1, 2), windows=(3,), std_windows=(3,), ewm_spans=(4,))
+
+    for station, grp in df.groupby('station_name'):
+        series = grp.set_index('service_date')['gated_entries'].sort_index().asfreq('D')
+        expected = pd.DataFrame({
+            'lag1': series.ffill().shift(1),
+            'lag2': series.ffill().shift(2),
+            'roll3': series.shift(1).rolling(3, min_periods=1).mean().ffill(),
+            'rollstd3': series.shift(1).rolling(3, min_periods=2).std().ffill(),
+            'ewm4': series.shift(1).ewm(span=4, min_periods=1).mean().ffill(),
+        }).loc[grp['service_date'].sort_values()]
+        actual = grp.sort_values('service_date').set_index('service_date')[expected.columns]
+        pd.testing.assert_frame_equal(actual, expected, check_names=False, check_freq=False)
+
+
+def test_time_feature_columns():
+    assert time_feature_columns((1, 7), (7,), (28,), (14,)) == ['lag1', 'lag7', 'roll7', 'rollstd28', 'ewm14']
+
+
+def test_duplicate_station_days_are_rejected():
+    df = make_rows()
+    with pytest.raises(ValueError):
+        add_time_series_features(pd.concat([df, df.iloc[:1]]))
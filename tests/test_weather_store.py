@@ -0,0 +1,89 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from data.processing import merge_mbta_weather, process_weather
+from data.weatherStore import WeatherStore, interpolate_gaps
+
+
+def make_weather(days=3 * 365, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2019-01-01", periods=days)
+    season = 10 - 12 * np.cos(2 * np.pi * dates.dayofyear.to_numpy() / 365.25)
+    tavg = season + rng.normal(0, 2, days)
+    return pd.DataFrame({
+        "service_date": dates, "tavg": tavg, "tmin": tavg - 4, "tmax": tavg + 4,
+        "prcp": rng.exponential(2, days), "wspd": rng.gamma(4, 3, days),
+    }).astype({c: np.float32 for c in ["tavg", "tmin", "tmax", "prcp", "wspd"]})
+
+
+def make_mbta(weather, stations=("Alewife", "Park Street")):
+    dates = weather["service_date"]
+    return pd.DataFrame({
+        "service_date": np.repeat(dates.to_numpy(), len(stations)),
+        "station_name": pd.Categorical(np.tile(stations, len(dates))),
+        "gated_entries": np.arange(len(dates) * len(stations), dtype=np.int32),
+    })
+
+
+def test_join_matches_inner_merge():
+    weather = make_weather()
+    mbta = make_mbta(weather)
+    # Ridership past the end of the weather is left out, like the inner merge
+    mbta = pd.concat([mbta, make_mbta(pd.DataFrame({"service_date": pd.date_range("2022-01-01", periods=3)}))],
+                     ignore_index=True)
+    store = WeatherStore.from_frame(weather)
+    assert store.end == weather["service_date"].max()
+
+    expected = pd.merge(mbta, weather, on="service_date", how="inner")
+    pd.testing.assert_frame_equal(store.join(mbta), expected)
+    pd.testing.assert_frame_equal(store.to_frame(), weather)
+
+
+def test_gaps_are_imputed_instead_of_dropping_days():
+    weather = make_weather()
+    gappy = weather.drop(index=[100, 101] + list(range(400, 420))).reset_index(drop=True)
+    gappy.loc[5, "tavg"] = np.nan
+
+    store = WeatherStore.from_frame(gappy)
+    assert len(store) == len(weather)
+    assert store.imputed.any(axis=1).sum() == 23
+    filled = store.to_frame()
+    assert filled["tavg"].iloc[5] == pytest.approx((weather["tmin"].iloc[5] + weather["tmax"].iloc[5]) / 2)
+    # Short gap: interpolated between the neighbouring days, except precipitation
+    assert filled["wspd"].iloc[100] == pytest.approx(weather["wspd"].iloc[99] + (weather["wspd"].iloc[102] - weather["wspd"].iloc[99]) / 3)
+    assert filled["prcp"].iloc[100] != pytest.approx(weather["prcp"].iloc[99] + (weather["prcp"].iloc[102] - weather["prcp"].iloc[99]) / 3)
+    # Long gap: the season, not a straight line
+    assert np.abs(filled["tavg"].iloc[400:420] - weather["tavg"].iloc[400:420]).mean() < 3
+
+    merged = merge_mbta_weather(make_mbta(weather), gappy)
+    assert len(merged) == len(make_mbta(weather))
+    assert merged.notna().all().all()
+
+
+def test_interpolation_leaves_long_and_open_gaps():
+    values = np.array([[1.0], [np.nan], [3.0], [np.nan], [np.nan], [np.nan], [np.nan], [8.0], [np.nan]])
+    filled = interpolate_gaps(values, max_gap=3)
+    assert filled[1, 0] == 2.0
+    assert np.isnan(filled[3:7, 0]).all() and np.isnan(filled[8, 0])
+
+
+def test_weather_sources_are_combined(tmp_path):
+    weather = make_weather(days=60)
+    raw = weather.rename(columns={"service_date": "time"})
+    other = raw.assign(tavg=raw["tavg"] + 2, tmin=raw["tmin"] + 2, tmax=raw["tmax"] + 2)
+    raw.drop(index=[10, 11]).to_csv(tmp_path / "logan.csv", index=False)
+    other.to_csv(tmp_path / "blue_hill.csv", index=False)
+
+    paths = [str(tmp_path / "logan.csv"), str(tmp_path / "blue_hill.csv")]
+    mean = process_weather(paths, output_dir=str(tmp_path / "mean"))
+    first = process_weather(paths, output_dir=str(tmp_path / "first"), how="first")
+    assert len(mean) == len(first) == 60
+    np.testing.assert_allclose(mean["tavg"].drop(index=[10, 11]), weather["tavg"].drop(index=[10, 11]) + 1, atol=1e-4)
+    np.testing.assert_allclose(first["tavg"].drop(index=[10, 11]), weather["tavg"].drop(index=[10, 11]), atol=1e-4)
+    # Days only one station has come from that station
+    np.testing.assert_allclose(mean["tavg"].iloc[10:12], other["tavg"].iloc[10:12], atol=1e-4)
+    np.testing.assert_allclose(first["tavg"].iloc[10:12], other["tavg"].iloc[10:12], atol=1e-4)